@@ -1,6 +1,11 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from .v1.configs.swagger_config import swagger_config
+from .v1.providers import cacher, memory_cacher, extraction_pool, http_client, sessions, invalidations, exports
+from .v1.providers.identity_map import open_identity_map, close_identity_map, current_identity_map
+from .v1.controllers.purge_controller import resume_purge_jobs
+from .v1.utils.logger import log_firebase
 
 
 # Define create_app function.
@@ -18,4 +23,53 @@ def create_app():
         allow_headers=["*"],
     )
 
+    # Scope an identity map to each request and report its backend reads
+    @app.middleware("http")
+    async def identity_map_scope(request: Request, call_next):
+        token = open_identity_map()
+        try:
+            response = await call_next(request)
+            identity_map = current_identity_map()
+            response.headers["X-Backend-Reads"] = str(identity_map.reads)
+            log_firebase(
+                f"{request.method} {request.url.path} issued {identity_map.reads} reads "
+                f"({identity_map.documents} documents, {identity_map.hits} identity map hits)")
+        finally:
+            close_identity_map(token)
+        return response
+
+    # Fork extraction workers before serving requests
+    @app.on_event("startup")
+    def start_extraction_pool():
+        extraction_pool.start()
+
+    # Open the AI services connection pool in the serving event loop
+    @app.on_event("startup")
+    async def start_http_client():
+        http_client.start()
+
+    # Listen to documents written by other instances
+    @app.on_event("startup")
+    def start_invalidations():
+        invalidations.start()
+
+    # Finish purges interrupted by the previous shutdown, without delaying startup
+    @app.on_event("startup")
+    async def start_purge_jobs():
+        app.state.purge_resume = asyncio.create_task(resume_purge_jobs())
+
+    # Flush pending cache writes before the worker exits
+    @app.on_event("shutdown")
+    async def flush_cache():
+        await cacher.aclose()
+        await memory_cacher.aclose()
+        extraction_pool.close()
+        exports.close()
+        sessions.close()
+        invalidations.close()
+
+    @app.on_event("shutdown")
+    async def close_http_client():
+        await http_client.close()
+
     return app
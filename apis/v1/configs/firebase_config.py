@@ -1,6 +1,7 @@
 import os
 import firebase_admin as admin
 from firebase_admin import firestore
+from firebase_admin import firestore_async
 from firebase_admin import storage
 from dotenv import load_dotenv
 load_dotenv()
@@ -27,6 +28,9 @@ app = admin.initialize_app(cred)
 # Initialize Firestore client
 db = firestore.client(app)
 
+# Initialize async Firestore client
+async_db = firestore_async.client(app)
+
 # Initialize Storage client
 bucket = storage.bucket(
     name=f"{os.environ.get('FIREBASE_PROJECT_ID')}.appspot.com", app=app)
@@ -1,64 +1,38 @@
-from typing import AnyStr, List
-import requests
-from fastapi import HTTPException
+from typing import AnyStr
 from ..schemas.user_schema import UserSchema
-from ..providers import cacher, jwt
-from ..utils.constants import GOOGLE_VERIFY_URL
+from ..providers import jwt, google_auth, sessions, auth_cache
 
 
-def login_control(access_token: AnyStr):
+async def login_control(access_token: AnyStr):
     # Get User information from Google API
-    url = GOOGLE_VERIFY_URL + access_token
-    response = requests.get(url, headers={
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    })
-
-    # Handle error and response
-    if response.status_code != 200:
-        raise HTTPException(
-            status_code=response.status_code,
-            detail="Google API Error"
-        )
-
-    # Get user data from Google API
-    google_data = response.json()
+    google_data = await google_auth.verify(access_token)
 
     # Check if user with email exists in Database
-    user = UserSchema.find_by_email(google_data["email"])
+    user = await UserSchema.afind_by_email(google_data["email"])
 
     # If user does not exist, create a new user
     if not user:
-        user = UserSchema(
+        user = await UserSchema(
             name=google_data["name"],
             email=google_data["email"],
             avatar=google_data["picture"]
-        ).create_user()
-
-    # Activate the user in cache
-    active_users = cacher.get("active_users")
-    if not active_users:
-        active_users = []
+        ).acreate_user()
 
-    if user.id not in active_users:
-        active_users.append(user.id)
-        cacher.set("active_users", active_users)
+    # Open a session for this login
+    sid = sessions.create(user.id)
 
     # Create JWT Token
     token = jwt.encrypt({
         "id": user.id,
+        "sid": sid,
     })
 
     return token
 
 
-def logout_control(user: UserSchema):
-    # Get active users from cache
-    active_users: List | None = cacher.get("active_users")
-    if not active_users:
-        return
-    if user.id in active_users:
-        active_users.remove(user.id)
-        cacher.set("active_users", active_users)
+def logout_control(user: UserSchema, token: AnyStr):
+    # Close the session of this token
+    data = jwt.decrypt(token)
+    sessions.revoke(user.id, data.get("sid"))
+    auth_cache.invalidate_token(token)
     return
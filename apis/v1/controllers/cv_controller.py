@@ -1,9 +1,10 @@
-from typing import AnyStr
+from typing import AnyStr, List
+import asyncio
 from fastapi import UploadFile, HTTPException, status, BackgroundTasks
 from fastapi.responses import JSONResponse
 import uuid
 import time
-import httpx
+import tempfile
 import pandas as pd
 from io import BytesIO
 from datetime import datetime
@@ -12,10 +13,28 @@ from ..schemas.user_schema import UserSchema
 from ..schemas.cv_schema import CVSchema
 from ..schemas.project_schema import ProjectSchema
 from ..schemas.position_schema import PositionSchema, PositionStatus
-from ..providers import memory_cacher, storage_db
-from ..utils.extractor import get_cv_content
-from ..utils.formatter import build_cv_summary_file, build_cv_matching_file
+from ..schemas.stats_schema import PositionStatsSchema
+from ..interfaces.cv_interface import CVQueryInterface
+from ..providers import memory_cacher, storage_db, extraction_pool, content_cache, http_client, write_batch, exports, cv_index
+from ..utils.formatter import (
+    build_cv_matching_file,
+    write_cv_summary_workbook,
+    CV_EXPORT_COLUMNS,
+    POSITION_EXPORT_COLUMNS,
+    csv_lines,
+    ndjson_lines,
+    ParquetRowWriter
+)
 from ..utils.utils import validate_file_extension, get_content_type
+from ..utils.pipeline import StageLimiter, dispatch_chunks
+from ..utils.constants import (
+    CV_INGEST_STAGE_LIMITS,
+    AI_DISPATCH_CHUNK_SIZE,
+    AI_DISPATCH_MAX_IN_FLIGHT,
+    AI_DISPATCH_MAX_RETRIES,
+    AI_DISPATCH_BACKOFF,
+    EXPORT_CHUNK_SIZE
+)
 from fastapi.encoders import jsonable_encoder
 import os
 from dotenv import load_dotenv
@@ -23,8 +42,19 @@ load_dotenv
 
 processing_api_url = os.environ.get("PROCESSING_API_URL")
 matching_api_url = os.environ.get("MATCHING_API_URL")
-
-def _validate_permissions(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
+ingest_stage_limits = {
+    stage: int(os.environ.get(f"CV_INGEST_{stage.upper()}_CONCURRENCY", limit))
+    for stage, limit in CV_INGEST_STAGE_LIMITS.items()
+}
+ai_dispatch_config = {
+    "chunk_size": int(os.environ.get("AI_DISPATCH_CHUNK_SIZE", AI_DISPATCH_CHUNK_SIZE)),
+    "max_in_flight": int(os.environ.get("AI_DISPATCH_MAX_IN_FLIGHT", AI_DISPATCH_MAX_IN_FLIGHT)),
+    "max_retries": int(os.environ.get("AI_DISPATCH_MAX_RETRIES", AI_DISPATCH_MAX_RETRIES)),
+    "backoff": float(os.environ.get("AI_DISPATCH_BACKOFF", AI_DISPATCH_BACKOFF)),
+}
+export_chunk_size = int(os.environ.get("EXPORT_CHUNK_SIZE", EXPORT_CHUNK_SIZE))
+
+async def _validate_permissions(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
     # Validate project id in user's projects
     if project_id not in user.projects and project_id not in user.shared:
         raise HTTPException(
@@ -33,7 +63,7 @@ def _validate_permissions(project_id: AnyStr, position_id: AnyStr, user: UserSch
         )
 
     # Get project
-    project = ProjectSchema.find_by_id(project_id)
+    project = await ProjectSchema.afind_by_id(project_id)
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -48,7 +78,7 @@ def _validate_permissions(project_id: AnyStr, position_id: AnyStr, user: UserSch
         )
 
     # Get position
-    position = PositionSchema.find_by_id(position_id)
+    position = await PositionSchema.afind_by_id(position_id)
     if not position:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -58,65 +88,185 @@ def _validate_permissions(project_id: AnyStr, position_id: AnyStr, user: UserSch
     return project, position
 
 
-def get_all_cvs(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
-    _, position = _validate_permissions(project_id, position_id, user)
+async def get_all_cvs(project_id: AnyStr, position_id: AnyStr, user: UserSchema, limit: int | None = None, cursor: AnyStr | None = None):
+    '''
+    Get one page of the position's CVs, in the order they were added,
+    and the cursor of the next page. Without limit, every CV after the cursor.
+    '''
+    _, position = await _validate_permissions(project_id, position_id, user)
 
     # Get CVs
-    cvs = CVSchema.find_by_ids(position.cvs)
-    return cvs
-
-
-def get_all_cvs_summary(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
-    _, position = _validate_permissions(project_id, position_id, user)
-
-    cvs = CVSchema.find_by_ids(position.cvs)
-    cvs = [cv.to_dict() for cv in cvs]
-    cvs = [
-        {
-            "id": cv["id"],
-            "upload_at": cv["upload_at"],
-            "summary": cv["summary"],
-            "matching": cv["matching"]
-        } 
-        for cv in cvs
-    ]
-
-    cvs_df = build_cv_summary_file(cvs)
-    match_df = build_cv_matching_file(cvs)  # <-- assuming this is your 2nd sheet function
-
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        # Write the first sheet
-        cvs_df.to_excel(writer, index=False, sheet_name="CVs Summary")
-        match_df.to_excel(writer, index=False, sheet_name="Matching Scores")
-
-        workbook = writer.book
-
-        # Wrap text format
-        wrap_format = workbook.add_format({'text_wrap': True, 'valign': 'top'})
+    try:
+        cvs, next_cursor = await CVSchema.afind_page_by_ids(position.cvs, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return cvs, next_cursor
 
-        # Adjust columns for "CVs Summary"
-        summary_ws = writer.sheets["CVs Summary"]
-        for i, column in enumerate(cvs_df.columns):
-            col_width = max(cvs_df[column].astype(str).map(len).max(), len(column)) + 2
-            summary_ws.set_column(i, i, min(col_width, 30), wrap_format)  # Max width = 50
 
-        # Adjust columns for "Matching Scores"
-        matching_ws = writer.sheets["Matching Scores"]
-        for i, column in enumerate(match_df.columns):
-            col_width = max(match_df[column].astype(str).map(len).max(), len(column)) + 2
-            matching_ws.set_column(i, i, min(col_width, 30), wrap_format)  # Max width = 60
+def _read_chunks(file, chunk_size: int = 64 * 1024):
+    # Stream an open file, closing it at the end
+    try:
+        while chunk := file.read(chunk_size):
+            yield chunk
+    finally:
+        file.close()
 
-    output.seek(0)
-    return output
 
+async def get_all_cvs_summary(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
+    '''
+    Get the summary workbook of the position's CVs as chunks of bytes.
+    The workbook is written in a worker thread and kept until the CVs of
+    the position change.
+    '''
+    _, position = await _validate_permissions(project_id, position_id, user)
+
+    # Positions without built counters have no version, their export is not kept
+    version = await PositionStatsSchema.aget_version(position_id)
+    name = f"summary-{position_id}"
+    path = exports.get(name, version, "xlsx") if version is not None else None
+    if path is None:
+        cv_ids = await CVSchema.asort_ids_by_upload(position.cvs)
+        path = await exports.build(name, version, "xlsx", lambda path: write_cv_summary_workbook(
+            path,
+            ([cv.to_dict() for cv in cvs] for cvs in CVSchema.iter_by_ids(cv_ids, export_chunk_size)),
+            len(cv_ids)
+        ))
+
+    # Open now, a newer version may replace the file while it is streamed
+    file = open(path, "rb")
+    if version is None:
+        os.remove(path)
+    return _read_chunks(file)
+
+
+async def _export_rows(positions: List[PositionSchema], build_row, with_position: bool):
+    '''
+    Yield the export rows of the CVs of positions chunk by chunk.
+    CVs of each position are newest first and numbered from 1, like the xlsx export.
+    '''
+    for position in positions:
+        cv_ids = await CVSchema.asort_ids_by_upload(position.cvs)
+        i = 0
+        async for cvs in CVSchema.aiter_by_ids(cv_ids, export_chunk_size):
+            rows = []
+            for cv in cvs:
+                i += 1
+                row = build_row(i, cv.to_dict())
+                if with_position:
+                    row = {"Hiring Request ID": position.id, "Hiring Request": position.name, **row}
+                rows.append(row)
+            yield rows
+
+
+async def _stream_text(rows, columns: List[AnyStr], export_format: AnyStr):
+    header = True
+    async for chunk in rows:
+        if export_format == "csv":
+            yield csv_lines(chunk, columns, header)
+            header = False
+        else:
+            yield ndjson_lines(chunk, columns)
+    # An empty CSV export still has its header
+    if export_format == "csv" and header:
+        yield csv_lines([], columns, header)
+
+
+async def export_cvs(
+    project_id: AnyStr,
+    position_id: AnyStr | None,
+    user: UserSchema,
+    export_format: AnyStr = "csv",
+    columns: AnyStr = "summary"
+):
+    '''
+    Export the CVs of a position, or of every position of the project when
+    position_id is None, as CSV, NDJSON or Parquet chunks.
+    CSV and NDJSON rows are sent as CVs are read. Parquet is written to a
+    temporary file one row group per chunk, then sent.
+    '''
+    if position_id is not None:
+        _, position = await _validate_permissions(project_id, position_id, user)
+        positions = [position]
+    else:
+        if project_id not in user.projects and project_id not in user.shared:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You don't have permission to access this project."
+            )
+        project = await ProjectSchema.afind_by_id(project_id)
+        if not project:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Project not found."
+            )
+        positions = await PositionSchema.afind_all_by_ids(project.positions)
+
+    export_columns, build_row = CV_EXPORT_COLUMNS[columns]
+    if position_id is None:
+        export_columns = POSITION_EXPORT_COLUMNS + export_columns
+    rows = _export_rows(positions, build_row, position_id is None)
+
+    if export_format != "parquet":
+        return _stream_text(rows, export_columns, export_format)
+
+    # Removed by the system once closed
+    file = tempfile.TemporaryFile()
+    try:
+        writer = ParquetRowWriter(file, export_columns)
+    except ImportError:
+        file.close()
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Parquet export needs pyarrow installed."
+        )
+    try:
+        async for chunk in rows:
+            await asyncio.to_thread(writer.write, chunk)
+        await asyncio.to_thread(writer.close)
+    except BaseException:
+        file.close()
+        raise
+    file.seek(0)
+    return _read_chunks(file)
+
+
+async def query_cvs(project_id: AnyStr, position_id: AnyStr, user: UserSchema, query: CVQueryInterface):
+    '''
+    Filter the position's CVs by status, labels and score thresholds on its
+    in-memory index. Return the number of matches, the top_k CVs sorted by
+    score and the status and label counts of the matches.
+    Only the returned CVs are read whole.
+    '''
+    _, position = await _validate_permissions(project_id, position_id, user)
+
+    index = await CVSchema.aindex_by_position(position.id, position.cvs)
+    with cv_index.lock:
+        result = index.query(
+            position.cvs,
+            status=[value.value for value in query.status],
+            labels=query.labels,
+            min_scores=query.min_scores,
+            max_scores=query.max_scores,
+            sort_by=query.sort_by,
+            descending=query.order == "desc",
+            top_k=query.top_k
+        )
 
+    cvs = {cv.id: cv for cv in await CVSchema.afind_by_ids(result["cv_ids"])}
+    return {
+        "total": result["total"],
+        "cvs": [cvs[cv_id] for cv_id in result["cv_ids"] if cv_id in cvs],
+        "facets": result["facets"]
+    }
 
 
-def get_all_cvs_matching(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
-    _, position = _validate_permissions(project_id, position_id, user)
+async def get_all_cvs_matching(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
+    _, position = await _validate_permissions(project_id, position_id, user)
 
-    cvs = CVSchema.find_by_ids(position.cvs)
+    cvs = await CVSchema.afind_by_ids(position.cvs)
     cvs = [cv.to_dict() for cv in cvs]
     # Kepp only 'id' and 'summary' keys of the cv
     cvs = [
@@ -135,11 +285,11 @@ def get_all_cvs_matching(project_id: AnyStr, position_id: AnyStr, user: UserSche
     return output
 
 
-def get_cv_by_id(project_id: AnyStr, position_id: AnyStr, cv_id: AnyStr, user: UserSchema):
-    _, _ = _validate_permissions(project_id, position_id, user)
+async def get_cv_by_id(project_id: AnyStr, position_id: AnyStr, cv_id: AnyStr, user: UserSchema):
+    _, _ = await _validate_permissions(project_id, position_id, user)
 
     # Get CV
-    cv = CVSchema.find_by_id(cv_id)
+    cv = await CVSchema.afind_by_id(cv_id)
     if not cv:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -151,7 +301,7 @@ def get_cv_by_id(project_id: AnyStr, position_id: AnyStr, cv_id: AnyStr, user: U
 
 async def upload_cvs_data(project_id: AnyStr, position_id: AnyStr, user: UserSchema, cvs: list[UploadFile], weight: dict, llm_name: str, bg_tasks: BackgroundTasks):
     # Validate permission
-    _, position = _validate_permissions(project_id, position_id, user)
+    _, position = await _validate_permissions(project_id, position_id, user)
 
     # Create watch id
     watch_id = str(uuid.uuid4())
@@ -165,13 +315,10 @@ async def upload_cvs_data(project_id: AnyStr, position_id: AnyStr, user: UserSch
         filenames.append(cv.filename)
 
     # Initialize cache
-    memory_cacher.set(watch_id, {
-        "percent": {},
-        "error": {}
-    })
+    await start_progress(watch_id, filenames)
 
     # Update position status to PROCESSING
-    position.update_status(PositionStatus.PROCESSING)
+    await position.aupdate_status(PositionStatus.PROCESSING)
 
     # Upload CVs
     bg_tasks.add_task(_upload_cvs_data, files, filenames, watch_id, position, weight, llm_name)
@@ -187,142 +334,308 @@ async def _upload_cvs_data(
     weight: dict,
     llm_name: str
 ):
-    cv_ids = []
-    async with httpx.AsyncClient(timeout=60.0) as client:
+    # The position leaves PROCESSING however the upload ends
+    processed_ids = []
+    try:
+        processed_ids = await _process_uploaded_cvs(cvs, filenames, watch_id, position, weight, llm_name)
+    finally:
+        await position.aupdate_status(_end_status(position))
+        # Check completion, files that failed are reported as errors
+        progress = await get_upload_progress(watch_id)
+        if not processed_ids:
+            await set_upload_status(watch_id, "failed")
+        elif all(percent >= 100 or percent < 0 for percent in progress["percent"].values()):
+            await set_upload_status(watch_id, "completed")
+
+
+def _end_status(position: PositionSchema) -> PositionStatus:
+    '''
+    Get the status of a position once its uploads are processed:
+    CLOSED when its end date has passed, OPEN otherwise.
+    '''
+    if position.end_date:
         try:
-            for cv, filename in zip(cvs, filenames):
-                # Initialize percent = 0
-                cache_data = memory_cacher.get(watch_id)
-                if cache_data:
-                    cache_data["percent"][filename] = 0
-                    memory_cacher.set(watch_id, cache_data)
-
-                # Create CV document
-                cv_instance = CVSchema(name=filename).create_cv()
-                cv_ids.append(cv_instance.id)
-                update_cache_percent(watch_id, filename, 10)
-
-                # Upload storage
-                _upload_cv_data(cv, filename, watch_id, cv_instance)
-                update_cache_percent(watch_id, filename, 10)
-
-                # Save cache file + extract content
-                cache_file_path = memory_cacher.save_cache_file(cv, filename)
-                cv_content = get_cv_content(cache_file_path)
-                memory_cacher.remove_cache_file(filename)
-                update_cache_percent(watch_id, filename, 10)
-
-                # Update content in DB
-                cv_instance.update_content(cv_content)
-                update_cache_percent(watch_id, filename, 10)
-
-                # Add to position
-                position.update_cv(cv_instance.id, is_add=True)
-                update_cache_percent(watch_id, filename, 10)
-
-            # Send to AI processing
-            processing_payload = {
-                "doc_ids": cv_ids,
-                "doc_type": "cv",
-                "llm_name": llm_name
-            }
-            response = await client.post(processing_api_url, json=processing_payload, timeout=len(cv_ids) * 120)
-            processing_results = response.json().get("results")
-
-            filename_by_cv_id = dict(zip(cv_ids, filenames))
+            if datetime.now() > parser.parse(position.end_date):
+                return PositionStatus.CLOSED
+        except Exception as e:
+            print(f"Error parsing end date: {str(e)}")
+    return PositionStatus.OPEN
 
+
+async def _process_uploaded_cvs(
+    cvs: list[bytes],
+    filenames: list[AnyStr],
+    watch_id: AnyStr,
+    position: PositionSchema,
+    weight: dict,
+    llm_name: str
+) -> list[AnyStr]:
+    '''
+    Ingest the files, then summarize and match them.
+    Return the ids of the CVs processed and matched by the AI.
+    '''
+    # Ingest files concurrently, each stage bounded by its own limit.
+    # A failing file is reported on its own and does not stop the others.
+    limiter = StageLimiter(ingest_stage_limits)
+    digests = [content_cache.digest(cv) for cv in cvs]
+    ingested_ids = await asyncio.gather(*[
+        _ingest_cv_data(cv, filename, digest, watch_id, limiter, position.id)
+        for cv, filename, digest in zip(cvs, filenames, digests)
+    ])
+    cv_ids = [cv_id for cv_id in ingested_ids if cv_id]
+    filenames = [filename for cv_id, filename in zip(ingested_ids, filenames) if cv_id]
+    digests = [digest for cv_id, digest in zip(ingested_ids, digests) if cv_id]
+    if not cv_ids:
+        return []
+
+    # Add to position
+    await position.aupdate_cvs(cv_ids, is_add=True)
+    for filename in filenames:
+        await update_cache_percent(watch_id, filename, 10)
+
+    filename_by_cv_id = dict(zip(cv_ids, filenames))
+    digest_by_cv_id = dict(zip(cv_ids, digests))
+
+    async def _save_processing_results(chunk_ids: list[AnyStr], processing_results: list[dict]):
+        # Results of a chunk are committed in one batch
+        async with write_batch():
             for processing_result in processing_results:
                 cv_id = processing_result.get("doc_id")
                 summary = processing_result.get("summary")
                 labels = processing_result.get("labels")
-                cv_instance = CVSchema.find_by_id(cv_id)
-                cv_instance.update_weight(weight)
-                cv_instance.update_summary(summary)
-                cv_instance.update_labels(labels)
-
-                filename = filename_by_cv_id.get(cv_id)
-                if filename:
-                    cache_data = memory_cacher.get(watch_id)
-                    if cache_data and filename in cache_data["percent"]:
-                        cache_data["percent"][filename] = 100
-                        memory_cacher.set(watch_id, cache_data)
-
-            # Check if end date has passed and auto-close if needed
-            if position.end_date:
-                try:
-                    end_date = parser.parse(position.end_date)
-                    if datetime.now() > end_date:
-                        position.update_status(PositionStatus.CLOSED)
-                except Exception as e:
-                    print(f"Error parsing end date: {str(e)}")
-
-        except Exception as e:
-            # Handle errors for each file, ensure cache is updated
-            for filename in filenames:
-                set_cache_error(watch_id, filename, str(e))
-            raise RuntimeError(f"Process stopped due to error: {str(e)}")
+                digest = digest_by_cv_id.get(cv_id)
+                if digest:
+                    await content_cache.aset_summary(digest, llm_name, summary, labels)
+
+                # One write per CV
+                cv_instance = await CVSchema.afind_by_id(cv_id)
+                async with cv_instance.deferred():
+                    await cv_instance.aupdate_weight(weight)
+                    await cv_instance.aupdate_summary(summary)
+                    await cv_instance.aupdate_labels(labels)
+
+        for processing_result in processing_results:
+            filename = filename_by_cv_id.get(processing_result.get("doc_id"))
+            if filename:
+                await set_cache_percent(watch_id, filename, 100)
+
+    # Reuse AI results of documents already processed by this LLM
+    cached_results = []
+    for cv_id, digest in digest_by_cv_id.items():
+        cached_result = await content_cache.aget_summary(digest, llm_name)
+        if cached_result:
+            cached_results.append({"doc_id": cv_id, **cached_result})
+    cached_ids = [result["doc_id"] for result in cached_results]
+    await _save_processing_results(cached_ids, cached_results)
+    pending_ids = [cv_id for cv_id in cv_ids if cv_id not in cached_ids]
+
+    # Send to AI processing in chunks, results are saved as each chunk returns
+    async def _process_chunk(chunk_ids: list[AnyStr]):
+        processing_payload = {
+            "doc_ids": chunk_ids,
+            "doc_type": "cv",
+            "llm_name": llm_name
+        }
+        response = await http_client.post(
+            "processing", processing_api_url, json=processing_payload,
+            timeout=len(chunk_ids) * http_client.get_timeout("processing"))
+        response.raise_for_status()
+        return response.json().get("results")
+
+    failures = await dispatch_chunks(pending_ids, _process_chunk, _save_processing_results, **ai_dispatch_config)
+    failed_ids = set()
+    for chunk_ids, error in failures:
+        failed_ids.update(chunk_ids)
+        for cv_id in chunk_ids:
+            await set_cache_error(watch_id, filename_by_cv_id.get(cv_id), str(error))
+        print(f"Processing failed for {len(chunk_ids)} CVs: {str(error)}")
+    processed_ids = [cv_id for cv_id in cv_ids if cv_id not in failed_ids]
+
+    # Matching of the processed CVs, files of a failed chunk are reported as errors
+    if processed_ids:
+        for chunk_ids, error in await _match_cvs(processed_ids, position, weight, llm_name):
+            failed_ids.update(chunk_ids)
+            for cv_id in chunk_ids:
+                await set_cache_error(watch_id, filename_by_cv_id.get(cv_id), str(error))
+    return [cv_id for cv_id in processed_ids if cv_id not in failed_ids]
+
+
+async def _match_cvs(cv_ids: list[AnyStr], position: PositionSchema, weight: dict, llm_name: str):
+    '''
+    Send CVs to the matching API in chunks and save each chunk's results.
+    Return the chunks that failed.
+    '''
+    jd_id = position.get_jd_by_cvs(cv_ids[0])
 
-        # Matching after processing is complete
+    async def _match_chunk(chunk_ids: list[AnyStr]):
         matching_payload = jsonable_encoder({
-            "jd_id": position.get_jd_by_cvs(cv_ids[0]),
-            "cv_ids": cv_ids,
+            "jd_id": jd_id,
+            "cv_ids": chunk_ids,
             "weight": weight,
             "llm_name": llm_name
         })
-        response = await client.post(matching_api_url, json=matching_payload)
-        matching_results = response.json().get("results")
+        response = await http_client.post("matching", matching_api_url, json=matching_payload)
+        response.raise_for_status()
+        return response.json().get("results")
 
-        for matching_result in matching_results:
-            cv_id = matching_result.get("cv_id")
-            result = matching_result.get("matching_result")
-            cv_instance = CVSchema.find_by_id(cv_id)
-            cv_instance.update_matching(result)
-            position.update_status(PositionStatus.OPEN)
+    async def _save_matching_results(chunk_ids: list[AnyStr], matching_results: list[dict]):
+        # Results of a chunk are committed in one batch
+        async with write_batch():
+            for matching_result in matching_results:
+                cv_id = matching_result.get("cv_id")
+                result = matching_result.get("matching_result")
+                cv_instance = await CVSchema.afind_by_id(cv_id)
+                await cv_instance.aupdate_matching(result)
 
-        # Check completion
-        cache_data = memory_cacher.get(watch_id)
-        if cache_data and all(percent >= 100 for percent in cache_data["percent"].values()):
-            cache_data["status"] = "completed"
-            memory_cacher.set(watch_id, cache_data)
+    failures = await dispatch_chunks(cv_ids, _match_chunk, _save_matching_results, **ai_dispatch_config)
+    for chunk_ids, error in failures:
+        print(f"Matching failed for {len(chunk_ids)} CVs: {str(error)}")
+    return failures
 
-def update_cache_percent(watch_id, filename, delta):
-    cache_data = memory_cacher.get(watch_id)
-    if cache_data and filename in cache_data["percent"]:
-        cache_data["percent"][filename] += delta
-        memory_cacher.set(watch_id, cache_data)
 
-def set_cache_error(watch_id, filename, error_msg):
-    cache_data = memory_cacher.get(watch_id)
-    if cache_data and filename in cache_data["percent"]:
-        cache_data["error"][filename] = error_msg
-        cache_data["percent"][filename] = -1
-        memory_cacher.set(watch_id, cache_data)
+async def _ingest_cv_data(data: bytes, filename: AnyStr, digest: AnyStr, watch_id: AnyStr, limiter: StageLimiter, position_id: AnyStr = None) -> AnyStr | None:
+    '''
+    Create the CV document, upload the file and store its extracted content.
+    The text of a file seen before is taken from the content cache.
+    Return the CV id, or None if the file failed.
+    '''
+    cv_instance = None
+    try:
+        # Create CV document
+        async with limiter.stage("database"):
+            cv_instance = await CVSchema(name=filename, position_id=position_id).acreate_cv()
+        await update_cache_percent(watch_id, filename, 10)
+
+        # Upload storage
+        async with limiter.stage("storage"):
+            await _upload_cv_data(data, filename, watch_id, cv_instance, digest)
+        await update_cache_percent(watch_id, filename, 10)
+
+        # Extract content
+        cv_content = await content_cache.aget_content(digest)
+        if cv_content is None:
+            async with limiter.stage("extract"):
+                cv_content = await extraction_pool.extract(data, filename)
+            await content_cache.aset_content(digest, cv_content)
+        await update_cache_percent(watch_id, filename, 10)
+
+        # Update content in DB
+        async with limiter.stage("database"):
+            await cv_instance.aupdate_content(cv_content)
+        await update_cache_percent(watch_id, filename, 10)
+
+        return cv_instance.id
+    except Exception as e:
+        await set_cache_error(watch_id, filename, str(e))
+        print(f"Ingestion of {filename} failed: {str(e)}")
+        if cv_instance is not None:
+            await _discard_cv(cv_instance)
+        return None
+
+
+async def _discard_cv(cv: CVSchema):
+    '''
+    Delete the CV of a file that failed, with its blob reference.
+    '''
+    try:
+        if cv.path:
+            await cv.adelete_cv()
+        else:
+            # The upload cleaned up after itself
+            await CVSchema.adelete_by_ids([cv.id])
+    except Exception as e:
+        print(f"Cleanup of CV {cv.id} failed: {str(e)}")
+
+
+def _progress_key(watch_id, filename):
+    # One key per file: the files of an upload are updated concurrently,
+    # possibly by other workers, and a file only ever writes its own key
+    return f"{watch_id}:{filename}"
+
+async def start_progress(watch_id, filenames):
+    await memory_cacher.asets({
+        watch_id: {"files": list(dict.fromkeys(filenames))},
+        **{_progress_key(watch_id, filename): {"percent": 0} for filename in filenames}
+    })
 
+async def update_cache_percent(watch_id, filename, delta):
+    key = _progress_key(watch_id, filename)
+    progress = await memory_cacher.aget(key)
+    if progress:
+        progress["percent"] += delta
+        await memory_cacher.aset(key, progress)
 
+async def set_cache_percent(watch_id, filename, percent):
+    key = _progress_key(watch_id, filename)
+    progress = await memory_cacher.aget(key)
+    if progress:
+        progress["percent"] = percent
+        await memory_cacher.aset(key, progress)
 
+async def set_cache_error(watch_id, filename, error_msg):
+    key = _progress_key(watch_id, filename)
+    progress = await memory_cacher.aget(key)
+    if progress:
+        await memory_cacher.aset(key, {"percent": -1, "error": error_msg})
+
+async def set_upload_status(watch_id, upload_status):
+    watch = await memory_cacher.aget(watch_id)
+    if watch:
+        await memory_cacher.aset(watch_id, {**watch, "status": upload_status})
 
 
-def _upload_cv_data(data: bytes, filename: AnyStr, watch_id: AnyStr, cv: CVSchema):
-    content_type = get_content_type(filename)
-    path, url = storage_db.upload(data, filename, content_type)
-    cache_data = memory_cacher.get(watch_id)
-    if cache_data and filename in cache_data["percent"]:
-        cache_data["percent"][filename] += 15
-        memory_cacher.set(watch_id, cache_data)
-    cv.update_path_url(path, url)
-    cache_data = memory_cacher.get(watch_id)
-    if cache_data and filename in cache_data["percent"]:
-        cache_data["percent"][filename] += 5
-        memory_cacher.set(watch_id, cache_data)
 
 
 
-async def upload_cv_data(project_id: AnyStr, position_id: AnyStr, cv: UploadFile, user: UserSchema, bg_tasks: BackgroundTasks):
+async def _upload_cv_data(data: bytes, filename: AnyStr, watch_id: AnyStr, cv: CVSchema, digest: AnyStr = None):
+    '''
+    Upload the file of a CV and record its path. If it fails, the blob
+    reference taken and the file uploaded are dropped.
+    '''
+    content_type = get_content_type(filename)
+    path, blob = None, None
+    try:
+        if content_cache.dedup_blobs and digest:
+            # Identical files share one content-addressed blob, counted before
+            # it is used so a concurrent delete keeps it
+            blob = await content_cache.aadd_blob_ref(digest)
+            if blob["path"]:
+                path, url = blob["path"], blob["url"]
+            else:
+                path, url = await asyncio.to_thread(
+                    storage_db.upload_content_addressed, data, filename, content_type, digest, blob["generation"])
+                await content_cache.aset_blob(digest, blob["generation"], path, url)
+                blob["path"] = path
+        else:
+            path, url = await asyncio.to_thread(storage_db.upload, data, filename, content_type)
+        await update_cache_percent(watch_id, filename, 15)
+        await cv.aupdate_path_url(path, url)
+    except Exception:
+        await _release_upload(digest, blob, path)
+        raise
+    await update_cache_percent(watch_id, filename, 5)
+
+
+async def _release_upload(digest: AnyStr, blob: dict | None, path: AnyStr | None):
+    # The blob count holds the path it recorded, None until it is set
+    try:
+        if blob is None:
+            removable = path is not None
+        else:
+            removable = await content_cache.arelease_blob(digest, blob["path"])
+        if removable and path:
+            await asyncio.to_thread(storage_db.remove, path)
+    except Exception as e:
+        print(f"Cleanup of {path or digest} failed: {str(e)}")
+
+
+
+async def upload_cv_data(project_id: AnyStr, position_id: AnyStr, cv: UploadFile, user: UserSchema, weight: dict, llm_name: str, bg_tasks: BackgroundTasks):
     # Validate extension
     validate_file_extension(cv.filename)
 
     # Validate permission and get position
-    _, position = _validate_permissions(project_id, position_id, user)
+    _, position = await _validate_permissions(project_id, position_id, user)
 
     # Check if position is open for CV uploads
     if position.status not in [PositionStatus.OPEN, PositionStatus.PROCESSING]:
@@ -338,16 +651,13 @@ async def upload_cv_data(project_id: AnyStr, position_id: AnyStr, cv: UploadFile
     watch_id = str(uuid.uuid4())
 
     # Initialize cache
-    memory_cacher.set(watch_id, {
-        "percent": {},
-        "error": {}
-    })
+    await start_progress(watch_id, [cv.filename])
 
     # Update position status to PROCESSING
-    position.update_status(PositionStatus.PROCESSING)
+    await position.aupdate_status(PositionStatus.PROCESSING)
 
     # Upload CV
-    bg_tasks.add_task(_upload_cv_data, [file_content], [cv.filename], watch_id, position)
+    bg_tasks.add_task(_upload_cvs_data, [file_content], [cv.filename], watch_id, position, weight, llm_name)
 
     return watch_id
 
@@ -425,10 +735,10 @@ async def rematch_cvs_data(project_id: AnyStr, position_id: AnyStr, user: UserSc
     Retrieve all uploaded CVs in a project and re-match them.
     '''
     # Validate permissions
-    _, position = _validate_permissions(project_id, position_id, user)
+    _, position = await _validate_permissions(project_id, position_id, user)
 
     # Get all CVs associated with the position
-    cvs = CVSchema.find_by_ids(position.cvs)
+    cvs = await CVSchema.afind_by_ids(position.cvs)
     if not cvs:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -446,56 +756,38 @@ async def _rematch_cvs_task(cv_ids: list[AnyStr], position: PositionSchema, weig
     '''
     Background task to perform re-matching for CVs.
     '''
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            # Prepare the matching payload
-            matching_payload = jsonable_encoder({
-                "jd_id": position.get_jd_by_cvs(cv_ids[0]),  # Use the first CV ID to get the JD
-                "cv_ids": cv_ids,
-                "weight": weight,  # Use the weight parameter from the frontend
-                "llm_name": llm_name
-            })
-
-            # Send the payload to the matching API
-            response = await client.post(matching_api_url, json=matching_payload)
-            matching_results = response.json().get("results")
-            print("result", matching_results)
-
-            # Update matching results for each CV
-            for matching_result in matching_results:
-                cv_id = matching_result.get("cv_id")
-                result = matching_result.get("matching_result")
-                cv_instance = CVSchema.find_by_id(cv_id)
-                cv_instance.update_matching(result)
-
-        except Exception as e:
-            # Log the error for debugging
-            print(f"Re-matching failed due to error: {str(e)}")
+    await _match_cvs(cv_ids, position, weight, llm_name)
 
 
-def get_upload_progress(watch_id: AnyStr):
-    progress = memory_cacher.get(watch_id)
-    if progress is None:
+async def get_upload_progress(watch_id: AnyStr):
+    watch = await memory_cacher.aget(watch_id)
+    if watch is None:
         return {"percent": {}, "error": {}, "status": "not_found"}
-    if "status" not in progress:
-        progress["status"] = "processing"
+    files = watch.get("files", [])
+    entries = await memory_cacher.agets([_progress_key(watch_id, filename) for filename in files]) if files else []
+    progress = {"percent": {}, "error": {}, "status": watch.get("status", "processing")}
+    for filename, entry in zip(files, entries or []):
+        entry = entry or {"percent": 0}
+        progress["percent"][filename] = entry["percent"]
+        if "error" in entry:
+            progress["error"][filename] = entry["error"]
     return progress
 
 
 
 async def download_cv_content(project_id: AnyStr, position_id: AnyStr, cv_id: AnyStr, user: UserSchema) -> bytes:
     # Validate permission
-    _, _ = _validate_permissions(project_id, position_id, user)
+    _, _ = await _validate_permissions(project_id, position_id, user)
 
     # Get CV
-    cv = CVSchema.find_by_id(cv_id)
+    cv = await CVSchema.afind_by_id(cv_id)
     if not cv:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="CV not found 2."
         )
 
-    cv_content = cv.download_content()
+    cv_content = await cv.adownload_content()
     if not cv_content:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -505,11 +797,11 @@ async def download_cv_content(project_id: AnyStr, position_id: AnyStr, cv_id: An
     return cv_content
 
 
-def get_cv_detail_control(project_id: AnyStr, position_id: AnyStr, cv_id: AnyStr, user: UserSchema):
-    _, _ = _validate_permissions(project_id, position_id, user)
+async def get_cv_detail_control(project_id: AnyStr, position_id: AnyStr, cv_id: AnyStr, user: UserSchema):
+    _, _ = await _validate_permissions(project_id, position_id, user)
 
     # Get CV
-    cv = CVSchema.find_by_id(cv_id)
+    cv = await CVSchema.afind_by_id(cv_id)
     # Return CV' 'detail' and 'matching' keys of the cv
     cv_summary = cv.to_dict().get('summary')
     print(cv_summary)
@@ -524,19 +816,12 @@ def get_cv_detail_control(project_id: AnyStr, position_id: AnyStr, cv_id: AnyStr
     return cv
 
 
-def delete_cvs_by_ids(cv_ids: list[AnyStr]):
-    for cv_id in cv_ids:
-        cv = CVSchema.find_by_id(cv_id)
-        if cv:
-            cv.delete_cv()
-
-
-def delete_current_cv(project_id: AnyStr, position_id: AnyStr, cv_id: AnyStr, user: UserSchema):
+async def delete_current_cv(project_id: AnyStr, position_id: AnyStr, cv_id: AnyStr, user: UserSchema):
     # Validate permission
-    _, position = _validate_permissions(project_id, position_id, user)
+    _, position = await _validate_permissions(project_id, position_id, user)
 
     # Get CV
-    cv = CVSchema.find_by_id(cv_id)
+    cv = await CVSchema.afind_by_id(cv_id)
     if not cv:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -544,7 +829,7 @@ def delete_current_cv(project_id: AnyStr, position_id: AnyStr, cv_id: AnyStr, us
         )
 
     # Remove CV from position
-    position.update_cv(cv_id, is_add=False)
+    await position.aupdate_cv(cv_id, is_add=False)
 
     # Delete CV
-    cv.delete_cv()
+    await cv.adelete_cv()
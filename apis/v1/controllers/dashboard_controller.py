@@ -1,13 +1,76 @@
-from typing import Dict, AnyStr
+from typing import Dict, AnyStr, List
 from fastapi import HTTPException, status
 from ..schemas.user_schema import UserSchema
 from ..schemas.project_schema import ProjectSchema
-from ..schemas.position_schema import PositionSchema
+from ..schemas.position_schema import PositionSchema, PositionStatus
 from ..schemas.cv_schema import CVSchema, CVStatus
+from ..schemas.stats_schema import PositionStatsSchema, ProjectStatsSchema
+from .cv_controller import _validate_permissions
 from ..schemas.dashboard import (
     ProjectDashboardResponseInterface,
-    PositionDashboardResponseInterface
+    PositionDashboardResponseInterface,
+    PositionAnalyticsResponseInterface
 )
+from ..providers import write_batch
+from ..providers.transaction_provider import Transaction, arun_transaction
+from ..utils.counters import add_counts
+from ..utils.analytics import ScoreMatrix
+from ..utils.constants import SCORE_FIELDS, SCORE_BINS, ANALYTICS_BIN_EDGES, ANALYTICS_PERCENTILES
+
+
+def _fill(counts: Dict[str, int], keys: List[AnyStr]) -> Dict[str, int]:
+    # Counters only hold the keys that were incremented
+    return {key: counts.get(key, 0) for key in keys}
+
+
+async def _rebuild_position_stats(position: PositionSchema, project_id: AnyStr | None) -> PositionStatsSchema:
+    '''
+    Count the CVs of a position into its counters.
+    CVs and positions created before the counters existed get their parent
+    id first, so their updates from then on are counted. The counts are
+    written in a transaction over the CVs and counters they are built from,
+    so a concurrent update is never lost.
+    '''
+    project_id = project_id or position.project_id
+    cvs = await CVSchema.afind_by_ids(position.cvs)
+    async with write_batch():
+        for cv in cvs:
+            if cv.position_id != position.id:
+                await cv.aupdate_position(position.id)
+        if project_id and position.project_id != project_id:
+            await position.aupdate_project(project_id)
+
+    async def rebuild(transaction: Transaction):
+        cvs = await CVSchema.afind_by_ids_in(transaction, position.cvs)
+        return await PositionStatsSchema.arebuild(
+            transaction, position.id, project_id, PositionSchema.cv_counts(cvs))
+    return await arun_transaction(rebuild)
+
+
+async def _rebuild_project_stats(project: ProjectSchema) -> ProjectStatsSchema:
+    '''
+    Sum the counters of the positions of a project into its counters,
+    in a transaction like _rebuild_position_stats.
+    '''
+    positions = await PositionSchema.afind_all_by_ids(project.positions)
+    for position in positions:
+        stats = await PositionStatsSchema.afind_by_id(position.id)
+        if stats is None:
+            await _rebuild_position_stats(position, project.id)
+        elif stats.project_id != project.id:
+            async with write_batch():
+                await stats.aupdate_project(project.id)
+                await position.aupdate_project(project.id)
+
+    async def rebuild(transaction: Transaction):
+        positions = await PositionSchema.afind_all_by_ids_in(transaction, project.positions)
+        stats = await PositionStatsSchema.afind_by_ids_in(transaction, [position.id for position in positions])
+        counts = {}
+        for position in positions:
+            counts = add_counts(counts, ProjectStatsSchema.position_counts(
+                position.status.value, stats.get(position.id)))
+        return await ProjectStatsSchema.arebuild(transaction, project.id, counts)
+    return await arun_transaction(rebuild)
 
 
 async def get_project_dashboard_stats(project_id: str, user: UserSchema) -> Dict:
@@ -26,47 +89,21 @@ async def get_project_dashboard_stats(project_id: str, user: UserSchema) -> Dict
         )
     
     # Get project
-    project = ProjectSchema.find_by_id(project_id)
+    project = await ProjectSchema.afind_by_id(project_id)
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Project not found."
         )
     
-    # Get all positions
-    positions = PositionSchema.find_all_by_ids(project.positions)
-    
-    # Initialize counters
-    total_cvs = 0
-    position_status_counts = {
-        "open": 0,
-        "processing": 0,
-        "closed": 0,
-        "cancelled": 0
-    }
-    cv_status_counts = {
-        "APPLYING": 0,
-        "ACCEPTED": 0,
-        "INTERVIEWING": 0,
-        "HIRED": 0
-    }
-    
-    # Count CVs and statuses
-    for position in positions:
-        # Count position statuses
-        position_status_counts[position.status.value] += 1
-        
-        # Count CVs and their statuses
-        cvs = CVSchema.find_by_ids(position.cvs)
-        total_cvs += len(cvs)
-        for cv in cvs:
-            cv_status_counts[cv.status.value] += 1
-    
+    # Read the counters of the project, built once from its positions
+    stats = await ProjectStatsSchema.afind_by_id(project.id) or await _rebuild_project_stats(project)
+
     response = ProjectDashboardResponseInterface(
-        total_positions=len(positions),
-        total_cvs=total_cvs,
-        position_status_counts=position_status_counts,
-        cv_status_counts=cv_status_counts
+        total_positions=stats.total_positions,
+        total_cvs=stats.total_cvs,
+        position_status_counts=_fill(stats.position_status, [status.value for status in PositionStatus]),
+        cv_status_counts=_fill(stats.cv_status, [status.value for status in CVStatus])
     )
     return response.dict()
 
@@ -87,7 +124,7 @@ async def get_position_dashboard_stats(project_id: str, position_id: str, user:
         )
     
     # Get project
-    project = ProjectSchema.find_by_id(project_id)
+    project = await ProjectSchema.afind_by_id(project_id)
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -95,186 +132,73 @@ async def get_position_dashboard_stats(project_id: str, position_id: str, user:
         )
     
     # Get position
-    position = PositionSchema.find_by_id(position_id)
+    position = await PositionSchema.afind_by_id(position_id)
     if not position:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Position not found."
         )
     
-    # Get all CVs
-    cvs = CVSchema.find_by_ids(position.cvs)
-    
-    # Initialize counters
-    cv_status_counts = {
-        "APPLYING": 0,
-        "ACCEPTED": 0,
-        "INTERVIEWING": 0,
-        "HIRED": 0
-    }
-    
-    # Count CV statuses and collect matching scores
-    matching_scores = []
-    for cv in cvs:
-        cv_status_counts[cv.status.value] += 1
-        if cv.matching and isinstance(cv.matching, dict):
-            overall_result = cv.matching.get("overall_result")
-            matching_scores.append(overall_result)
-
-    # Overall result has: education_score, language_skills_score, technical_skills_score, personal_projects_score, work_experience_score, publications_score, overall_score
-    # Calculate score distribution for each score
-
-    education_score_distribution = {
-        "0-20": 0,
-        "21-40": 0,
-        "41-60": 0,
-        "61-80": 0,
-        "81-100": 0
-    }
-    language_skills_score_distribution = {
-        "0-20": 0,
-        "21-40": 0,
-        "41-60": 0,
-        "61-80": 0,
-        "81-100": 0
-    }   
-    technical_skills_score_distribution = {
-        "0-20": 0,
-        "21-40": 0,
-        "41-60": 0,
-        "61-80": 0,
-        "81-100": 0
-    }   
-    personal_projects_score_distribution = {
-        "0-20": 0,
-        "21-40": 0,
-        "41-60": 0,
-        "61-80": 0,
-        "81-100": 0
-    }           
-    work_experience_score_distribution = {
-        "0-20": 0,
-        "21-40": 0,
-        "41-60": 0,
-        "61-80": 0,
-        "81-100": 0
-    }               
-    publications_score_distribution = {
-        "0-20": 0,
-        "21-40": 0,
-        "41-60": 0,
-        "61-80": 0,
-        "81-100": 0
-    }              
-    overall_score_distribution = {
-        "0-20": 0,
-        "21-40": 0,
-        "41-60": 0,
-        "61-80": 0,
-        "81-100": 0
-    }
-
-
-    for matching_score in matching_scores:
-        if matching_score and isinstance(matching_score, dict):
-            education_score = matching_score.get("education_score")
-            language_skills_score = matching_score.get("language_skills_score")
-            technical_skills_score = matching_score.get("technical_skills_score")
-            personal_projects_score = matching_score.get("personal_projects_score")
-            work_experience_score = matching_score.get("work_experience_score")
-            publications_score = matching_score.get("publications_score")
-            overall_score = matching_score.get("overall_score")
-            
-            if education_score <= 20:
-                education_score_distribution["0-20"] += 1
-            elif education_score <= 40:
-                education_score_distribution["21-40"] += 1
-            elif education_score <= 60:
-                education_score_distribution["41-60"] += 1
-            elif education_score <= 80:
-                education_score_distribution["61-80"] += 1
-            else:
-                education_score_distribution["81-100"] += 1
+    # Read the counters of the position, built once from its CVs
+    stats = await PositionStatsSchema.afind_by_id(position.id) or \
+        await _rebuild_position_stats(position, project.id if position.id in project.positions else None)
+    distributions = {field: _fill(stats.scores.get(field, {}), list(SCORE_BINS)) for field in SCORE_FIELDS}
 
-            if language_skills_score <= 20:
-                language_skills_score_distribution["0-20"] += 1
-            elif language_skills_score <= 40:
-                language_skills_score_distribution["21-40"] += 1
-            elif language_skills_score <= 60:
-                language_skills_score_distribution["41-60"] += 1
-            elif language_skills_score <= 80:
-                language_skills_score_distribution["61-80"] += 1
-            else:
-                language_skills_score_distribution["81-100"] += 1
-
-            if technical_skills_score <= 20:
-                technical_skills_score_distribution["0-20"] += 1
-            elif technical_skills_score <= 40:
-                technical_skills_score_distribution["21-40"] += 1
-            elif technical_skills_score <= 60:
-                technical_skills_score_distribution["41-60"] += 1
-            elif technical_skills_score <= 80:
-                technical_skills_score_distribution["61-80"] += 1
-            else:
-                technical_skills_score_distribution["81-100"] += 1
-
-            if personal_projects_score <= 20:
-                personal_projects_score_distribution["0-20"] += 1
-            elif personal_projects_score <= 40:
-                personal_projects_score_distribution["21-40"] += 1
-            elif personal_projects_score <= 60:
-                personal_projects_score_distribution["41-60"] += 1
-            elif personal_projects_score <= 80:
-                personal_projects_score_distribution["61-80"] += 1
-            else:
-                personal_projects_score_distribution["81-100"] += 1
+    response = PositionDashboardResponseInterface(
+        total_cvs=stats.total_cvs,
+        cv_status_counts=_fill(stats.cv_status, [status.value for status in CVStatus]),
+        education_score_distribution=distributions["education_score"],
+        language_skills_score_distribution=distributions["language_skills_score"],
+        technical_skills_score_distribution=distributions["technical_skills_score"],
+        personal_projects_score_distribution=distributions["personal_projects_score"],
+        work_experience_score_distribution=distributions["work_experience_score"],
+        publications_score_distribution=distributions["publications_score"],
+        matching_score_distribution=distributions["overall_score"]
+    )
+    return response.dict()
 
-            if work_experience_score <= 20:
-                work_experience_score_distribution["0-20"] += 1
-            elif work_experience_score <= 40:
-                work_experience_score_distribution["21-40"] += 1
-            elif work_experience_score <= 60:
-                work_experience_score_distribution["41-60"] += 1
-            elif work_experience_score <= 80:
-                work_experience_score_distribution["61-80"] += 1
-            else:
-                work_experience_score_distribution["81-100"] += 1
+async def get_position_analytics(
+    project_id: str,
+    position_id: str,
+    user: UserSchema,
+    bins: List[float] | None = None,
+    percentiles: List[float] | None = None
+) -> Dict:
+    """
+    Get position's score analytics:
+    - Histograms of each score with the given bin edges
+    - Count, mean, standard deviation, min, max and percentiles of each score
+    - Correlations between scores
+    """
+    bins = sorted(set(bins)) if bins else ANALYTICS_BIN_EDGES
+    percentiles = percentiles if percentiles is not None else ANALYTICS_PERCENTILES
+    if len(bins) < 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least two distinct bin edges are required."
+        )
+    if any(not 0 <= percentile <= 100 for percentile in percentiles):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Percentiles must be between 0 and 100."
+        )
 
-            if publications_score <= 20:
-                publications_score_distribution["0-20"] += 1
-            elif publications_score <= 40:
-                publications_score_distribution["21-40"] += 1
-            elif publications_score <= 60:
-                publications_score_distribution["41-60"] += 1
-            elif publications_score <= 80:
-                publications_score_distribution["61-80"] += 1
-            else:
-                publications_score_distribution["81-100"] += 1
+    # Validate the position belongs to a project of the user
+    _, position = await _validate_permissions(project_id, position_id, user)
 
-            if overall_score <= 20:
-                overall_score_distribution["0-20"] += 1
-            elif overall_score <= 40:
-                overall_score_distribution["21-40"] += 1
-            elif overall_score <= 60:
-                overall_score_distribution["41-60"] += 1
-            elif overall_score <= 80:
-                overall_score_distribution["61-80"] += 1
-            else:
-                overall_score_distribution["81-100"] += 1
+    # Load the scores once, every statistic is computed on the same matrix
+    scores = ScoreMatrix.from_results(await CVSchema.afind_scores_by_ids(position.cvs))
 
-    response = PositionDashboardResponseInterface(
-        total_cvs=len(cvs),
-        cv_status_counts=cv_status_counts,
-        education_score_distribution=education_score_distribution,
-        language_skills_score_distribution=language_skills_score_distribution,
-        technical_skills_score_distribution=technical_skills_score_distribution,
-        personal_projects_score_distribution=personal_projects_score_distribution,
-        work_experience_score_distribution=work_experience_score_distribution,
-        publications_score_distribution=publications_score_distribution,
-        matching_score_distribution=overall_score_distribution
+    response = PositionAnalyticsResponseInterface(
+        total_cvs=len(position.cvs),
+        scored_cvs=len(scores),
+        histograms=scores.histograms(bins),
+        summary=scores.describe(percentiles),
+        correlations=scores.correlations()
     )
     return response.dict()
 
+
     # Calculate matching score distribution
     # score_distribution = {
     #     "0-20": 0,
@@ -1,4 +1,3 @@
-import httpx
 from typing import AnyStr
 from pydantic import BaseModel
 from fastapi import HTTPException, status, BackgroundTasks
@@ -7,6 +6,7 @@ from ..schemas.project_schema import ProjectSchema
 from ..schemas.position_schema import PositionSchema
 from ..schemas.jd_schema import JDSchema
 from ..utils.extractor import get_jd_content
+from ..providers import http_client
 import logging
 import os
 
@@ -16,7 +16,7 @@ load_dotenv()
 processing_api_url = os.environ.get("PROCESSING_API_URL")
 
 
-def _validate_permission(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
+async def _validate_permission(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
     # Validate project id in user's projects
     if project_id not in user.projects and project_id not in user.shared:
         raise HTTPException(
@@ -25,7 +25,7 @@ def _validate_permission(project_id: AnyStr, position_id: AnyStr, user: UserSche
         )
 
     # Get project
-    project = ProjectSchema.find_by_id(project_id)
+    project = await ProjectSchema.afind_by_id(project_id)
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -40,7 +40,7 @@ def _validate_permission(project_id: AnyStr, position_id: AnyStr, user: UserSche
         )
 
     # Get position
-    position = PositionSchema.find_by_id(position_id)
+    position = await PositionSchema.afind_by_id(position_id)
     if not position:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -50,19 +50,19 @@ def _validate_permission(project_id: AnyStr, position_id: AnyStr, user: UserSche
     return project, position
 
 
-def get_current_jd(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
-    _, position = _validate_permission(project_id, position_id, user)
+async def get_current_jd(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
+    _, position = await _validate_permission(project_id, position_id, user)
 
     # Return null if no JD
     if not position.jd or position.jd == "":
-        jd_instance = JDSchema().create_jd()
+        jd_instance = await JDSchema().acreate_jd()
 
         # Update position
-        position.update_jd(jd_instance.id)
+        await position.aupdate_jd(jd_instance.id)
         return jd_instance
 
     # Get JD
-    jd = JDSchema.find_by_id(position.jd)
+    jd = await JDSchema.afind_by_id(position.jd)
     if not jd:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -81,8 +81,7 @@ async def _analyse_jd_content(content: AnyStr, jd: JDSchema, position: PositionS
     }
 
     # Call the AI service API
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(processing_api_url, json=processing_payload)
+    response = await http_client.post("processing", processing_api_url, json=processing_payload)
 
     # Check for successful response
     if response.status_code != 200:
@@ -96,24 +95,24 @@ async def _analyse_jd_content(content: AnyStr, jd: JDSchema, position: PositionS
     summary = processing_result[0].get("summary")
 
     # Update JD extraction
-    jd.update_summary(summary)
+    await jd.aupdate_summary(summary)
 
 
 async def _upload_jd_content(content: AnyStr, position: PositionSchema, llm_name):
     # Get current JD
-    jd_instance = JDSchema.find_by_id(position.jd)
+    jd_instance = await JDSchema.afind_by_id(position.jd)
     if not jd_instance:
         # Create instance
-        jd_instance = JDSchema(
+        jd_instance = await JDSchema(
             content=content
-        ).create_jd()
+        ).acreate_jd()
     else:
         # Update content
-        jd_instance.update_content(content)
+        await jd_instance.aupdate_content(content)
 
     # Update position
     if not position.jd or position.jd == "":
-        position.update_jd(jd_instance.id)
+        await position.aupdate_jd(jd_instance.id)
 
     # Parse content
     content = get_jd_content(content)
@@ -127,7 +126,7 @@ async def _upload_jd_content(content: AnyStr, position: PositionSchema, llm_name
 
 async def update_current_jd(project_id: AnyStr, position_id: AnyStr, data: BaseModel, user: UserSchema, llm_name: str):
     # Validate permission
-    _, position = _validate_permission(project_id, position_id, user)
+    _, position = await _validate_permission(project_id, position_id, user)
 
     # Upload JD content
     if data.content == "":
@@ -1,14 +1,16 @@
 from typing import AnyStr
 from pydantic import BaseModel
-from fastapi import HTTPException, status
+from fastapi import HTTPException, status, BackgroundTasks
 from ..schemas.user_schema import UserSchema
+from ..providers import write_batch
 from ..schemas.project_schema import ProjectSchema
 from ..schemas.position_schema import PositionSchema
 from ..schemas.jd_schema import JDSchema
-from ..controllers.cv_controller import delete_cvs_by_ids
+from ..schemas.stats_schema import PositionStatsSchema, ProjectStatsSchema
+from ..controllers.purge_controller import create_purge_job, run_purge_job
 
 
-def _validate_permissions(project_id: AnyStr, user: UserSchema):
+async def _validate_permissions(project_id: AnyStr, user: UserSchema):
     '''
     Validate if user has access to the project.
     '''
@@ -19,7 +21,7 @@ def _validate_permissions(project_id: AnyStr, user: UserSchema):
         )
 
     # Get project by id
-    project = ProjectSchema.find_by_id(project_id)
+    project = await ProjectSchema.afind_by_id(project_id)
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -28,24 +30,31 @@ def _validate_permissions(project_id: AnyStr, user: UserSchema):
 
     return project
 
-def get_all_positions_by_ids(project_id: AnyStr, user: UserSchema):
+async def get_all_positions_by_ids(project_id: AnyStr, user: UserSchema, limit: int | None = None, cursor: AnyStr | None = None):
     '''
-    Get all positions by the list of position ids.
+    Get one page of positions by the list of position ids, and the cursor
+    of the next page. Without limit, every position after the cursor.
     '''
     # Validate if user has access to the project
-    project = _validate_permissions(project_id, user)
+    project = await _validate_permissions(project_id, user)
 
-    # Get all positions by ids
-    positions = PositionSchema.find_all_by_ids(project.positions)
+    # Get the positions of the page by ids
+    try:
+        positions, next_cursor = await PositionSchema.afind_page_by_ids(project.positions, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
-    return positions
+    return positions, next_cursor
 
-def get_position_by_id(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
+async def get_position_by_id(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
     '''
     Get position by id.
     '''
     # Validate if user has access to the project
-    project = _validate_permissions(project_id, user)
+    project = await _validate_permissions(project_id, user)
 
     # Check if position exists
     if position_id not in project.positions:
@@ -55,7 +64,7 @@ def get_position_by_id(project_id: AnyStr, position_id: AnyStr, user: UserSchema
         )
 
     # Get position by id
-    position = PositionSchema.find_by_id(position_id)
+    position = await PositionSchema.afind_by_id(position_id)
     if not position:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -64,12 +73,12 @@ def get_position_by_id(project_id: AnyStr, position_id: AnyStr, user: UserSchema
 
     return position
 
-def get_public_position_by_id(position_id: AnyStr):
+async def get_public_position_by_id(position_id: AnyStr):
     '''
     Get public position by id.
     '''
     # Get position by id
-    position = PositionSchema.find_by_id(position_id)
+    position = await PositionSchema.afind_by_id(position_id)
     if not position:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -78,11 +87,11 @@ def get_public_position_by_id(position_id: AnyStr):
 
     # Get JD Data
     if not position.jd or position.jd == "":
-        jd_instance = JDSchema().create_jd()
+        jd_instance = await JDSchema().acreate_jd()
         # Update position
-        position.update_jd(jd_instance.id)
+        await position.aupdate_jd(jd_instance.id)
     else:
-        jd_instance = JDSchema.find_by_id(position.jd)
+        jd_instance = await JDSchema.afind_by_id(position.jd)
         if not jd_instance:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -94,35 +103,37 @@ def get_public_position_by_id(position_id: AnyStr):
 
     return position
 
-def create_new_position(project_id: AnyStr, data: BaseModel, user: UserSchema):
+async def create_new_position(project_id: AnyStr, data: BaseModel, user: UserSchema):
     '''
     Create a new position.
     '''
     # Validate if user has access to the project
-    project = _validate_permissions(project_id, user)
-
-    # Create new position in database
-    position = PositionSchema(
-        name=data.name,
-        alias=data.alias,
-        description=data.description,
-        start_date=data.start_date,
-        end_date=data.end_date,
-        cvs=[],
-        jd="",
-    ).create_position()
-
-    # Update position of project in database
-    project.update_positions(position.id, is_add=True)
+    project = await _validate_permissions(project_id, user)
+
+    async with write_batch():
+        # Create new position in database
+        position = await PositionSchema(
+            name=data.name,
+            alias=data.alias,
+            description=data.description,
+            start_date=data.start_date,
+            end_date=data.end_date,
+            cvs=[],
+            jd="",
+            project_id=project.id,
+        ).acreate_position()
+
+        # Update position of project in database
+        await project.aupdate_positions(position.id, is_add=True)
 
     return position
 
-def update_current_position(project_id: AnyStr, position_id: AnyStr, data: BaseModel, user: UserSchema):
+async def update_current_position(project_id: AnyStr, position_id: AnyStr, data: BaseModel, user: UserSchema):
     '''
     Update current position.
     '''
     # Validate if user has access to the project
-    project = _validate_permissions(project_id, user)
+    project = await _validate_permissions(project_id, user)
 
     # Check if position exists
     if position_id not in project.positions:
@@ -132,7 +143,7 @@ def update_current_position(project_id: AnyStr, position_id: AnyStr, data: BaseM
         )
 
     # Get position by id
-    position = PositionSchema.find_by_id(position_id)
+    position = await PositionSchema.afind_by_id(position_id)
     if not position:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -140,14 +151,14 @@ def update_current_position(project_id: AnyStr, position_id: AnyStr, data: BaseM
         )
 
     # Update position in database
-    position.update_position(data=data.model_dump(exclude_defaults=True))
+    await position.aupdate_position(data=data.model_dump(exclude_defaults=True))
 
-def update_status_current_position(project_id: AnyStr, position_id: AnyStr, user: UserSchema, is_closed: bool):
+async def update_status_current_position(project_id: AnyStr, position_id: AnyStr, user: UserSchema, is_closed: bool):
     '''
     Open or Close current position.
     '''
     # Validate if user has access to the project
-    project = _validate_permissions(project_id, user)
+    project = await _validate_permissions(project_id, user)
 
     # Check if position exists
     if position_id not in project.positions:
@@ -157,7 +168,7 @@ def update_status_current_position(project_id: AnyStr, position_id: AnyStr, user
         )
 
     # Get position by id
-    position = PositionSchema.find_by_id(position_id)
+    position = await PositionSchema.afind_by_id(position_id)
     if not position:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -166,31 +177,17 @@ def update_status_current_position(project_id: AnyStr, position_id: AnyStr, user
 
     # Update position in database
     if is_closed:
-        position.update_status("closed")
+        await position.aupdate_status("closed")
     else:
-        position.update_status("open")
-
-def delete_positions_by_ids(position_ids: list[AnyStr]):
-    # Iterate over all positions id
-    for position_id in position_ids:
-        # Find position by id
-        position = PositionSchema.find_by_id(position_id)
-        if position:
-            # Delete position
-            position.delete_position()
-            # Delete JD by Id
-            jd_instance = JDSchema.find_by_id(position.jd)
-            if jd_instance:
-                jd_instance.delete_jd()
-            # Delete CVs by Ids
-            delete_cvs_by_ids(position.cvs)
-
-def delete_current_position(project_id: AnyStr, position_id: AnyStr, user: UserSchema):
+        await position.aupdate_status("open")
+
+async def delete_current_position(project_id: AnyStr, position_id: AnyStr, user: UserSchema, bg_tasks: BackgroundTasks):
     '''
     Delete current position.
+    Its JD and CVs are purged by a background job, return its id.
     '''
     # Validate if user has access to the project
-    project = _validate_permissions(project_id, user)
+    project = await _validate_permissions(project_id, user)
 
     # Check if position exists
     if position_id not in project.positions:
@@ -200,23 +197,19 @@ def delete_current_position(project_id: AnyStr, position_id: AnyStr, user: UserS
         )
 
     # Get position by id
-    position = PositionSchema.find_by_id(position_id)
+    position = await PositionSchema.afind_by_id(position_id)
     if not position:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Hiring Request not found."
         )
 
-    # Delete postion from database
-    position.delete_position()
-
     # Update position of project in database
-    project.update_positions(position_id, is_add=False)
-
-    # Delete JD by Id
-    jd_instance = JDSchema.find_by_id(position.jd)
-    if jd_instance:
-        jd_instance.delete_jd()
-
-    # Delete CVs by Ids
-    delete_cvs_by_ids(position.cvs)
+    await project.aupdate_positions(position_id, is_add=False)
+    await ProjectStatsSchema.aremove_position(
+        project.id, position.status.value, await PositionStatsSchema.afind_by_id(position_id))
+
+    # Purge position, JD and CVs in the background
+    job = await create_purge_job(user.id, project.id, position_ids=[position_id])
+    bg_tasks.add_task(run_purge_job, job.id)
+    return job.id
@@ -1,66 +1,59 @@
 from typing import AnyStr, Dict
 from pydantic import BaseModel
-from fastapi import HTTPException, status
+from fastapi import HTTPException, status, BackgroundTasks
 from .user_controller import get_all_users_by_ids
-from .position_controller import delete_positions_by_ids
+from .purge_controller import create_purge_job, run_purge_job
 from ..interfaces.project_interface import TypeGetAllProjects
 from ..schemas.user_schema import UserSchema
+from ..providers import write_batch
 from ..schemas.project_schema import ProjectSchema
 
 
-def get_all_projects_by_ids(user: UserSchema, get_type: TypeGetAllProjects):
+async def get_all_projects_by_ids(user: UserSchema, get_type: TypeGetAllProjects, limit: int | None = None, cursor: AnyStr | None = None):
     '''
-    Get all projects by the list of project ids.
+    Get one page of projects by the list of project ids, and the cursor
+    of the next page. Without limit, every project after the cursor.
     '''
     if get_type == "owned":
-        if not user.projects or len(user.projects) == 0:
-            return []
-
-        projects = ProjectSchema.find_all_by_ids(user.projects)
-
-        # Fetch member data for each project
-        for project in projects:
-            project.members = get_all_users_by_ids(project.members, user)
-
+        project_ids = user.projects
     elif get_type == "shared":
-        if not user.shared or len(user.shared) == 0:
-            return []
-
-        projects = ProjectSchema.find_all_by_ids(user.shared)
-
-        # Fetch member data for each project
-        for project in projects:
-            project.members = get_all_users_by_ids(project.members, user)
-
+        project_ids = user.shared
     elif get_type == "deleted":
-        if not user.trash or len(user.trash) == 0:
-            return []
-
-        projects = ProjectSchema.find_all_by_ids(user.trash)
-
-        # Fetch member data for each project
-        for project in projects:
-            project.members = get_all_users_by_ids(project.members, user)
-
+        project_ids = user.trash
     else:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid get type",
         )
 
-    return projects
+    if not project_ids or len(project_ids) == 0:
+        return [], None
+
+    try:
+        projects, next_cursor = await ProjectSchema.afind_page_by_ids(project_ids, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    # Fetch member data for each project of the page
+    for project in projects:
+        project.members = await get_all_users_by_ids(project.members, user)
+
+    return projects, next_cursor
 
 
 # Get project by project id
 # If the use_alias is True, get project by alias and check permission
 # If the use_alias is False, check permission and get project by id
-def get_project_by_id(project_id: AnyStr, use_alias: bool, user: UserSchema):
+async def get_project_by_id(project_id: AnyStr, use_alias: bool, user: UserSchema):
     '''
     Get project by id.
     '''
     # If use alias is True, fetch user and check permission
     if use_alias:
-        project = ProjectSchema.find_by_alias(project_id)
+        project = await ProjectSchema.afind_by_alias(project_id)
 
         # If project not found, return 404
         if not project:
@@ -85,7 +78,7 @@ def get_project_by_id(project_id: AnyStr, use_alias: bool, user: UserSchema):
                 detail="You don't have access permission to this project",
             )
 
-        project = ProjectSchema.find_by_id(project_id)
+        project = await ProjectSchema.afind_by_id(project_id)
 
         if not project:
             raise HTTPException(
@@ -94,7 +87,7 @@ def get_project_by_id(project_id: AnyStr, use_alias: bool, user: UserSchema):
             )
 
     # Fetch member data
-    project.members = get_all_users_by_ids(project.members, user)
+    project.members = await get_all_users_by_ids(project.members, user)
 
     return project
 
@@ -102,27 +95,28 @@ def get_project_by_id(project_id: AnyStr, use_alias: bool, user: UserSchema):
 # Create new project
 # Update project id to user's projects in cache
 # Update projects list in cache
-def create_new_project(data: Dict, user: UserSchema):
+async def create_new_project(data: Dict, user: UserSchema):
     '''
     Create new project.
     '''
-    # Create new project in database
-    project = ProjectSchema(
-        name=data.name,
-        alias=data.alias,
-        description=data.description,
-        owner=user.id,
-        positions=[]
-    ).create_project()
+    async with write_batch():
+        # Create new project in database
+        project = await ProjectSchema(
+            name=data.name,
+            alias=data.alias,
+            description=data.description,
+            owner=user.id,
+            positions=[]
+        ).acreate_project()
 
-    # Update user in database
-    user.update_user_projects(project.id, is_add=True)
+        # Update user in database
+        await user.aupdate_user_projects(project.id, is_add=True)
 
     return project
 
 
 # Update project name, alias, and description
-def update_current_project(project_id: AnyStr, data: BaseModel, user: UserSchema):
+async def update_current_project(project_id: AnyStr, data: BaseModel, user: UserSchema):
     '''
     Update current project.
     '''
@@ -134,7 +128,7 @@ def update_current_project(project_id: AnyStr, data: BaseModel, user: UserSchema
         )
 
     # Get project by id
-    project = ProjectSchema.find_by_id(project_id)
+    project = await ProjectSchema.afind_by_id(project_id)
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -142,11 +136,11 @@ def update_current_project(project_id: AnyStr, data: BaseModel, user: UserSchema
         )
 
     # Update project in database
-    project.update_project(data=data.model_dump(exclude_defaults=True))
+    await project.aupdate_project(data=data.model_dump(exclude_defaults=True))
 
 
 # Update member permission of the project
-def update_member_project(project_id: AnyStr, data: BaseModel, user: UserSchema):
+async def update_member_project(project_id: AnyStr, data: BaseModel, user: UserSchema):
     '''
     Update member permission of the project.
     '''
@@ -158,46 +152,31 @@ def update_member_project(project_id: AnyStr, data: BaseModel, user: UserSchema)
         )
 
     # Get project by id
-    project = ProjectSchema.find_by_id(project_id)
+    project = await ProjectSchema.afind_by_id(project_id)
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Project not found."
         )
 
-    if data.is_add:
+    # Project and members are updated in one batch
+    members = await UserSchema.afind_all_by_ids(data.members)
+    async with write_batch():
         # Update project in database
-        project.update_members(data.members, is_add=data.is_add)
+        await project.aupdate_members(data.members, is_add=data.is_add)
 
         # Iterate through members and update user in database
-        for member_id in data.members:
-            # Get user by id
-            member = UserSchema.find_by_id(member_id)
-            if not member:
-                continue
-            if project.id not in member.shared:
-                member.update_user_projects(
+        for member in members:
+            if (project.id in member.shared) != data.is_add:
+                await member.aupdate_user_projects(
                     project.id, is_add=data.is_add, key="shared")
 
-    else:
-        # Iterate through members and update user in database
-        for member_id in data.members:
-            # Get user by id
-            member = UserSchema.find_by_id(member_id)
-            if not member:
-                continue
-            if project.id in member.shared:
-                member.update_user_projects(
-                    project.id, is_add=data.is_add, key="shared")
-
-        # Update project in database
-        project.update_members(data.members, is_add=data.is_add)
-
 
 # Delete project
-def delete_current_project(project_id: AnyStr, user: UserSchema, is_purge: bool = False):
+async def delete_current_project(project_id: AnyStr, user: UserSchema, is_purge: bool = False, bg_tasks: BackgroundTasks = None):
     '''
     Delete current project.
+    A purge runs as a background job, return its id.
     '''
     # Check if user has access to the project
     if project_id not in user.projects:
@@ -214,7 +193,7 @@ def delete_current_project(project_id: AnyStr, user: UserSchema, is_purge: bool
             )
 
     # Get project by id
-    project = ProjectSchema.find_by_id(project_id)
+    project = await ProjectSchema.afind_by_id(project_id)
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -222,20 +201,20 @@ def delete_current_project(project_id: AnyStr, user: UserSchema, is_purge: bool
         )
 
     if is_purge:
-        # Purge project in database
-        project.delete_project()
-        # Delete position by Ids
-        delete_positions_by_ids(project.positions)
+        # Purge project and everything under it in the background
+        job = await create_purge_job(user.id, project.id, project_ids=[project.id])
         # Update user in database
-        user.update_user_projects(project.id, is_add=False, key="trash")
+        await user.aupdate_user_projects(project.id, is_add=False, key="trash")
+        bg_tasks.add_task(run_purge_job, job.id)
+        return job.id
     else:
         # Update user in database
-        user.update_user_projects(project.id, is_add=True, key="trash")
-        user.update_user_projects(project.id, is_add=False, key="projects")
+        await user.aupdate_user_projects(project.id, is_add=True, key="trash")
+        await user.aupdate_user_projects(project.id, is_add=False, key="projects")
 
 
 # Restore project
-def restore_current_project(project_id: AnyStr, user: UserSchema):
+async def restore_current_project(project_id: AnyStr, user: UserSchema):
     '''
     Restore current project.
     '''
@@ -247,7 +226,7 @@ def restore_current_project(project_id: AnyStr, user: UserSchema):
         )
 
     # Get project by id
-    project = ProjectSchema.find_by_id(project_id)
+    project = await ProjectSchema.afind_by_id(project_id)
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -255,5 +234,5 @@ def restore_current_project(project_id: AnyStr, user: UserSchema):
         )
 
     # Update user in database
-    user.update_user_projects(project.id, is_add=True, key="projects")
-    user.update_user_projects(project.id, is_add=False, key="trash")
+    await user.aupdate_user_projects(project.id, is_add=True, key="projects")
+    await user.aupdate_user_projects(project.id, is_add=False, key="trash")
@@ -0,0 +1,233 @@
+from typing import Any, AnyStr, Dict, List
+import os
+import uuid
+import time
+import asyncio
+from fastapi import HTTPException, status
+from google.api_core.exceptions import NotFound
+from ..schemas.cv_schema import CVSchema
+from ..schemas.jd_schema import JDSchema
+from ..schemas.position_schema import PositionSchema
+from ..schemas.project_schema import ProjectSchema
+from ..schemas.purge_job_schema import PurgeJobSchema, PurgeStatus
+from ..schemas.stats_schema import PositionStatsSchema, ProjectStatsSchema
+from ..schemas.user_schema import UserSchema
+from ..providers import storage_db, content_cache, write_batch
+from ..providers.batch_provider import MAX_BATCH_OPS
+from ..providers.transaction_provider import Transaction, arun_transaction
+from ..utils.logger import log_firebase
+from ..utils.constants import (
+    CV_COLLECTION,
+    JD_COLLECTION,
+    POSITION_COLLECTION,
+    PROJECT_COLLECTION,
+    POSITION_STATS_COLLECTION,
+    PROJECT_STATS_COLLECTION,
+    PURGE_BLOB_CONCURRENCY,
+    PURGE_BLOB_CHUNK_SIZE,
+    PURGE_LEASE_TTL,
+    PURGE_MAX_ATTEMPTS
+)
+
+blob_concurrency = int(os.environ.get("PURGE_BLOB_CONCURRENCY", PURGE_BLOB_CONCURRENCY))
+blob_chunk_size = int(os.environ.get("PURGE_BLOB_CHUNK_SIZE", PURGE_BLOB_CHUNK_SIZE))
+lease_ttl = float(os.environ.get("PURGE_LEASE_TTL", PURGE_LEASE_TTL))
+max_attempts = int(os.environ.get("PURGE_MAX_ATTEMPTS", PURGE_MAX_ATTEMPTS))
+
+# Owner of the purge leases taken by this instance
+worker_id = uuid.uuid4().hex
+
+# Children are deleted before their parents
+purge_order = [
+    (CV_COLLECTION, CVSchema),
+    (JD_COLLECTION, JDSchema),
+    (POSITION_COLLECTION, PositionSchema),
+    (PROJECT_COLLECTION, ProjectSchema),
+    (POSITION_STATS_COLLECTION, PositionStatsSchema),
+    (PROJECT_STATS_COLLECTION, ProjectStatsSchema),
+]
+purge_schemas = dict(purge_order)
+
+# Writes of a document chunk batch besides the deletes: the chunk and the job
+document_chunk_size = MAX_BATCH_OPS - 2
+
+
+class LeaseLostError(Exception):
+    '''
+    Another instance took over the purge job.
+    '''
+
+
+async def create_purge_job(
+    user_id: AnyStr,
+    project_id: AnyStr,
+    project_ids: List[AnyStr] = [],
+    position_ids: List[AnyStr] = [],
+    cv_ids: List[AnyStr] = []
+) -> PurgeJobSchema:
+    '''
+    Record a purge of projects, positions and CVs with everything under them,
+    requested by user_id in project_id.
+    Run it with run_purge_job.
+    '''
+    job = PurgeJobSchema(user_id=user_id, project_id=project_id, roots={
+        "projects": list(project_ids),
+        "positions": list(position_ids),
+        "cvs": list(cv_ids)
+    })
+    return await job.acreate_job()
+
+
+def _chunks(kind: AnyStr, ids: List[AnyStr], size: int) -> List[Dict[str, Any]]:
+    return [{"kind": kind, "ids": ids[i:i + size], "size": len(ids[i:i + size]), "released": False}
+            for i in range(0, len(ids), size)]
+
+
+async def _collect(job: PurgeJobSchema):
+    '''
+    Collect the documents and blobs under the roots of the job into its plan.
+    Blob references are only released when their chunk is removed.
+    '''
+    projects = await ProjectSchema.afind_all_by_ids(job.roots.get("projects", []))
+    position_ids = list(job.roots.get("positions", []))
+    for project in projects:
+        position_ids += project.positions or []
+    positions = await PositionSchema.afind_all_by_ids(list(dict.fromkeys(position_ids)))
+
+    cv_ids = list(job.roots.get("cvs", []))
+    for position in positions:
+        cv_ids += position.cvs or []
+    cvs = await CVSchema.afind_by_ids(list(dict.fromkeys(cv_ids)))
+
+    documents = {
+        CV_COLLECTION: [cv.id for cv in cvs],
+        JD_COLLECTION: list(dict.fromkeys(position.jd for position in positions
+                                          if isinstance(position.jd, str) and position.jd)),
+        POSITION_COLLECTION: [position.id for position in positions],
+        PROJECT_COLLECTION: [project.id for project in projects],
+        POSITION_STATS_COLLECTION: [position.id for position in positions],
+        PROJECT_STATS_COLLECTION: [project.id for project in projects]
+    }
+    # One path per CV, a shared blob is listed once per CV referencing it
+    chunks = _chunks("blobs", [cv.path for cv in cvs if cv.path], blob_chunk_size)
+    for collection, _ in purge_order:
+        chunks += _chunks(collection, documents[collection], document_chunk_size)
+    await job.aset_plan(chunks)
+
+
+async def _remove_blob(path: AnyStr, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        try:
+            await asyncio.to_thread(storage_db.remove, path)
+        except NotFound:
+            # Removed before the job was interrupted
+            pass
+
+
+async def _release_blobs(job: PurgeJobSchema, chunk: Dict[str, Any]) -> List[AnyStr]:
+    '''
+    Release the blob references of a chunk and keep only the blobs to remove
+    in it, in one transaction: a chunk releases its references once even if
+    two instances run it.
+    '''
+    plan_adb = job.plan_adb
+
+    async def release(transaction: Transaction):
+        data = await transaction.aget(plan_adb, chunk["id"])
+        if data is None or data.get("released"):
+            return data
+        blobs = [(storage_db.get_content_digest(path), path) for path in data["ids"]]
+        paths = [path for digest, path in blobs if digest is None]
+        paths += await content_cache.arelease_blobs(
+            transaction, [blob for blob in blobs if blob[0] is not None])
+        data = {**data, "ids": list(dict.fromkeys(paths)), "released": True}
+        transaction.set(plan_adb, chunk["id"], data)
+        return data
+
+    data = await arun_transaction(release)
+    return data["ids"] if data else []
+
+
+async def _remove_blobs(job: PurgeJobSchema, chunk: Dict[str, Any]):
+    '''
+    Remove the blobs of a chunk concurrently.
+    Failed blobs stay in the chunk and fail the job.
+    '''
+    paths = await _release_blobs(job, chunk)
+    semaphore = asyncio.Semaphore(blob_concurrency)
+    results = await asyncio.gather(
+        *[_remove_blob(path, semaphore) for path in paths], return_exceptions=True)
+    errors = [(path, result) for path, result in zip(paths, results) if isinstance(result, Exception)]
+    if errors:
+        await job.aupdate_chunk(chunk["id"], {"ids": [path for path, _ in errors]})
+        raise errors[0][1]
+    await job.aremove_chunk(chunk["id"], chunk.get("size", len(chunk["ids"])))
+
+
+async def _delete_documents(job: PurgeJobSchema, chunk: Dict[str, Any]):
+    '''
+    Delete the documents of a chunk in one batched write, which also drops
+    the chunk from the plan, so a resumed job never deletes a chunk twice.
+    '''
+    async with write_batch():
+        await purge_schemas[chunk["kind"]].adelete_by_ids(chunk["ids"])
+        await job.aremove_chunk(chunk["id"], chunk.get("size", len(chunk["ids"])))
+
+
+async def run_purge_job(job_id: AnyStr):
+    '''
+    Run or resume a purge job, if this instance can claim it.
+    Every step only works on what the plan of the job has left, so running
+    a job again after an interruption continues where it stopped.
+    '''
+    job = await PurgeJobSchema.afind_by_id(job_id)
+    if not job or not await job.aclaim(worker_id, lease_ttl, max_attempts):
+        return
+
+    try:
+        if not job.collected:
+            await _collect(job)
+        for chunk in await job.afind_plan():
+            if chunk["kind"] == "blobs":
+                await _remove_blobs(job, chunk)
+            else:
+                await _delete_documents(job, chunk)
+            if not await job.arenew_lease(worker_id, lease_ttl):
+                raise LeaseLostError()
+    except LeaseLostError:
+        log_firebase(f"Purge {job_id} was taken over by another instance")
+        return
+    except Exception as e:
+        log_firebase(f"Purge {job_id} failed. {str(e)}")
+        await job.aupdate_status(PurgeStatus.FAILED, str(e))
+        return
+
+    await job.aupdate_status(PurgeStatus.COMPLETED)
+    log_firebase(f"Purge {job_id} deleted {job.done} blobs and documents")
+
+
+async def resume_purge_jobs():
+    '''
+    Resume the purge jobs interrupted or failed on a previous run, unless
+    another instance is running them or they ran out of attempts.
+    '''
+    for job in await PurgeJobSchema.afind_unfinished():
+        if not job.is_claimable(worker_id, max_attempts, time.time()):
+            continue
+        log_firebase(f"Resuming purge {job.id} at {job.done}/{job.total}")
+        await run_purge_job(job.id)
+
+
+async def get_purge_progress(job_id: AnyStr, user: UserSchema):
+    job = await PurgeJobSchema.afind_by_id(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Purge job not found."
+        )
+    if not job.can_access(user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have access to this purge job."
+        )
+    return job.to_progress()
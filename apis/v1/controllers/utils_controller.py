@@ -1,5 +1,6 @@
-from ..providers import cacher, memory_cacher
-from ..utils.extractor import get_cv_content
+from fastapi import HTTPException, status
+from ..providers import cacher, extraction_pool, content_cache, http_client, auth_cache, invalidations
+from ..utils.extractor import ExtractionError, ExtractionTimeout
 
 
 def clear_cache_control():
@@ -9,10 +10,36 @@ def clear_cache_control():
     cacher.reset_cache()
 
 
-def extract_content_control(filedata: bytes, filename: str):
-    # Save file to cache folder
-    cache_file_path = memory_cacher.save_cache_file(filedata, filename)
-    cv_content = get_cv_content(cache_file_path)
-    memory_cacher.remove_cache_file(filename)
+def get_cache_stats_control():
+    '''
+    Get cache statistics.
+    '''
+    return {
+        **cacher.get_stats(),
+        "content": content_cache.get_stats(),
+        "auth": auth_cache.get_stats(),
+        "invalidation": invalidations.get_stats()
+    }
+
+
+def get_http_stats_control():
+    '''
+    Get AI services client statistics.
+    '''
+    return http_client.get_stats()
+
 
-    return cv_content
+async def extract_content_control(filedata: bytes, filename: str):
+    # Extract in a worker process
+    try:
+        return await extraction_pool.extract(filedata, filename)
+    except ExtractionTimeout as e:
+        raise HTTPException(
+            status_code=status.HTTP_408_REQUEST_TIMEOUT,
+            detail=str(e)
+        )
+    except ExtractionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
@@ -1,12 +1,27 @@
-from typing import List, Dict
+from typing import List, Dict, Literal
 from fastapi import UploadFile, File
 from pydantic import BaseModel, Field
-from ..schemas.cv_schema import CVModel
+from ..schemas.cv_schema import CVModel, CVStatus
+from ..utils.constants import PAGE_MAX_LIMIT
+
+
+TypeExportFormat = Literal["csv", "ndjson", "parquet"]
+TypeExportColumns = Literal["summary", "matching"]
+TypeScoreField = Literal[
+    "education_score",
+    "language_skills_score",
+    "technical_skills_score",
+    "personal_projects_score",
+    "work_experience_score",
+    "publications_score",
+    "overall_score"
+]
 
 
 class CVsResponseInterface(BaseModel):
     msg: str = Field(..., description="Message response")
     data: list[CVModel] = Field(..., description="List of CVs")
+    next_cursor: str | None = Field(None, description="Cursor of the next page, None on the last page")
 
 
 class CVResponseInterface(BaseModel):
@@ -24,6 +39,32 @@ class CVDetailResponseInterface(BaseModel):
     data: Dict[str, Dict[str, float]] = Field(..., description="CV detail")
 
 
+class CVQueryInterface(BaseModel):
+    status: List[CVStatus] = Field([], description="CVs with one of these statuses, any status if empty")
+    labels: List[str] = Field([], description="CVs with every one of these labels")
+    min_scores: Dict[TypeScoreField, float] = Field({}, description="Lowest score of each field, included")
+    max_scores: Dict[TypeScoreField, float] = Field({}, description="Highest score of each field, included")
+    sort_by: TypeScoreField | None = Field(None, description="Score to sort by, the order CVs were added if None")
+    order: Literal["asc", "desc"] = Field("desc", description="Sort order of sort_by")
+    top_k: int = Field(20, ge=1, le=PAGE_MAX_LIMIT, description="Number of CVs to return")
+
+
+class _CVQueryFacetsInterface(BaseModel):
+    status: Dict[str, int] = Field(..., description="Matching CVs per status")
+    labels: Dict[str, int] = Field(..., description="Matching CVs per label, most frequent first")
+
+
+class _CVQueryResultInterface(BaseModel):
+    total: int = Field(..., description="Number of matching CVs")
+    cvs: list[CVModel] = Field(..., description="First top_k matching CVs")
+    facets: _CVQueryFacetsInterface = Field(..., description="Counts of the matching CVs")
+
+
+class CVQueryResponseInterface(BaseModel):
+    msg: str = Field(..., description="Message response")
+    data: _CVQueryResultInterface = Field(..., description="Query result")
+
+
 class _CVUploadResponseInterface(BaseModel):
     progress_id: str = Field(...,
         description="Progress ID for watching upload progress")
@@ -6,6 +6,7 @@ from typing import Optional, List, Dict
 class PositionsResponseInterface(BaseModel):
     msg: str = Field(..., title="Response Message")
     data: list[PositionModel] = Field(..., title="List of Positions")
+    next_cursor: str | None = Field(None, title="Cursor of the next page, None on the last page")
 
 
 class PositionResponseInterface(BaseModel):
@@ -46,3 +47,16 @@ class PositionDashboardStats(BaseModel):
 class PositionDashboardResponseInterface(BaseModel):
     data: PositionDashboardStats
     message: Optional[str] = None
+
+
+class PositionAnalytics(BaseModel):
+    total_cvs: int
+    scored_cvs: int
+    histograms: Dict[str, Dict[str, int]]  # Score field to range (e.g. "0-20") to count
+    summary: Dict[str, Dict]  # Score field to count, mean, std, min, max and percentiles
+    correlations: Dict[str, Dict[str, Optional[float]]]  # Score field to score field to Pearson r
+
+
+class PositionAnalyticsResponseInterface(BaseModel):
+    data: PositionAnalytics
+    message: Optional[str] = None
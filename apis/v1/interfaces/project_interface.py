@@ -1,6 +1,7 @@
 from typing import Literal, Optional, List, Dict
 from pydantic import BaseModel, Field
 from ..schemas.project_schema import ProjectModel
+from ..schemas.purge_job_schema import PurgeJobModel
 
 
 TypeGetAllProjects = Literal["owned", "shared", "deleted"]
@@ -14,6 +15,7 @@ class ProjectResponseInterface(BaseModel):
 class ProjectsResponseInterface(BaseModel):
     msg: str = Field(..., title="Message")
     data: list[ProjectModel] = Field(..., title="Projects Data")
+    next_cursor: str | None = Field(None, title="Cursor of the next page, None on the last page")
 
 
 class CreateProjectInterface(BaseModel):
@@ -50,3 +52,8 @@ class ProjectDashboardStats(BaseModel):
 class ProjectDashboardResponseInterface(BaseModel):
     data: ProjectDashboardStats
     message: Optional[str] = None
+
+
+class PurgeJobResponseInterface(BaseModel):
+    msg: str = Field(..., title="Message")
+    data: PurgeJobModel = Field(..., title="Purge Job Progress")
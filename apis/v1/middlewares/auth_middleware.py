@@ -2,7 +2,8 @@ from typing import Annotated
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from ..schemas.user_schema import UserSchema
-from ..providers import cacher, jwt
+from ..providers import jwt, sessions, auth_cache, user_adb
+from ..providers.identity_map import identity_add
 
 
 security = HTTPBearer()
@@ -10,7 +11,7 @@ security = HTTPBearer()
 
 # Get the auth token from the request header,
 # parse token to get user data, and return the user data.
-def get_current_user(credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)]):
+async def get_current_user(credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)]):
     # Get token
     token = credentials.credentials
 
@@ -21,6 +22,19 @@ def get_current_user(credentials: Annotated[HTTPAuthorizationCredentials, Depend
             detail="Authorization Token is required",
         )
 
+    # Get from cache
+    cached = auth_cache.get(token)
+    if cached:
+        uid, sid, cached_user = cached
+        # Another worker may have logged the session out
+        if sessions.shared and not sessions.is_active(uid, sid):
+            auth_cache.invalidate_token(token)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid Token",
+            )
+        return identity_add(user_adb.collection_name, UserSchema.from_dict(cached_user))
+
     # Decrypted token to get user data.
     data = jwt.decrypt(token)
 
@@ -34,19 +48,15 @@ def get_current_user(credentials: Annotated[HTTPAuthorizationCredentials, Depend
     # Get user Id in token
     uid = data["id"]
 
-    # Check if user is active
-    active_users = cacher.get("active_users")
-    if not active_users:
-        active_users = []
-
-    if uid not in active_users:
+    # Check if the session is active
+    if not sessions.is_active(uid, data.get("sid")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid Token",
         )
 
     # Get user data
-    user = UserSchema.find_by_id(uid)
+    user = await UserSchema.afind_by_id(uid)
 
     # If user is not found, return Un-authorized.
     if not user:
@@ -55,4 +65,5 @@ def get_current_user(credentials: Annotated[HTTPAuthorizationCredentials, Depend
             detail="Invalid Token",
         )
 
+    auth_cache.set(token, uid, user.to_dict(include_id=True), expires_at=data.get("exp"), sid=data.get("sid"))
     return user
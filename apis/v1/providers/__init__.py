@@ -1,23 +1,136 @@
-from ._cache_init import cacher
+import os
+from ._cache_init import cacher, invalidations
 from .cache_provider import CacheProvider
+from .cache_backend import create_cache_backend
+from .batch_provider import write_batch
 from .jwt_provider import JWTProvider
 from .db_provider import DatabaseProvider
+from .async_db_provider import AsyncDatabaseProvider
 from ..utils.constants import (
+    GOOGLE_VERIFY_URL,
+    GOOGLE_TOKEN_TTL,
+    SESSION_TTL,
+    SESSION_FLUSH_INTERVAL,
+    SESSION_FLUSH_THRESHOLD,
+    AUTH_CACHE_MAX_ENTRIES,
+    AUTH_CACHE_TTL,
     USER_COLLECTION,
     PROJECT_COLLECTION,
     POSITION_COLLECTION,
     CV_COLLECTION,
     JD_COLLECTION,
-    CV_STORAGE
+    PURGE_JOB_COLLECTION,
+    POSITION_STATS_COLLECTION,
+    PROJECT_STATS_COLLECTION,
+    BLOB_REF_COLLECTION,
+    CV_STORAGE,
+    EXPORT_MAX_WORKERS,
+    EXPORT_MAX_FILES,
+    CV_INDEX_MAX_POSITIONS,
+    EXTRACTION_MAX_WORKERS,
+    EXTRACTION_TIMEOUT,
+    EXTRACTION_MAX_PAGES,
+    EXTRACTION_GRACE,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_ENDPOINT_TIMEOUTS
 )
 from .storage_provider import StorageProvider
+from .extraction_provider import ExtractionProvider
+from .content_cache_provider import ContentCacheProvider
+from .http_provider import HTTPClientProvider
+from .google_auth_provider import GoogleAuthProvider
+from .session_provider import SessionProvider, RedisSessionProvider
+from .auth_cache_provider import AuthCacheProvider
+from .export_provider import ExportProvider
+from .cv_index_provider import CVIndexProvider
 
 
-memory_cacher = CacheProvider(in_memory=True)
+# Upload progress and verified tokens, shared by every worker when
+# CACHE_BACKEND_URL is set
+memory_cacher = CacheProvider(
+    in_memory=True,
+    backend=create_cache_backend(os.environ.get("CACHE_BACKEND_URL"), "memory")
+)
 jwt = JWTProvider()
 user_db = DatabaseProvider(collection_name=USER_COLLECTION)
 project_db = DatabaseProvider(collection_name=PROJECT_COLLECTION)
 position_db = DatabaseProvider(collection_name=POSITION_COLLECTION)
 cv_db = DatabaseProvider(collection_name=CV_COLLECTION)
 jd_db = DatabaseProvider(collection_name=JD_COLLECTION)
+purge_db = DatabaseProvider(collection_name=PURGE_JOB_COLLECTION)
+position_stats_db = DatabaseProvider(collection_name=POSITION_STATS_COLLECTION)
+project_stats_db = DatabaseProvider(collection_name=PROJECT_STATS_COLLECTION)
+blob_ref_db = DatabaseProvider(collection_name=BLOB_REF_COLLECTION)
+user_adb = AsyncDatabaseProvider(collection_name=USER_COLLECTION)
+project_adb = AsyncDatabaseProvider(collection_name=PROJECT_COLLECTION)
+position_adb = AsyncDatabaseProvider(collection_name=POSITION_COLLECTION)
+cv_adb = AsyncDatabaseProvider(collection_name=CV_COLLECTION)
+jd_adb = AsyncDatabaseProvider(collection_name=JD_COLLECTION)
+purge_adb = AsyncDatabaseProvider(collection_name=PURGE_JOB_COLLECTION)
+position_stats_adb = AsyncDatabaseProvider(collection_name=POSITION_STATS_COLLECTION)
+project_stats_adb = AsyncDatabaseProvider(collection_name=PROJECT_STATS_COLLECTION)
+blob_ref_adb = AsyncDatabaseProvider(collection_name=BLOB_REF_COLLECTION)
 storage_db = StorageProvider(directory=CV_STORAGE)
+extraction_pool = ExtractionProvider(
+    max_workers=int(os.environ.get("EXTRACTION_WORKERS", EXTRACTION_MAX_WORKERS)),
+    timeout=float(os.environ.get("EXTRACTION_TIMEOUT", EXTRACTION_TIMEOUT)),
+    max_pages=int(os.environ.get("EXTRACTION_MAX_PAGES", EXTRACTION_MAX_PAGES)),
+    use_temp_file=os.environ.get("EXTRACTION_USE_TEMP_FILE", "false").lower() == "true",
+    grace=float(os.environ.get("EXTRACTION_GRACE", EXTRACTION_GRACE))
+)
+exports = ExportProvider(
+    os.path.join(os.getcwd(), "cache", "exports"),
+    max_workers=int(os.environ.get("EXPORT_MAX_WORKERS", EXPORT_MAX_WORKERS)),
+    max_files=int(os.environ.get("EXPORT_MAX_FILES", EXPORT_MAX_FILES))
+)
+# Local CV updates maintain the indexes directly, changes made by other
+# instances mark the CVs to read again
+cv_index = CVIndexProvider(
+    CV_COLLECTION,
+    max_positions=int(os.environ.get("CV_INDEX_MAX_POSITIONS", CV_INDEX_MAX_POSITIONS))
+)
+invalidations.subscribe(cv_index.receive, remote_only=True)
+content_cache = ContentCacheProvider(
+    cacher,
+    blob_ref_db,
+    blob_ref_adb,
+    dedup_blobs=os.environ.get("CV_DEDUP_BLOBS", "false").lower() == "true"
+)
+http_client = HTTPClientProvider(
+    max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", HTTP_MAX_CONNECTIONS)),
+    max_keepalive_connections=int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", HTTP_MAX_KEEPALIVE_CONNECTIONS)),
+    keepalive_expiry=float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", HTTP_KEEPALIVE_EXPIRY)),
+    http2=os.environ.get("HTTP_HTTP2", "true").lower() == "true",
+    timeouts={
+        endpoint: float(os.environ.get(f"HTTP_{endpoint.upper()}_TIMEOUT", timeout))
+        for endpoint, timeout in HTTP_ENDPOINT_TIMEOUTS.items()
+    }
+)
+google_auth = GoogleAuthProvider(
+    http_client,
+    memory_cacher,
+    verify_url=os.environ.get("GOOGLE_VERIFY_URL", GOOGLE_VERIFY_URL),
+    ttl=int(os.environ.get("GOOGLE_TOKEN_TTL", GOOGLE_TOKEN_TTL))
+)
+# Share sessions between workers when a Redis url is set
+if os.environ.get("SESSION_REDIS_URL"):
+    sessions = RedisSessionProvider(
+        os.environ["SESSION_REDIS_URL"],
+        ttl=int(os.environ.get("SESSION_TTL", SESSION_TTL))
+    )
+else:
+    sessions = SessionProvider(
+        ttl=int(os.environ.get("SESSION_TTL", SESSION_TTL)),
+        persist_path=os.path.join(os.getcwd(), "cache", "__sessions__.json"),
+        flush_interval=float(os.environ.get("SESSION_FLUSH_INTERVAL", SESSION_FLUSH_INTERVAL)),
+        flush_threshold=int(os.environ.get("SESSION_FLUSH_THRESHOLD", SESSION_FLUSH_THRESHOLD))
+    )
+# Users changed by other instances are resolved again
+auth_cache = AuthCacheProvider(
+    USER_COLLECTION,
+    max_entries=int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", AUTH_CACHE_MAX_ENTRIES)),
+    ttl=float(os.environ.get("AUTH_CACHE_TTL", AUTH_CACHE_TTL))
+)
+invalidations.subscribe(auth_cache.receive, remote_only=True)
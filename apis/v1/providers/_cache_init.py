@@ -1,4 +1,25 @@
+import os
 from .cache_provider import CacheProvider
+from .cache_engine import NamespaceLimit
+from .cache_backend import create_cache_backend
+from .invalidation_provider import InvalidationProvider, create_invalidation_transport
+from ..utils.constants import CACHE_EVICTION_POLICY, CACHE_NAMESPACE_LIMITS
 
 
-cacher = CacheProvider()
+cacher = CacheProvider(
+    write_behind=os.environ.get("CACHE_WRITE_BEHIND", "true").lower() == "true",
+    flush_interval=float(os.environ.get("CACHE_FLUSH_INTERVAL", 5.0)),
+    flush_threshold=int(os.environ.get("CACHE_FLUSH_THRESHOLD", 100)),
+    eviction_policy=os.environ.get("CACHE_EVICTION_POLICY", CACHE_EVICTION_POLICY),
+    namespace_limits={
+        namespace: NamespaceLimit(**limit)
+        for namespace, limit in CACHE_NAMESPACE_LIMITS.items()
+    },
+    backend=create_cache_backend(os.environ.get("CACHE_BACKEND_URL"), "cache")
+)
+
+# Evict documents written by other instances from this instance's cache
+invalidations = InvalidationProvider(
+    cacher,
+    transport=create_invalidation_transport(os.environ.get("CACHE_INVALIDATION_URL"))
+)
@@ -0,0 +1,307 @@
+from typing import Any, AnyStr, Dict, List
+import time
+from firebase_admin import firestore
+from ._cache_init import cacher, invalidations
+from .identity_map import count_read
+from .batch_provider import current_batch
+from ..configs.firebase_config import async_db
+from ..utils.logger import log_firebase
+from ..utils.counters import add_counts
+from ..utils.pagination import page_ids
+
+
+def _increments(counts: Dict[str, Any]) -> Dict[str, Any]:
+    # Nested counts to Firestore increment transforms
+    return {
+        key: _increments(value) if isinstance(value, dict) else firestore.Increment(value)
+        for key, value in counts.items()
+    }
+
+
+class AsyncDatabaseProvider:
+    '''
+    Provide awaitable methods interacting with Firestore database.
+    Share the document cache with DatabaseProvider.
+    '''
+
+    def __init__(self, collection_name: AnyStr):
+        self.collection_name = collection_name
+        self.id_field = "id"
+        self.collection = async_db.collection(collection_name)
+        self.cacher = cacher
+
+    async def __cache(self, doc_id: AnyStr, doc_dict: Dict[str, Any], snapshot: int) -> None:
+        # Skip documents another instance changed while they were being read
+        key = f"{self.collection_name}:{doc_id}"
+        if invalidations.is_current(key, snapshot):
+            await self.cacher.aset(key, doc_dict)
+
+    async def get_all(self) -> List[Dict[str, Any]]:
+        '''
+        Get all documents from the collection.
+        Return a list of documents.
+        '''
+        snapshot = invalidations.snapshot()
+        _s = time.perf_counter()
+        doc_list = []
+        async for doc in self.collection.stream():
+            _e = time.perf_counter() - _s
+            log_firebase(f"Database read to {doc.id} [{_e:.2f}s]")
+
+            doc_dict = doc.to_dict()
+            doc_dict[self.id_field] = doc.id
+            doc_list.append(doc_dict)
+            # Save to cache
+            await self.__cache(doc.id, doc_dict, snapshot)
+
+        count_read(len(doc_list))
+        return doc_list
+
+    async def get_all_by_ids(self, ids: List[AnyStr]) -> List[Dict[str, Any]]:
+        '''
+        Get all documents by the list of document ids.
+        Return a list of documents.
+        '''
+        # Get from cache
+        doc_list = []
+        cache_doc_ids = []
+        cache_docs = await self.cacher.agets([f"{self.collection_name}:{_id}" for _id in ids]) or []
+        for _id, cache_doc in zip(ids, cache_docs):
+            if cache_doc:
+                doc_list.append(cache_doc)
+                cache_doc_ids.append(_id)
+
+        # Get from database documents not in cache
+        doc_refs = [self.collection.document(
+            _id) for _id in ids if _id not in cache_doc_ids]
+
+        if len(doc_refs) != 0:
+            snapshot = invalidations.snapshot()
+            _s = time.perf_counter()
+            async for doc in async_db.get_all(references=doc_refs):
+                _e = time.perf_counter() - _s
+                log_firebase(f"Database read to {doc.id} [{_e:.2f}s]")
+
+                doc_dict = doc.to_dict()
+                if not doc_dict:
+                    continue
+
+                doc_dict[self.id_field] = doc.id
+                doc_list.append(doc_dict)
+
+                # Save to cache
+                await self.__cache(doc.id, doc_dict, snapshot)
+
+            count_read(len(doc_refs))
+
+        return doc_list
+
+    async def get_fields_by_ids(self, ids: List[AnyStr], field_paths: List[AnyStr]) -> List[Dict[str, Any]]:
+        '''
+        Get only some fields of documents by the list of document ids,
+        e.g. field_paths=["matching.overall_result"].
+        Cached documents are used whole. The partial documents read here are
+        not cached.
+        '''
+        doc_list = []
+        missing_ids = []
+        cache_docs = await self.cacher.agets([f"{self.collection_name}:{_id}" for _id in ids]) or []
+        for _id, cache_doc in zip(ids, cache_docs):
+            if cache_doc:
+                doc_list.append(cache_doc)
+            else:
+                missing_ids.append(_id)
+
+        if missing_ids:
+            doc_refs = [self.collection.document(_id) for _id in missing_ids]
+            _s = time.perf_counter()
+            async for doc in async_db.get_all(references=doc_refs, field_paths=field_paths):
+                if not doc.exists:
+                    continue
+                doc_dict = doc.to_dict() or {}
+                doc_dict[self.id_field] = doc.id
+                doc_list.append(doc_dict)
+            _e = time.perf_counter() - _s
+            log_firebase(f"Database read {len(missing_ids)} partial documents [{_e:.2f}s]")
+
+            count_read(len(missing_ids))
+
+        return doc_list
+
+    async def get_page_by_ids(self, ids: List[AnyStr], limit: int | None, cursor: AnyStr | None = None) -> tuple[List[Dict[str, Any]], AnyStr | None]:
+        '''
+        Get one page of documents in the order of ids, starting at cursor.
+        Only the documents of the page are read.
+        Return the documents and the cursor of the next page, None on the last page.
+        Raise ValueError for an invalid cursor.
+        '''
+        ids, next_cursor = page_ids(ids, limit, cursor)
+        docs = {doc[self.id_field]: doc for doc in await self.get_all_by_ids(ids)}
+        return [docs[_id] for _id in ids if _id in docs], next_cursor
+
+    async def get_by_id(self, doc_id: AnyStr) -> Dict[str, Any] | None:
+        '''
+        Get a document from the collection.
+        Return the document if it exists, otherwise return None.
+        '''
+        if doc_id is None or doc_id == "":
+            return None
+
+        # Get from cache
+        doc = await self.cacher.aget(f"{self.collection_name}:{doc_id}")
+
+        if not doc:
+            snapshot = invalidations.snapshot()
+            _s = time.perf_counter()
+            doc = await self.collection.document(doc_id).get()
+            _e = time.perf_counter() - _s
+            count_read()
+
+            log_firebase(f"Database read to {doc_id} [{_e:.2f}s]")
+
+            if doc.exists:
+                doc_dict = doc.to_dict()
+                doc_dict[self.id_field] = doc_id
+
+                # Save to cache
+                await self.__cache(doc_id, doc_dict, snapshot)
+
+                return doc_dict
+            else:
+                return None
+        return doc
+
+    async def query_equal(self, key: AnyStr, value: AnyStr) -> List[Dict[str, Any]]:
+        '''
+        Query the collection for documents where the key is equal to the value.
+        Return a list of documents.
+        '''
+        _s = time.perf_counter()
+        query = self.collection.where(filter=firestore.firestore.FieldFilter(
+            key, "==", value))
+
+        doc_list = []
+        async for doc in query.stream():
+            _e = time.perf_counter() - _s
+            log_firebase(f"Database read to {doc.id} [{_e:.2f}s]")
+
+            doc_dict = doc.to_dict()
+            doc_dict[self.id_field] = doc.id
+            doc_list.append(doc_dict)
+
+        count_read(len(doc_list))
+        return doc_list
+
+    async def query_similar(self, key: AnyStr, value: AnyStr) -> List[Dict[str, Any]]:
+        '''
+        Query the collection for documents where the key is similar to the value.
+        Return a list of documents.
+        '''
+        _s = time.perf_counter()
+        query = self.collection.where(filter=firestore.firestore.FieldFilter(
+            key, ">=", value)).where(filter=firestore.firestore.FieldFilter(key, "<=", value + "\uf8ff"))
+
+        doc_list = []
+        async for doc in query.stream():
+            _e = time.perf_counter() - _s
+            log_firebase(f"Database read to {doc.id} [{_e:.2f}s]")
+
+            doc_dict = doc.to_dict()
+            doc_dict[self.id_field] = doc.id
+            doc_list.append(doc_dict)
+
+        count_read(len(doc_list))
+        return doc_list
+
+    async def create(self, data: Dict) -> AnyStr:
+        '''
+        Create a new document in the collection.
+        Return the document id.
+        '''
+        # Defer to the open batch, the id is generated client side
+        batch = current_batch(is_async=True)
+        if batch is not None:
+            doc_ref = self.collection.document()
+            batch.set(doc_ref, data)
+            batch.on_rollback(lambda: self.cacher.remove(f"{self.collection_name}:{doc_ref.id}"))
+            return doc_ref.id
+
+        _s = time.perf_counter()
+        doc_ref = await self.collection.add(data)
+        _e = time.perf_counter() - _s
+
+        log_firebase(f"Database created {doc_ref[1].id} [{_e:.2f}s]")
+        return doc_ref[1].id
+
+    async def update(self, doc_id: AnyStr, data: Dict) -> None:
+        '''
+        Update a document in the collection.
+        '''
+        # Update data in cache
+        await self.cacher.aset(f"{self.collection_name}:{doc_id}", {
+            **(await self.get_by_id(doc_id) or {}), **data
+        })
+
+        # Defer to the open batch
+        batch = current_batch(is_async=True)
+        if batch is not None:
+            batch.set(self.collection.document(doc_id), data, merge=True)
+            batch.on_commit(lambda: invalidations.publish(self.collection_name, doc_id))
+            batch.on_rollback(lambda: self.cacher.remove(f"{self.collection_name}:{doc_id}"))
+            return
+
+        _s = time.perf_counter()
+        await self.collection.document(doc_id).set(data, merge=True)
+        _e = time.perf_counter() - _s
+
+        log_firebase(f"Database updated {doc_id} [{_e:.2f}s]")
+        invalidations.publish(self.collection_name, doc_id)
+
+    async def increment(self, doc_id: AnyStr, counts: Dict[str, Any]) -> None:
+        '''
+        Add nested counts to the numeric fields of a document, missing fields
+        and documents start at 0. Concurrent increments add up.
+        '''
+        # Update counters in cache, if the document is there
+        key = f"{self.collection_name}:{doc_id}"
+        cache_doc = await self.cacher.aget(key)
+        if cache_doc:
+            await self.cacher.aset(key, add_counts(cache_doc, counts))
+
+        data = _increments(counts)
+
+        # Defer to the open batch
+        batch = current_batch(is_async=True)
+        if batch is not None:
+            batch.set(self.collection.document(doc_id), data, merge=True)
+            batch.on_commit(lambda: invalidations.publish(self.collection_name, doc_id))
+            batch.on_rollback(lambda: self.cacher.remove(key))
+            return
+
+        _s = time.perf_counter()
+        await self.collection.document(doc_id).set(data, merge=True)
+        _e = time.perf_counter() - _s
+
+        log_firebase(f"Database incremented {doc_id} [{_e:.2f}s]")
+        invalidations.publish(self.collection_name, doc_id)
+
+    async def delete(self, doc_id: AnyStr) -> None:
+        '''
+        Delete a document from the collection.
+        '''
+        # Remove data in cache
+        await self.cacher.aremove(f"{self.collection_name}:{doc_id}")
+
+        # Defer to the open batch
+        batch = current_batch(is_async=True)
+        if batch is not None:
+            batch.delete(self.collection.document(doc_id))
+            batch.on_commit(lambda: invalidations.publish(self.collection_name, doc_id))
+            return
+
+        _s = time.perf_counter()
+        await self.collection.document(doc_id).delete()
+        _e = time.perf_counter() - _s
+
+        log_firebase(f"Database deleted {doc_id} [{_e:.2f}s]")
+        invalidations.publish(self.collection_name, doc_id)
@@ -0,0 +1,101 @@
+from typing import Any, AnyStr, Dict
+import time
+import threading
+from collections import OrderedDict
+
+
+class AuthCacheProvider:
+    '''
+    Bounded LRU cache of JWT -> resolved user data, so authenticated requests
+    skip token verification, the session check and the user read.
+    Entries live for at most ttl seconds, never past the token's own expiry,
+    and are dropped when the user changes, here or on another instance,
+    or the token logs out.
+    '''
+
+    def __init__(self, collection_name: AnyStr, max_entries: int = 1024, ttl: float = 60.0):
+        self.collection_name = collection_name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple] = OrderedDict()
+        self.tokens_by_user: Dict[str, set] = {}
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def __pop(self, token: AnyStr) -> None:
+        # Caller holds the lock
+        entry = self.entries.pop(token, None)
+        if entry is None:
+            return
+        uid = entry[0]
+        tokens = self.tokens_by_user.get(uid)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self.tokens_by_user[uid]
+
+    def get(self, token: AnyStr) -> tuple | None:
+        '''
+        Get the user id, session id and user data resolved for the token.
+        '''
+        with self._lock:
+            entry = self.entries.get(token)
+            if entry is not None and entry[2] <= time.time():
+                self.__pop(token)
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(token)
+            self.stats["hits"] += 1
+            return entry[0], entry[3], entry[1]
+
+    def set(
+        self,
+        token: AnyStr,
+        uid: AnyStr,
+        data: Dict[str, Any],
+        expires_at: float | None = None,
+        sid: AnyStr | None = None
+    ) -> None:
+        '''
+        Cache the user data resolved for the token.
+        expires_at is the token's "exp" claim and sid its session, if any.
+        '''
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            self.__pop(token)
+            self.entries[token] = (uid, data, deadline, sid)
+            self.tokens_by_user.setdefault(uid, set()).add(token)
+            while len(self.entries) > self.max_entries:
+                self.__pop(next(iter(self.entries)))
+
+    def invalidate_token(self, token: AnyStr) -> None:
+        with self._lock:
+            self.__pop(token)
+
+    def invalidate_user(self, uid: AnyStr) -> None:
+        '''
+        Drop every token resolved to the user.
+        '''
+        with self._lock:
+            for token in list(self.tokens_by_user.get(uid, ())):
+                self.__pop(token)
+
+    def receive(self, collection: AnyStr, doc_id: AnyStr) -> None:
+        '''
+        Invalidation listener: drop the tokens of a user changed by another instance.
+        '''
+        if collection == self.collection_name:
+            self.invalidate_user(doc_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {**self.stats, "entries": len(self.entries)}
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else 0.0
+        return stats
@@ -0,0 +1,126 @@
+from typing import Any, Callable, Dict, List
+import time
+from contextvars import ContextVar, Token
+from ..configs.firebase_config import db, async_db
+from ..utils.logger import log_firebase
+
+
+# Firestore limit of writes per batch
+MAX_BATCH_OPS = 500
+
+
+class WriteBatch:
+    '''
+    Collect the writes of DatabaseProvider (with) or AsyncDatabaseProvider
+    (async with) issued inside the block, and commit them on exit as
+    Firestore WriteBatches of at most 500 writes. Each chunk is atomic,
+    so up to 500 writes the whole block is.
+    The cache is updated as writes are collected; if the commit fails,
+    the cached documents touched by the block are dropped.
+    '''
+
+    def __init__(self, max_ops: int = MAX_BATCH_OPS):
+        self.max_ops = max_ops
+        self.ops: List[tuple] = []
+        self.is_async = False
+        self._on_commit: List[Callable[[], None]] = []
+        self._on_rollback: List[Callable[[], None]] = []
+        self._token: Token | None = None
+        self._parent: WriteBatch | None = None
+
+    def set(self, ref: Any, data: Dict, merge: bool = False) -> None:
+        self.ops.append(("set", ref, data, merge))
+
+    def delete(self, ref: Any) -> None:
+        self.ops.append(("delete", ref))
+
+    def on_commit(self, callback: Callable[[], None]) -> None:
+        self._on_commit.append(callback)
+
+    def on_rollback(self, callback: Callable[[], None]) -> None:
+        self._on_rollback.append(callback)
+
+    def __chunks(self):
+        for i in range(0, len(self.ops), self.max_ops):
+            batch = (async_db if self.is_async else db).batch()
+            for op in self.ops[i:i + self.max_ops]:
+                if op[0] == "set":
+                    batch.set(op[1], op[2], merge=op[3])
+                else:
+                    batch.delete(op[1])
+            yield batch
+
+    def __done(self, error: BaseException | None, _e: float) -> None:
+        callbacks = self._on_rollback if error else self._on_commit
+        for callback in callbacks:
+            callback()
+        if error is None:
+            log_firebase(f"Database committed {len(self.ops)} writes [{_e:.2f}s]")
+
+    def __open(self, is_async: bool) -> "WriteBatch":
+        # A nested block joins the outer batch
+        self._parent = _current_batch.get()
+        if self._parent is None:
+            self.is_async = is_async
+            self._token = _current_batch.set(self)
+        return self._parent or self
+
+    def __enter__(self) -> "WriteBatch":
+        return self.__open(is_async=False)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._parent is not None:
+            return
+        _current_batch.reset(self._token)
+        if exc is not None:
+            self.__done(exc, 0.0)
+            return
+        _s = time.perf_counter()
+        try:
+            for batch in self.__chunks():
+                batch.commit()
+        except Exception as e:
+            self.__done(e, 0.0)
+            raise
+        self.__done(None, time.perf_counter() - _s)
+
+    async def __aenter__(self) -> "WriteBatch":
+        return self.__open(is_async=True)
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._parent is not None:
+            return
+        _current_batch.reset(self._token)
+        if exc is not None:
+            self.__done(exc, 0.0)
+            return
+        _s = time.perf_counter()
+        try:
+            for batch in self.__chunks():
+                await batch.commit()
+        except Exception as e:
+            self.__done(e, 0.0)
+            raise
+        self.__done(None, time.perf_counter() - _s)
+
+
+_current_batch: ContextVar[WriteBatch | None] = ContextVar(
+    "write_batch", default=None)
+
+
+def write_batch(max_ops: int = MAX_BATCH_OPS) -> WriteBatch:
+    '''
+    Batch the database writes of a block:
+    `with write_batch(): ...` or `async with write_batch(): ...`.
+    '''
+    return WriteBatch(max_ops=max_ops)
+
+
+def current_batch(is_async: bool) -> WriteBatch | None:
+    '''
+    Get the batch collecting writes of the sync or async providers, if any.
+    '''
+    batch = _current_batch.get()
+    if batch is None or batch.is_async != is_async:
+        return None
+    return batch
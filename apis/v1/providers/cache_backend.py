@@ -0,0 +1,280 @@
+from typing import Any, AnyStr, Dict, List
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime
+
+
+def _dumps(value: Any) -> AnyStr:
+    # Convert non-serializable objects to strings, as the cache file does
+    def default_converter(o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        raise TypeError(f"Object of type {o.__class__.__name__} is not JSON serializable")
+    return json.dumps(value, default=default_converter)
+
+
+class CacheBackend:
+    '''
+    Shared storage for CacheProvider, visible to every worker and replica.
+    Values are JSON documents; a TTL is enforced by the backend itself.
+    '''
+
+    def get(self, key: AnyStr) -> Any | None:
+        raise NotImplementedError
+
+    def get_many(self, keys: List[AnyStr]) -> List[Any | None]:
+        return [self.get(key) for key in keys]
+
+    def set(self, key: AnyStr, value: Any, ttl: float | None = None) -> None:
+        raise NotImplementedError
+
+    def set_many(self, data: Dict[AnyStr, Any], ttl: float | None = None) -> None:
+        for key, value in data.items():
+            self.set(key, value, ttl)
+
+    def delete(self, key: AnyStr) -> None:
+        raise NotImplementedError
+
+    def delete_many(self, keys: List[AnyStr]) -> None:
+        for key in keys:
+            self.delete(key)
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    # Awaitable methods, for backends without an asyncio client the blocking
+    # calls run in a worker thread so the event loop is never held
+    async def aget(self, key: AnyStr) -> Any | None:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aget_many(self, keys: List[AnyStr]) -> List[Any | None]:
+        return await asyncio.to_thread(self.get_many, keys)
+
+    async def aset(self, key: AnyStr, value: Any, ttl: float | None = None) -> None:
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    async def aset_many(self, data: Dict[AnyStr, Any], ttl: float | None = None) -> None:
+        await asyncio.to_thread(self.set_many, data, ttl)
+
+    async def adelete(self, key: AnyStr) -> None:
+        await asyncio.to_thread(self.delete, key)
+
+    async def adelete_many(self, keys: List[AnyStr]) -> None:
+        await asyncio.to_thread(self.delete_many, keys)
+
+    async def aclose(self) -> None:
+        # Close the asyncio client, close() the blocking one
+        pass
+
+
+class SQLiteCacheBackend(CacheBackend):
+    '''
+    Cache shared through a SQLite file, e.g. on a volume mounted by every
+    worker. Each CacheProvider uses its own table.
+    '''
+
+    def __init__(self, path: AnyStr, table: AnyStr = "cache", purge_every: int = 1000):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.table = table
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+
+    def __purge(self) -> None:
+        # Drop expired rows now and then, reads already skip them
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, key: AnyStr) -> Any | None:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value FROM {self.table} WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, keys: List[AnyStr]) -> List[Any | None]:
+        if not keys:
+            return []
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders}) "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (*keys, time.time())).fetchall()
+        values = {key: json.loads(value) for key, value in rows}
+        return [values.get(key) for key in keys]
+
+    def set(self, key: AnyStr, value: Any, ttl: float | None = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, data: Dict[AnyStr, Any], ttl: float | None = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        rows = [(key, _dumps(value), expires_at) for key, value in data.items()]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.__purge()
+
+    def delete(self, key: AnyStr) -> None:
+        self.delete_many([key])
+
+    def delete_many(self, keys: List[AnyStr]) -> None:
+        with self._lock:
+            self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", [(key,) for key in keys])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM {self.table} WHERE expires_at IS NULL OR expires_at > ?",
+                (time.time(),)).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RedisCacheBackend(CacheBackend):
+    '''
+    Cache shared through a Redis-compatible server.
+    Keys of each CacheProvider are prefixed so they can be cleared apart.
+    The awaitable methods use a redis.asyncio client, created on first use
+    in the serving event loop.
+    '''
+
+    def __init__(self, url: AnyStr, prefix: AnyStr = "cache"):
+        # Optional dependency, only needed with a Redis cache backend
+        import redis
+
+        self.url = url
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self._aclient = None
+
+    @property
+    def aclient(self) -> Any:
+        if self._aclient is None:
+            # Optional dependency, only needed with a Redis cache backend
+            import redis.asyncio
+
+            self._aclient = redis.asyncio.Redis.from_url(self.url, decode_responses=True)
+        return self._aclient
+
+    def __key(self, key: AnyStr) -> AnyStr:
+        return f"{self.prefix}|{key}"
+
+    @staticmethod
+    def __px(ttl: float | None) -> int | None:
+        return int(ttl * 1000) if ttl else None
+
+    @staticmethod
+    def __loads(value: AnyStr | None) -> Any | None:
+        return json.loads(value) if value is not None else None
+
+    def get(self, key: AnyStr) -> Any | None:
+        return self.__loads(self.client.get(self.__key(key)))
+
+    def get_many(self, keys: List[AnyStr]) -> List[Any | None]:
+        if not keys:
+            return []
+        values = self.client.mget([self.__key(key) for key in keys])
+        return [self.__loads(value) for value in values]
+
+    def set(self, key: AnyStr, value: Any, ttl: float | None = None) -> None:
+        self.client.set(self.__key(key), _dumps(value), px=self.__px(ttl))
+
+    def set_many(self, data: Dict[AnyStr, Any], ttl: float | None = None) -> None:
+        pipe = self.client.pipeline()
+        for key, value in data.items():
+            pipe.set(self.__key(key), _dumps(value), px=self.__px(ttl))
+        pipe.execute()
+
+    def delete(self, key: AnyStr) -> None:
+        self.client.delete(self.__key(key))
+
+    def delete_many(self, keys: List[AnyStr]) -> None:
+        if keys:
+            self.client.delete(*[self.__key(key) for key in keys])
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(f"{self.prefix}|*"))
+        for i in range(0, len(keys), 500):
+            self.client.delete(*keys[i:i + 500])
+
+    def count(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(f"{self.prefix}|*"))
+
+    def close(self) -> None:
+        self.client.close()
+
+    async def aget(self, key: AnyStr) -> Any | None:
+        return self.__loads(await self.aclient.get(self.__key(key)))
+
+    async def aget_many(self, keys: List[AnyStr]) -> List[Any | None]:
+        if not keys:
+            return []
+        values = await self.aclient.mget([self.__key(key) for key in keys])
+        return [self.__loads(value) for value in values]
+
+    async def aset(self, key: AnyStr, value: Any, ttl: float | None = None) -> None:
+        await self.aclient.set(self.__key(key), _dumps(value), px=self.__px(ttl))
+
+    async def aset_many(self, data: Dict[AnyStr, Any], ttl: float | None = None) -> None:
+        async with self.aclient.pipeline() as pipe:
+            for key, value in data.items():
+                pipe.set(self.__key(key), _dumps(value), px=self.__px(ttl))
+            await pipe.execute()
+
+    async def adelete(self, key: AnyStr) -> None:
+        await self.aclient.delete(self.__key(key))
+
+    async def adelete_many(self, keys: List[AnyStr]) -> None:
+        if keys:
+            await self.aclient.delete(*[self.__key(key) for key in keys])
+
+    async def aclose(self) -> None:
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+
+
+def create_cache_backend(url: AnyStr | None, name: AnyStr) -> CacheBackend | None:
+    '''
+    Create the shared backend for the url, e.g. "sqlite:///shared/cache.db"
+    or "redis://host:6379/0". name keeps each cache apart in the backend.
+    Return None without url, the cache then stays local to the process.
+    '''
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteCacheBackend(url[len("sqlite:///"):], table=name)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCacheBackend(url, prefix=name)
+    raise ValueError(f"Unsupported cache backend {url}")
@@ -0,0 +1,307 @@
+from typing import Any, AnyStr, Dict, List
+import sys
+import threading
+from collections import OrderedDict
+
+
+def get_namespace(key: AnyStr) -> AnyStr:
+    '''
+    Get the namespace of a cache key, e.g. "CVs" for "CVs:<id>".
+    Keys without a prefix belong to the default namespace "".
+    '''
+    if ":" in key:
+        return key.split(":", 1)[0]
+    return ""
+
+
+def approx_size(value: Any) -> int:
+    '''
+    Approximate the memory footprint of a JSON-like value in bytes.
+    '''
+    if value is None or isinstance(value, (bool, int, float)):
+        return 8
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(approx_size(k) + approx_size(v) for k, v in value.items()) + 64
+    if isinstance(value, (list, tuple, set)):
+        return sum(approx_size(v) for v in value) + 56
+    return sys.getsizeof(value)
+
+
+class NamespaceLimit:
+    '''
+    Bound of a cache namespace, by entry count and by approximate byte size.
+    None means unbounded.
+    '''
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def exceeded(self, entries: int, size: int) -> bool:
+        if self.max_entries is not None and entries > self.max_entries:
+            return True
+        if self.max_bytes is not None and size > self.max_bytes:
+            return True
+        return False
+
+
+class EvictionPolicy:
+    '''
+    Decide which key of a namespace is evicted first.
+    '''
+
+    def add(self, key: AnyStr) -> None:
+        raise NotImplementedError
+
+    def touch(self, key: AnyStr) -> None:
+        raise NotImplementedError
+
+    def remove(self, key: AnyStr) -> None:
+        raise NotImplementedError
+
+    def victim(self) -> AnyStr | None:
+        raise NotImplementedError
+
+
+class LRUPolicy(EvictionPolicy):
+    '''
+    Evict the least recently used key.
+    '''
+
+    def __init__(self):
+        self.order = OrderedDict()
+
+    def add(self, key: AnyStr) -> None:
+        self.order[key] = None
+        self.order.move_to_end(key)
+
+    def touch(self, key: AnyStr) -> None:
+        if key in self.order:
+            self.order.move_to_end(key)
+
+    def remove(self, key: AnyStr) -> None:
+        self.order.pop(key, None)
+
+    def victim(self) -> AnyStr | None:
+        return next(iter(self.order), None)
+
+
+class LFUPolicy(EvictionPolicy):
+    '''
+    Evict the least frequently used key, oldest first among equal counts.
+    '''
+
+    def __init__(self):
+        self.freqs: Dict[AnyStr, int] = {}
+        self.buckets: Dict[int, OrderedDict] = {}
+        self.min_freq = 0
+
+    def __unlink(self, key: AnyStr) -> int:
+        freq = self.freqs.pop(key)
+        bucket = self.buckets[freq]
+        bucket.pop(key, None)
+        if not bucket:
+            del self.buckets[freq]
+            if self.min_freq == freq:
+                self.min_freq = min(self.buckets) if self.buckets else 0
+        return freq
+
+    def __link(self, key: AnyStr, freq: int) -> None:
+        self.freqs[key] = freq
+        self.buckets.setdefault(freq, OrderedDict())[key] = None
+        if not self.min_freq or freq < self.min_freq:
+            self.min_freq = freq
+
+    def add(self, key: AnyStr) -> None:
+        if key in self.freqs:
+            self.touch(key)
+            return
+        self.__link(key, 1)
+
+    def touch(self, key: AnyStr) -> None:
+        if key not in self.freqs:
+            return
+        freq = self.__unlink(key)
+        self.__link(key, freq + 1)
+
+    def remove(self, key: AnyStr) -> None:
+        if key in self.freqs:
+            self.__unlink(key)
+
+    def victim(self) -> AnyStr | None:
+        bucket = self.buckets.get(self.min_freq)
+        if not bucket:
+            return None
+        return next(iter(bucket))
+
+
+EVICTION_POLICIES = {
+    "lru": LRUPolicy,
+    "lfu": LFUPolicy,
+}
+
+
+class _Namespace:
+    def __init__(self, policy: EvictionPolicy, limit: NamespaceLimit):
+        self.data: Dict[AnyStr, Any] = {}
+        self.sizes: Dict[AnyStr, int] = {}
+        self.size = 0
+        self.policy = policy
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+class CacheEngine:
+    '''
+    Bounded key-value storage behind CacheProvider.
+    Keys are grouped by namespace (the collection prefix of the key) and each
+    namespace is evicted independently when it exceeds its limit.
+    '''
+
+    def __init__(
+        self,
+        policy: AnyStr = "lru",
+        limits: Dict[AnyStr, NamespaceLimit] = None,
+        default_limit: NamespaceLimit = None
+    ):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy}")
+        self.policy = policy
+        self.limits = limits or {}
+        self.default_limit = default_limit or NamespaceLimit()
+        self.namespaces: Dict[AnyStr, _Namespace] = {}
+        self._lock = threading.RLock()
+
+    def __namespace(self, key: AnyStr) -> _Namespace:
+        name = get_namespace(key)
+        namespace = self.namespaces.get(name)
+        if namespace is None:
+            namespace = _Namespace(
+                EVICTION_POLICIES[self.policy](),
+                self.limits.get(name, self.default_limit)
+            )
+            self.namespaces[name] = namespace
+        return namespace
+
+    def __drop(self, namespace: _Namespace, key: AnyStr) -> Any:
+        value = namespace.data.pop(key)
+        namespace.size -= namespace.sizes.pop(key, 0)
+        namespace.policy.remove(key)
+        return value
+
+    def get(self, key: AnyStr, default: Any = None) -> Any:
+        with self._lock:
+            namespace = self.__namespace(key)
+            if key not in namespace.data:
+                namespace.misses += 1
+                return default
+            namespace.hits += 1
+            namespace.policy.touch(key)
+            return namespace.data[key]
+
+    def peek(self, key: AnyStr, default: Any = None) -> Any:
+        '''
+        Get a value without touching the eviction order or the counters.
+        '''
+        with self._lock:
+            return self.__namespace(key).data.get(key, default)
+
+    def set(self, key: AnyStr, value: Any) -> List[AnyStr]:
+        '''
+        Set a value and evict the namespace down to its limit.
+        Return the list of evicted keys.
+        '''
+        with self._lock:
+            namespace = self.__namespace(key)
+            if key in namespace.data:
+                self.__drop(namespace, key)
+
+            # A value larger than the whole namespace budget is never cached
+            size = approx_size(value)
+            if namespace.limit.max_bytes is not None and size > namespace.limit.max_bytes:
+                namespace.evictions += 1
+                return [key]
+
+            namespace.data[key] = value
+            namespace.sizes[key] = size
+            namespace.size += size
+            namespace.policy.add(key)
+
+            evicted = []
+            while namespace.limit.exceeded(len(namespace.data), namespace.size):
+                victim = namespace.policy.victim()
+                if victim is None:
+                    break
+                self.__drop(namespace, victim)
+                namespace.evictions += 1
+                evicted.append(victim)
+            return evicted
+
+    def __setitem__(self, key: AnyStr, value: Any) -> None:
+        self.set(key, value)
+
+    def __getitem__(self, key: AnyStr) -> Any:
+        with self._lock:
+            return self.__namespace(key).data[key]
+
+    def __contains__(self, key: AnyStr) -> bool:
+        with self._lock:
+            return key in self.__namespace(key).data
+
+    def __len__(self) -> int:
+        return sum(len(namespace.data) for namespace in self.namespaces.values())
+
+    def pop(self, key: AnyStr, default: Any = None) -> Any:
+        with self._lock:
+            namespace = self.__namespace(key)
+            if key not in namespace.data:
+                return default
+            return self.__drop(namespace, key)
+
+    def keys(self) -> List[AnyStr]:
+        with self._lock:
+            return [key for namespace in self.namespaces.values() for key in namespace.data]
+
+    def items(self) -> List[tuple]:
+        with self._lock:
+            return [item for namespace in self.namespaces.values() for item in namespace.data.items()]
+
+    def to_dict(self) -> Dict[AnyStr, Any]:
+        return dict(self.items())
+
+    def load(self, data: Dict[AnyStr, Any]) -> None:
+        '''
+        Fill the engine from a plain dict, applying the namespace limits.
+        '''
+        for key, value in data.items():
+            self.set(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            for namespace in self.namespaces.values():
+                namespace.data.clear()
+                namespace.sizes.clear()
+                namespace.size = 0
+                namespace.policy = EVICTION_POLICIES[self.policy]()
+
+    def stats(self) -> Dict[AnyStr, Dict[AnyStr, int]]:
+        '''
+        Get hit/miss/eviction counters and usage per namespace.
+        '''
+        with self._lock:
+            return {
+                name or "default": {
+                    "entries": len(namespace.data),
+                    "bytes": namespace.size,
+                    "max_entries": namespace.limit.max_entries,
+                    "max_bytes": namespace.limit.max_bytes,
+                    "hits": namespace.hits,
+                    "misses": namespace.misses,
+                    "evictions": namespace.evictions,
+                }
+                for name, namespace in self.namespaces.items()
+            }
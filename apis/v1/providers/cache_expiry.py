@@ -0,0 +1,72 @@
+from typing import AnyStr, Dict, List
+import time
+import heapq
+import threading
+
+
+class ExpiryScheduler:
+    '''
+    Heap-based schedule of key deadlines.
+    Re-scheduled or cancelled keys leave stale heap entries behind, which are
+    skipped when they reach the top of the heap.
+    '''
+
+    def __init__(self):
+        self.heap: List[tuple] = []
+        self.deadlines: Dict[AnyStr, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        '''
+        Number of keys waiting to expire.
+        '''
+        return len(self.deadlines)
+
+    def schedule(self, key: AnyStr, ttl: float) -> None:
+        deadline = time.monotonic() + ttl
+        with self._lock:
+            self.deadlines[key] = deadline
+            heapq.heappush(self.heap, (deadline, key))
+
+    def cancel(self, key: AnyStr) -> None:
+        with self._lock:
+            self.deadlines.pop(key, None)
+
+    def is_expired(self, key: AnyStr) -> bool:
+        deadline = self.deadlines.get(key)
+        return deadline is not None and deadline <= time.monotonic()
+
+    def next_deadline(self) -> float | None:
+        with self._lock:
+            self.__prune()
+            return self.heap[0][0] if self.heap else None
+
+    def pop_due(self) -> List[AnyStr]:
+        '''
+        Remove and return every key whose deadline has passed.
+        '''
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self.heap and self.heap[0][0] <= now:
+                deadline, key = heapq.heappop(self.heap)
+                if self.deadlines.get(key) == deadline:
+                    del self.deadlines[key]
+                    due.append(key)
+            self.__prune()
+        return due
+
+    def clear(self) -> None:
+        with self._lock:
+            self.heap = []
+            self.deadlines = {}
+
+    def __prune(self) -> None:
+        # Drop stale entries of re-scheduled or cancelled keys
+        while self.heap and self.deadlines.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        # Rebuild when stale entries dominate the heap
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            self.heap = [(deadline, key) for key, deadline in self.deadlines.items()]
+            heapq.heapify(self.heap)
@@ -1,7 +1,13 @@
 from typing import Any, AnyStr, ByteString
 import os
 import json
-from threading import Timer
+import time
+import atexit
+import tempfile
+import threading
+from .cache_engine import CacheEngine, NamespaceLimit
+from .cache_backend import CacheBackend
+from .cache_expiry import ExpiryScheduler
 from ..utils.logger import log_cache
 from datetime import datetime
 
@@ -10,13 +16,59 @@ class CacheProvider:
         self,
         cache_file_name: AnyStr = "__cache__.json",
         cache_dir: AnyStr = "cache",
-        in_memory: bool = False
+        in_memory: bool = False,
+        write_behind: bool = False,
+        flush_interval: float = 5.0,
+        flush_threshold: int = 100,
+        eviction_policy: AnyStr = "lru",
+        namespace_limits: dict[str, NamespaceLimit] = None,
+        default_limit: NamespaceLimit = None,
+        sweep_interval: float = 1.0,
+        backend: CacheBackend = None
     ):
         self.cache_dir = os.path.join(os.getcwd(), cache_dir)
         self.cache_path = os.path.join(
             os.getcwd(), cache_dir, cache_file_name)
-        self.cache = self.__load()
-        self.in_memory = in_memory
+        self.cache = CacheEngine(
+            policy=eviction_policy,
+            limits=namespace_limits,
+            default_limit=default_limit
+        )
+        # Shared backend: values live in the backend only, nothing is
+        # kept or persisted by this process
+        self.backend = backend
+        if backend is None:
+            self.cache.load(self.__load())
+        self.in_memory = in_memory or backend is not None
+
+        # Write-behind persistence: mutations only mark the cache dirty,
+        # a single background flusher writes it to disk.
+        self.write_behind = write_behind and not self.in_memory
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.flush_stats = {
+            "flushes": 0,
+            "last_latency": 0.0,
+            "max_latency": 0.0,
+            "total_latency": 0.0,
+        }
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._mutations = 0
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._flusher = None
+        if self.write_behind:
+            self._flusher = threading.Thread(
+                target=self.__flush_loop, name="cache-flusher", daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
+
+        # TTL expiry: one scheduler and one lazily started sweeper thread,
+        # however many keys carry a TTL. Expired keys are also dropped on read.
+        self.sweep_interval = sweep_interval
+        self._expiry = ExpiryScheduler()
+        self._sweeper = None
 
     def __load(self):
         # Load cache from file
@@ -35,20 +87,165 @@ class CacheProvider:
             return {}
 
     def __save(self):
+        # Only save when in_memory is False
+        if self.in_memory:
+            return
+
+        # Defer the write to the background flusher
+        if self.write_behind:
+            with self._lock:
+                self._mutations += 1
+                if self._mutations >= self.flush_threshold:
+                    self._wakeup.set()
+            return
+
+        self.flush()
+
+    def __flush_loop(self):
+        # Flush on interval, or earlier when the mutation threshold is hit
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log_cache(f"Cache flush failed. {str(e)}")
+
+    def __ensure_sweeper(self):
+        if self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(
+                    target=self.__sweep_loop, name="cache-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def __sweep_loop(self):
+        # Periodically remove keys whose TTL has passed
+        while not self._closed:
+            time.sleep(self.sweep_interval)
+            try:
+                self.__expire(self._expiry.pop_due())
+            except Exception as e:
+                log_cache(f"Cache sweep failed. {str(e)}")
+
+    def __expire(self, keys: list[str]) -> None:
+        if not keys:
+            return
+        with self._lock:
+            for key in keys:
+                self.cache.pop(key, None)
+        log_cache(f"Expired {len(keys)} keys")
+        self.__save()
+
+    def __check_expired(self, key: str) -> None:
+        # Lazy expiry on read
+        if self._expiry.is_expired(key):
+            self._expiry.cancel(key)
+            self.__expire([key])
+
+    @property
+    def pending_expirations(self) -> int:
+        '''
+        Number of keys with a TTL that have not expired yet.
+        '''
+        return self._expiry.pending
+
+    def flush(self) -> None:
+        '''
+        Write the cache to disk if it has pending mutations.
+        The file is replaced atomically through a temp file + rename.
+        '''
         # Convert non-serializable objects to strings
         def default_converter(o):
             if isinstance(o, datetime):
                 return o.isoformat()
             raise TypeError(f"Object of type {o.__class__.__name__} is not JSON serializable")
 
-        # Save cache to file
-        with open(self.cache_path, "w") as _file:
-            json.dump(self.cache, _file, default=default_converter)
-            _file.close()
+        if self.in_memory:
+            return
+
+        with self._flush_lock:
+            with self._lock:
+                if self.write_behind and self._mutations == 0:
+                    return
+                pending = self._mutations
+                snapshot = self.cache.to_dict()
+                self._mutations = 0
+
+            _s = time.perf_counter()
+            tmp_path = None
+            try:
+                fd, tmp_path = tempfile.mkstemp(
+                    dir=self.cache_dir, prefix=".cache-", suffix=".tmp")
+                with os.fdopen(fd, "w") as _file:
+                    json.dump(snapshot, _file, default=default_converter)
+                os.replace(tmp_path, self.cache_path)
+            except Exception:
+                # Keep the mutations pending so the next flush retries
+                with self._lock:
+                    self._mutations += pending
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            _e = time.perf_counter() - _s
+
+            self.flush_stats["flushes"] += 1
+            self.flush_stats["last_latency"] = _e
+            self.flush_stats["total_latency"] += _e
+            self.flush_stats["max_latency"] = max(
+                self.flush_stats["max_latency"], _e)
+
+            if self.write_behind:
+                log_cache(f"Flushed {pending} mutations [{_e:.2f}s]")
+
+    def get_flush_stats(self) -> dict:
+        '''
+        Get flush latency metrics of the write-behind persistence.
+        '''
+        stats = dict(self.flush_stats)
+        stats["avg_latency"] = stats["total_latency"] / stats["flushes"] \
+            if stats["flushes"] else 0.0
+        stats["pending_mutations"] = self._mutations
+        return stats
+
+    def get_stats(self) -> dict:
+        '''
+        Get usage, hit/miss/eviction counters per namespace and flush metrics.
+        '''
+        if self.backend is not None:
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": self.backend.count()
+            }
+        return {
+            "namespaces": self.cache.stats(),
+            "flush": self.get_flush_stats(),
+            "pending_expirations": self.pending_expirations
+        }
+
+    def close(self) -> None:
+        '''
+        Stop the background flusher and write any pending mutations.
+        '''
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        if self._flusher and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=self.flush_interval)
+        if self.write_behind:
+            self.flush()
+        if self.backend is not None:
+            self.backend.close()
 
     def get(self, key: str) -> Any | None:
         # Get value from cache
-        data = self.cache.get(key, None)
+        if self.backend is not None:
+            data = self.backend.get(key)
+        else:
+            self.__check_expired(key)
+            data = self.cache.get(key, None)
         if not data:
             log_cache(f"Cache miss for {key}")
         else:
@@ -57,46 +254,123 @@ class CacheProvider:
 
     def gets(self, keys: list[str]) -> list[Any] | None:
         # Get values from cache
-        caches = [self.cache.get(key, None) for key in keys]
+        if self.backend is not None:
+            caches = self.backend.get_many(keys)
+        else:
+            for key in keys:
+                self.__check_expired(key)
+            caches = [self.cache.get(key, None) for key in keys]
         if len(caches) == 0:
             return None
         return caches
 
     def set(self, key: AnyStr, value: Any, ttl: int = None) -> None:
         # Set value in cache
-        self.cache[key] = value
+        if self.backend is not None:
+            self.backend.set(key, value, ttl)
+            log_cache(f"Set cache for {key}")
+            return
+        with self._lock:
+            evicted = self.cache.set(key, value)
         log_cache(f"Set cache for {key}")
-        # Set timer to remove value from cache
-        if ttl:
-            Timer(ttl, self.remove, [key]).start()
-        # Only save when in_memory is False
-        if not self.in_memory:
-            self.__save()
+        if evicted:
+            log_cache(f"Evicted {len(evicted)} keys for {key}")
+        # Schedule removal of the value from cache
+        self.__schedule(key, ttl)
+        self.__save()
 
     def sets(self, data: dict, ttl: int = None) -> None:
         # Set values in cache
-        for key, value in data.items():
-            self.cache[key] = value
-        # Set timer to remove value from cache
-        if ttl:
-            Timer(ttl, self.removes, [[key for key in data.keys()]]).start()
-        # Only save when in_memory is False
-        if not self.in_memory:
-            self.__save()
+        if self.backend is not None:
+            self.backend.set_many(data, ttl)
+            return
+        with self._lock:
+            for key, value in data.items():
+                self.cache.set(key, value)
+        # Schedule removal of the values from cache
+        for key in data.keys():
+            self.__schedule(key, ttl)
+        self.__save()
 
     def remove(self, key: str) -> None:
         # Remove value from cache
-        self.cache.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(key)
+            log_cache(f"Remove cache for {key}")
+            return
+        with self._lock:
+            self.cache.pop(key, None)
+        self._expiry.cancel(key)
         log_cache(f"Remove cache for {key}")
-        if not self.in_memory:
-            self.__save()
+        self.__save()
 
     def removes(self, keys: list[str]) -> None:
         # Remove values from cache
-        for key in keys:
-            self.cache.pop(key, None)
-        if not self.in_memory:
-            self.__save()
+        if self.backend is not None:
+            self.backend.delete_many(keys)
+            return
+        with self._lock:
+            for key in keys:
+                self.cache.pop(key, None)
+                self._expiry.cancel(key)
+        self.__save()
+
+    # Awaitable access for the async code paths: a shared backend is awaited,
+    # the local cache is only memory and answers right away
+    async def aget(self, key: str) -> Any | None:
+        if self.backend is None:
+            return self.get(key)
+        data = await self.backend.aget(key)
+        if not data:
+            log_cache(f"Cache miss for {key}")
+        else:
+            log_cache(f"Cache hit for {key}")
+        return data
+
+    async def agets(self, keys: list[str]) -> list[Any] | None:
+        if self.backend is None:
+            return self.gets(keys)
+        caches = await self.backend.aget_many(keys)
+        if len(caches) == 0:
+            return None
+        return caches
+
+    async def aset(self, key: AnyStr, value: Any, ttl: int = None) -> None:
+        if self.backend is None:
+            return self.set(key, value, ttl)
+        await self.backend.aset(key, value, ttl)
+        log_cache(f"Set cache for {key}")
+
+    async def asets(self, data: dict, ttl: int = None) -> None:
+        if self.backend is None:
+            return self.sets(data, ttl)
+        await self.backend.aset_many(data, ttl)
+
+    async def aremove(self, key: str) -> None:
+        if self.backend is None:
+            return self.remove(key)
+        await self.backend.adelete(key)
+        log_cache(f"Remove cache for {key}")
+
+    async def aremoves(self, keys: list[str]) -> None:
+        if self.backend is None:
+            return self.removes(keys)
+        await self.backend.adelete_many(keys)
+
+    async def aclose(self) -> None:
+        '''
+        Awaitable close, which also closes the asyncio client of the backend.
+        '''
+        self.close()
+        if self.backend is not None:
+            await self.backend.aclose()
+
+    def __schedule(self, key: str, ttl: int = None) -> None:
+        if not ttl:
+            self._expiry.cancel(key)
+            return
+        self._expiry.schedule(key, ttl)
+        self.__ensure_sweeper()
 
     def save_cache_file(self, data: ByteString, filename: AnyStr) -> AnyStr:
         # Save file to cache
@@ -114,7 +388,12 @@ class CacheProvider:
 
     def reset_cache(self) -> None:
         # Reset cache
-        self.cache = {}
+        if self.backend is not None:
+            self.backend.clear()
+            log_cache("Cache burst!")
+            return
+        with self._lock:
+            self.cache.clear()
+        self._expiry.clear()
         log_cache("Cache burst!")
-        if not self.in_memory:
-            self.__save()
+        self.__save()
@@ -0,0 +1,199 @@
+from typing import Any, AnyStr, Dict, List
+import hashlib
+import threading
+from firebase_admin import firestore
+from .cache_provider import CacheProvider
+from .db_provider import DatabaseProvider
+from .async_db_provider import AsyncDatabaseProvider
+from .transaction_provider import Transaction, run_transaction, arun_transaction
+from ..utils.constants import (
+    CV_CONTENT_NAMESPACE,
+    CV_SUMMARY_NAMESPACE
+)
+
+
+class ContentCacheProvider:
+    '''
+    Content-addressed cache of CV processing results, keyed by the SHA-256
+    of the file bytes: extracted text, AI summary and labels per llm_name,
+    and optionally the storage blob shared by identical files.
+    The CVs referencing a shared blob are counted in Firestore, not in the
+    cache: the count decides when the blob is removed, so it must survive
+    evictions and resets and be shared by every instance.
+    '''
+
+    def __init__(
+        self,
+        cacher: CacheProvider,
+        blob_db: DatabaseProvider,
+        blob_adb: AsyncDatabaseProvider,
+        dedup_blobs: bool = False
+    ):
+        self.cacher = cacher
+        self.blob_db = blob_db
+        self.blob_adb = blob_adb
+        self.dedup_blobs = dedup_blobs
+        self.stats = {
+            kind: {"hits": 0, "misses": 0}
+            for kind in ("content", "summary", "blob")
+        }
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(data: bytes) -> AnyStr:
+        '''
+        Get the SHA-256 hex digest of the file bytes.
+        '''
+        return hashlib.sha256(data).hexdigest()
+
+    def __count(self, kind: AnyStr, value: Any) -> Any:
+        with self._lock:
+            self.stats[kind]["hits" if value is not None else "misses"] += 1
+        return value
+
+    def get_content(self, digest: AnyStr) -> AnyStr | None:
+        '''
+        Get the extracted text of a known file.
+        '''
+        data = self.cacher.get(f"{CV_CONTENT_NAMESPACE}:{digest}")
+        return self.__count("content", data["content"] if data else None)
+
+    def set_content(self, digest: AnyStr, content: AnyStr) -> None:
+        self.cacher.set(f"{CV_CONTENT_NAMESPACE}:{digest}", {"content": content})
+
+    def get_summary(self, digest: AnyStr, llm_name: AnyStr) -> Dict[str, Any] | None:
+        '''
+        Get the summary and labels produced by llm_name for a known file.
+        '''
+        data = self.cacher.get(f"{CV_SUMMARY_NAMESPACE}:{digest}:{llm_name}")
+        return self.__count("summary", data)
+
+    def set_summary(self, digest: AnyStr, llm_name: AnyStr, summary: Any, labels: Any) -> None:
+        self.cacher.set(f"{CV_SUMMARY_NAMESPACE}:{digest}:{llm_name}", {
+            "summary": summary,
+            "labels": labels
+        })
+
+    async def aget_content(self, digest: AnyStr) -> AnyStr | None:
+        data = await self.cacher.aget(f"{CV_CONTENT_NAMESPACE}:{digest}")
+        return self.__count("content", data["content"] if data else None)
+
+    async def aset_content(self, digest: AnyStr, content: AnyStr) -> None:
+        await self.cacher.aset(f"{CV_CONTENT_NAMESPACE}:{digest}", {"content": content})
+
+    async def aget_summary(self, digest: AnyStr, llm_name: AnyStr) -> Dict[str, Any] | None:
+        data = await self.cacher.aget(f"{CV_SUMMARY_NAMESPACE}:{digest}:{llm_name}")
+        return self.__count("summary", data)
+
+    async def aset_summary(self, digest: AnyStr, llm_name: AnyStr, summary: Any, labels: Any) -> None:
+        await self.cacher.aset(f"{CV_SUMMARY_NAMESPACE}:{digest}:{llm_name}", {
+            "summary": summary,
+            "labels": labels
+        })
+
+    def __blob_added(self, digest: AnyStr, data: Dict[str, Any] | None) -> tuple:
+        # Reuse a referenced blob, or upload it again under a new generation:
+        # the previous one may be being removed by its last CV
+        data = data or {}
+        if data.get("refs", 0) > 0:
+            return {"refs": firestore.Increment(1)}, self.__count("blob", {
+                "path": data.get("path"), "url": data.get("url"), "generation": data.get("generation", 0)})
+        generation = data.get("generation", 0) + 1
+        self.__count("blob", None)
+        return {"refs": 1, "generation": generation, "path": None, "url": None}, {
+            "path": None, "url": None, "generation": generation}
+
+    @staticmethod
+    def __blob_released(path: AnyStr, data: Dict[str, Any] | None, count: int = 1) -> tuple:
+        # A blob without a count, or counted for another path, is kept
+        if not data or data.get("path") != path or data.get("refs", 0) <= 0:
+            return None, False
+        return {"refs": firestore.Increment(-min(count, data["refs"]))}, count >= data["refs"]
+
+    def add_blob_ref(self, digest: AnyStr) -> Dict[str, Any]:
+        '''
+        Count one more CV referencing the blob of a file, before it is used.
+        Return the "path" and "url" of the blob, None when it has to be
+        uploaded with set_blob, under "generation".
+        '''
+        def add(transaction: Transaction):
+            data, blob = self.__blob_added(digest, transaction.get(self.blob_db, digest))
+            transaction.set(self.blob_db, digest, data)
+            return blob
+        return run_transaction(add)
+
+    async def aadd_blob_ref(self, digest: AnyStr) -> Dict[str, Any]:
+        async def add(transaction: Transaction):
+            data, blob = self.__blob_added(digest, await transaction.aget(self.blob_adb, digest))
+            transaction.set(self.blob_adb, digest, data)
+            return blob
+        return await arun_transaction(add)
+
+    def set_blob(self, digest: AnyStr, generation: int, path: AnyStr, url: AnyStr) -> None:
+        '''
+        Record the blob uploaded for a generation.
+        '''
+        def set_path(transaction: Transaction):
+            data = transaction.get(self.blob_db, digest)
+            if data and data.get("generation") == generation:
+                transaction.set(self.blob_db, digest, {"path": path, "url": url})
+        run_transaction(set_path)
+
+    async def aset_blob(self, digest: AnyStr, generation: int, path: AnyStr, url: AnyStr) -> None:
+        async def set_path(transaction: Transaction):
+            data = await transaction.aget(self.blob_adb, digest)
+            if data and data.get("generation") == generation:
+                transaction.set(self.blob_adb, digest, {"path": path, "url": url})
+        await arun_transaction(set_path)
+
+    def release_blob(self, digest: AnyStr, path: AnyStr) -> bool:
+        '''
+        Drop one CV reference to the blob at path.
+        Return True when no CV references it anymore and it can be removed.
+        A blob whose count cannot be read is kept, it may still be referenced.
+        '''
+        def release(transaction: Transaction):
+            data, removable = self.__blob_released(path, transaction.get(self.blob_db, digest))
+            if data:
+                transaction.set(self.blob_db, digest, data)
+            return removable
+        return run_transaction(release)
+
+    async def arelease_blob(self, digest: AnyStr, path: AnyStr) -> bool:
+        async def release(transaction: Transaction):
+            data, removable = self.__blob_released(path, await transaction.aget(self.blob_adb, digest))
+            if data:
+                transaction.set(self.blob_adb, digest, data)
+            return removable
+        return await arun_transaction(release)
+
+    async def arelease_blobs(self, transaction: Transaction, blobs: List[tuple]) -> List[AnyStr]:
+        '''
+        Drop the CV references (digest, path) to blobs, in the transaction of
+        the caller, which must not have written yet. A blob may be listed
+        once per CV referencing it.
+        Return the paths of the blobs no CV references anymore.
+        '''
+        counts = {}
+        for digest, path in blobs:
+            counts[(digest, path)] = counts.get((digest, path), 0) + 1
+        released = [
+            (digest, *self.__blob_released(path, await transaction.aget(self.blob_adb, digest), count), path)
+            for (digest, path), count in counts.items()
+        ]
+        for digest, data, _, _ in released:
+            if data:
+                transaction.set(self.blob_adb, digest, data)
+        return [path for _, _, removable, path in released if removable]
+
+    def get_stats(self) -> Dict[str, Any]:
+        '''
+        Get hit/miss counters and hit rate per kind of cached result.
+        '''
+        with self._lock:
+            stats = {kind: dict(counter) for kind, counter in self.stats.items()}
+        for counter in stats.values():
+            total = counter["hits"] + counter["misses"]
+            counter["hit_rate"] = counter["hits"] / total if total else 0.0
+        stats["dedup_blobs"] = self.dedup_blobs
+        return stats
@@ -0,0 +1,284 @@
+from typing import Any, AnyStr, Dict, List, Set
+import bisect
+import threading
+from collections import OrderedDict
+from ..utils.constants import SCORE_FIELDS
+
+
+def _score(value: Any) -> float | None:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+class PositionIndex:
+    '''
+    Query index of the CVs of one position.
+    Each CV gets an ordinal, status and label filters are bitmaps over the
+    ordinals and each score field is a sorted list of (score, ordinal).
+    CVs without a score are left out of that field's list.
+    '''
+
+    def __init__(self):
+        self.ordinals: Dict[str, int] = {}
+        self.cv_ids: List[AnyStr | None] = []
+        self.entries: Dict[int, tuple] = {}
+        self.all = 0
+        self.status: Dict[str, int] = {}
+        self.labels: Dict[str, int] = {}
+        self.scores: Dict[str, List[tuple]] = {field: [] for field in SCORE_FIELDS}
+
+    def __ordinal(self, cv_id: AnyStr) -> int:
+        ordinal = self.ordinals.get(cv_id)
+        if ordinal is None:
+            ordinal = len(self.cv_ids)
+            self.ordinals[cv_id] = ordinal
+            self.cv_ids.append(cv_id)
+        return ordinal
+
+    @staticmethod
+    def __clear(bitmaps: Dict[str, int], key: AnyStr, bit: int) -> None:
+        bitmaps[key] &= ~bit
+        if not bitmaps[key]:
+            del bitmaps[key]
+
+    def set_cv(self, cv_id: AnyStr, doc: Dict[str, Any]) -> None:
+        '''
+        Add or replace a CV from its document, only "status", "labels" and
+        "matching.overall_result" are used.
+        '''
+        self.remove_cv(cv_id)
+        ordinal = self.__ordinal(cv_id)
+        bit = 1 << ordinal
+
+        status = doc.get("status")
+        labels = doc.get("labels") if isinstance(doc.get("labels"), list) else []
+        labels = list(dict.fromkeys(label for label in labels if isinstance(label, str)))
+        overall_result = (doc.get("matching") or {}).get("overall_result") \
+            if isinstance(doc.get("matching"), dict) else None
+        scores = {
+            field: _score(overall_result.get(field))
+            for field in SCORE_FIELDS
+        } if isinstance(overall_result, dict) else {}
+
+        self.all |= bit
+        if status:
+            self.status[status] = self.status.get(status, 0) | bit
+        for label in labels:
+            self.labels[label] = self.labels.get(label, 0) | bit
+        for field, score in scores.items():
+            if score is not None:
+                bisect.insort(self.scores[field], (score, ordinal))
+        self.entries[ordinal] = (status, labels, scores)
+
+    def remove_cv(self, cv_id: AnyStr) -> None:
+        ordinal = self.ordinals.get(cv_id)
+        if ordinal is None or ordinal not in self.entries:
+            return
+        bit = 1 << ordinal
+        status, labels, scores = self.entries.pop(ordinal)
+        self.all &= ~bit
+        if status:
+            self.__clear(self.status, status, bit)
+        for label in labels:
+            self.__clear(self.labels, label, bit)
+        for field, score in scores.items():
+            if score is not None:
+                items = self.scores[field]
+                i = bisect.bisect_left(items, (score, ordinal))
+                if i < len(items) and items[i] == (score, ordinal):
+                    items.pop(i)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def sparse(self) -> bool:
+        # Ordinals of removed CVs are not reused, rebuild once they dominate
+        return len(self.cv_ids) > 2 * len(self.entries) + 64
+
+    def __range(self, field: AnyStr, low: float | None, high: float | None) -> int:
+        # CVs with a score of field between low and high, both included
+        items = self.scores[field]
+        start = 0 if low is None else bisect.bisect_left(items, (low, -1))
+        end = len(items) if high is None else bisect.bisect_right(items, (high, len(self.cv_ids)))
+        mask = 0
+        for _, ordinal in items[start:end]:
+            mask |= 1 << ordinal
+        return mask
+
+    def query(
+        self,
+        order_ids: List[AnyStr],
+        status: List[AnyStr] = [],
+        labels: List[AnyStr] = [],
+        min_scores: Dict[str, float] = {},
+        max_scores: Dict[str, float] = {},
+        sort_by: AnyStr | None = None,
+        descending: bool = True,
+        top_k: int = 20
+    ) -> Dict[str, Any]:
+        '''
+        Get the CVs with one of the statuses, every label and scores within
+        the thresholds. Return how many match, the ids of the first top_k
+        sorted by score (CVs without that score last, in the order of
+        order_ids), or in the order of order_ids without sort_by, and the
+        status and label counts of the matching CVs.
+        '''
+        mask = self.all
+        if status:
+            status_mask = 0
+            for value in status:
+                status_mask |= self.status.get(value, 0)
+            mask &= status_mask
+        for label in labels:
+            mask &= self.labels.get(label, 0)
+        for field in dict.fromkeys([*min_scores, *max_scores]):
+            mask &= self.__range(field, min_scores.get(field), max_scores.get(field))
+
+        cv_ids = []
+        if sort_by:
+            items = self.scores[sort_by]
+            for _, ordinal in (reversed(items) if descending else items):
+                if len(cv_ids) >= top_k:
+                    break
+                if mask >> ordinal & 1:
+                    cv_ids.append(self.cv_ids[ordinal])
+            # CVs without that score follow in the order of order_ids
+            unscored = mask & ~self.__range(sort_by, None, None)
+            for cv_id in order_ids:
+                if len(cv_ids) >= top_k:
+                    break
+                ordinal = self.ordinals.get(cv_id)
+                if ordinal is not None and unscored >> ordinal & 1:
+                    cv_ids.append(cv_id)
+        else:
+            for cv_id in order_ids:
+                if len(cv_ids) >= top_k:
+                    break
+                ordinal = self.ordinals.get(cv_id)
+                if ordinal is not None and mask >> ordinal & 1:
+                    cv_ids.append(cv_id)
+
+        facets = {
+            "status": {key: (bits & mask).bit_count() for key, bits in self.status.items()},
+            "labels": {key: (bits & mask).bit_count() for key, bits in self.labels.items()}
+        }
+        facets["labels"] = dict(sorted(
+            [(key, count) for key, count in facets["labels"].items() if count],
+            key=lambda item: (-item[1], item[0])))
+        return {"total": mask.bit_count(), "cv_ids": cv_ids, "facets": facets}
+
+
+class CVIndexProvider:
+    '''
+    In-memory query indexes of the most recently queried positions.
+    A position's index is built from a projection read on its first query.
+    Local CV updates are applied to it right away, CVs changed by other
+    instances are marked dirty and read again on the next query, and the
+    membership of the position is reconciled with its CV ids on every query.
+    '''
+
+    def __init__(self, collection_name: AnyStr, max_positions: int = 256):
+        self.collection_name = collection_name
+        self.max_positions = max_positions
+        self.indexes: OrderedDict[str, PositionIndex] = OrderedDict()
+        self.positions: Dict[str, str] = {}
+        self.dirty: Dict[str, Set[str]] = {}
+        self.stats = {"builds": 0, "hits": 0, "updates": 0}
+        # Also held by callers while they query an index
+        self.lock = threading.RLock()
+
+    def get(self, position_id: AnyStr) -> PositionIndex | None:
+        with self.lock:
+            index = self.indexes.get(position_id)
+            if index is not None:
+                self.indexes.move_to_end(position_id)
+                self.stats["hits"] += 1
+            return index
+
+    def build(self, position_id: AnyStr, docs: List[Dict[str, Any]]) -> PositionIndex:
+        '''
+        Build the index of a position from its CV documents.
+        '''
+        index = PositionIndex()
+        for doc in docs:
+            index.set_cv(doc["id"], doc)
+        with self.lock:
+            self.drop(position_id)
+            self.indexes[position_id] = index
+            self.positions.update({cv_id: position_id for cv_id in index.ordinals})
+            self.stats["builds"] += 1
+            while len(self.indexes) > self.max_positions:
+                self.drop(next(iter(self.indexes)))
+        return index
+
+    def drop(self, position_id: AnyStr) -> None:
+        with self.lock:
+            index = self.indexes.pop(position_id, None)
+            self.dirty.pop(position_id, None)
+            if index is not None:
+                for cv_id in index.ordinals:
+                    if self.positions.get(cv_id) == position_id:
+                        del self.positions[cv_id]
+
+    def update_cv(self, position_id: AnyStr | None, cv_id: AnyStr, doc: Dict[str, Any]) -> None:
+        '''
+        Apply a CV update to its position's index, when the position is indexed.
+        '''
+        with self.lock:
+            position_id = position_id or self.positions.get(cv_id)
+            index = self.indexes.get(position_id)
+            if index is None:
+                return
+            index.set_cv(cv_id, doc)
+            self.positions[cv_id] = position_id
+            self.dirty.get(position_id, set()).discard(cv_id)
+            self.stats["updates"] += 1
+
+    def remove_cvs(self, position_id: AnyStr, cv_ids: List[AnyStr]) -> None:
+        with self.lock:
+            index = self.indexes.get(position_id)
+            if index is None:
+                return
+            for cv_id in cv_ids:
+                index.remove_cv(cv_id)
+                if self.positions.get(cv_id) == position_id:
+                    del self.positions[cv_id]
+
+    def missing(self, position_id: AnyStr, cv_ids: List[AnyStr]) -> List[AnyStr] | None:
+        '''
+        Reconcile the index with the CV ids of the position: CVs no longer in
+        the position are removed. Return the CVs to read again, new or dirty,
+        or None when the position has to be built.
+        '''
+        with self.lock:
+            index = self.indexes.get(position_id)
+            if index is None or index.sparse:
+                self.drop(position_id)
+                return None
+            members = set(cv_ids)
+            self.remove_cvs(position_id, [cv_id for cv_id, ordinal in index.ordinals.items()
+                                          if cv_id not in members and ordinal in index.entries])
+            dirty = self.dirty.pop(position_id, set())
+            return [cv_id for cv_id in cv_ids
+                    if cv_id in dirty or index.ordinals.get(cv_id) not in index.entries]
+
+    def receive(self, collection: AnyStr, doc_id: AnyStr) -> None:
+        '''
+        Invalidation listener: mark a CV changed by another instance dirty.
+        '''
+        if collection != self.collection_name:
+            return
+        with self.lock:
+            position_id = self.positions.get(doc_id)
+            if position_id is not None and position_id in self.indexes:
+                self.dirty.setdefault(position_id, set()).add(doc_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                **self.stats,
+                "positions": len(self.indexes),
+                "cvs": sum(len(index) for index in self.indexes.values())
+            }
@@ -1,9 +1,21 @@
 from typing import Any, AnyStr, Dict, List
 import time
 from firebase_admin import firestore
-from ._cache_init import cacher
+from ._cache_init import cacher, invalidations
+from .identity_map import count_read
+from .batch_provider import current_batch
 from ..configs.firebase_config import db
 from ..utils.logger import log_firebase
+from ..utils.counters import add_counts
+from ..utils.pagination import page_ids
+
+
+def _increments(counts: Dict[str, Any]) -> Dict[str, Any]:
+    # Nested counts to Firestore increment transforms
+    return {
+        key: _increments(value) if isinstance(value, dict) else firestore.Increment(value)
+        for key, value in counts.items()
+    }
 
 
 class DatabaseProvider:
@@ -17,11 +29,18 @@ class DatabaseProvider:
         self.collection = db.collection(collection_name)
         self.cacher = cacher
 
+    def __cache(self, doc_id: AnyStr, doc_dict: Dict[str, Any], snapshot: int) -> None:
+        # Skip documents another instance changed while they were being read
+        key = f"{self.collection_name}:{doc_id}"
+        if invalidations.is_current(key, snapshot):
+            self.cacher.set(key, doc_dict)
+
     def get_all(self) -> List[Dict[str, Any]]:
         '''
         Get all documents from the collection.
         Return a list of documents.
         '''
+        snapshot = invalidations.snapshot()
         _s = time.perf_counter()
         docs = self.collection.stream()
         _e = time.perf_counter() - _s
@@ -34,9 +53,9 @@ class DatabaseProvider:
             doc_dict[self.id_field] = doc.id
             doc_list.append(doc_dict)
             # Save to cache
-            self.cacher.set(
-                f"{self.collection_name}:{doc.id}", doc_dict)
+            self.__cache(doc.id, doc_dict, snapshot)
 
+        count_read(len(doc_list))
         return doc_list
 
     def get_all_by_ids(self, ids: List[AnyStr]) -> List[Dict[str, Any]]:
@@ -58,6 +77,7 @@ class DatabaseProvider:
             _id) for _id in ids if _id not in cache_doc_ids]
 
         if len(doc_refs) != 0:
+            snapshot = invalidations.snapshot()
             _s = time.perf_counter()
             docs = db.get_all(references=doc_refs)
             _e = time.perf_counter() - _s
@@ -73,11 +93,23 @@ class DatabaseProvider:
                 doc_list.append(doc_dict)
 
                 # Save to cache
-                self.cacher.set(
-                    f"{self.collection_name}:{doc.id}", doc_dict)
+                self.__cache(doc.id, doc_dict, snapshot)
+
+            count_read(len(doc_refs))
 
         return doc_list
 
+    def get_page_by_ids(self, ids: List[AnyStr], limit: int | None, cursor: AnyStr | None = None) -> tuple[List[Dict[str, Any]], AnyStr | None]:
+        '''
+        Get one page of documents in the order of ids, starting at cursor.
+        Only the documents of the page are read.
+        Return the documents and the cursor of the next page, None on the last page.
+        Raise ValueError for an invalid cursor.
+        '''
+        ids, next_cursor = page_ids(ids, limit, cursor)
+        docs = {doc[self.id_field]: doc for doc in self.get_all_by_ids(ids)}
+        return [docs[_id] for _id in ids if _id in docs], next_cursor
+
     def get_by_id(self, doc_id: AnyStr) -> Dict[str, Any] | None:
         '''
         Get a document from the collection.
@@ -90,9 +122,11 @@ class DatabaseProvider:
         doc = self.cacher.get(f"{self.collection_name}:{doc_id}")
 
         if not doc:
+            snapshot = invalidations.snapshot()
             _s = time.perf_counter()
             doc = self.collection.document(doc_id).get()
             _e = time.perf_counter() - _s
+            count_read()
 
             log_firebase(f"Database read to {doc_id} [{_e:.2f}s]")
 
@@ -101,8 +135,7 @@ class DatabaseProvider:
                 doc_dict[self.id_field] = doc_id
 
                 # Save to cache
-                self.cacher.set(
-                    f"{self.collection_name}:{doc_id}", doc_dict)
+                self.__cache(doc_id, doc_dict, snapshot)
 
                 return doc_dict
             else:
@@ -126,6 +159,8 @@ class DatabaseProvider:
             doc_dict = doc.to_dict()
             doc_dict[self.id_field] = doc.id
             doc_list.append(doc_dict)
+
+        count_read(len(doc_list))
         return doc_list
 
     def query_similar(self, key: AnyStr, value: AnyStr) -> List[Dict[str, Any]]:
@@ -145,6 +180,8 @@ class DatabaseProvider:
             doc_dict = doc.to_dict()
             doc_dict[self.id_field] = doc.id
             doc_list.append(doc_dict)
+
+        count_read(len(doc_list))
         return doc_list
 
     def create(self, data: Dict) -> AnyStr:
@@ -152,6 +189,14 @@ class DatabaseProvider:
         Create a new document in the collection.
         Return the document id.
         '''
+        # Defer to the open batch, the id is generated client side
+        batch = current_batch(is_async=False)
+        if batch is not None:
+            doc_ref = self.collection.document()
+            batch.set(doc_ref, data)
+            batch.on_rollback(lambda: self.cacher.remove(f"{self.collection_name}:{doc_ref.id}"))
+            return doc_ref.id
+
         _s = time.perf_counter()
         doc_ref = self.collection.add(data)
         _e = time.perf_counter() - _s
@@ -168,11 +213,48 @@ class DatabaseProvider:
             **self.get_by_id(doc_id), **data
         })
 
+        # Defer to the open batch
+        batch = current_batch(is_async=False)
+        if batch is not None:
+            batch.set(self.collection.document(doc_id), data, merge=True)
+            batch.on_commit(lambda: invalidations.publish(self.collection_name, doc_id))
+            batch.on_rollback(lambda: self.cacher.remove(f"{self.collection_name}:{doc_id}"))
+            return
+
         _s = time.perf_counter()
         self.collection.document(doc_id).set(data, merge=True)
         _e = time.perf_counter() - _s
 
         log_firebase(f"Database updated {doc_id} [{_e:.2f}s]")
+        invalidations.publish(self.collection_name, doc_id)
+
+    def increment(self, doc_id: AnyStr, counts: Dict[str, Any]) -> None:
+        '''
+        Add nested counts to the numeric fields of a document, missing fields
+        and documents start at 0. Concurrent increments add up.
+        '''
+        # Update counters in cache, if the document is there
+        key = f"{self.collection_name}:{doc_id}"
+        cache_doc = self.cacher.get(key)
+        if cache_doc:
+            self.cacher.set(key, add_counts(cache_doc, counts))
+
+        data = _increments(counts)
+
+        # Defer to the open batch
+        batch = current_batch(is_async=False)
+        if batch is not None:
+            batch.set(self.collection.document(doc_id), data, merge=True)
+            batch.on_commit(lambda: invalidations.publish(self.collection_name, doc_id))
+            batch.on_rollback(lambda: self.cacher.remove(key))
+            return
+
+        _s = time.perf_counter()
+        self.collection.document(doc_id).set(data, merge=True)
+        _e = time.perf_counter() - _s
+
+        log_firebase(f"Database incremented {doc_id} [{_e:.2f}s]")
+        invalidations.publish(self.collection_name, doc_id)
 
     def delete(self, doc_id: AnyStr) -> None:
         '''
@@ -181,11 +263,19 @@ class DatabaseProvider:
         # Remove data in cache
         self.cacher.remove(f"{self.collection_name}:{doc_id}")
 
+        # Defer to the open batch
+        batch = current_batch(is_async=False)
+        if batch is not None:
+            batch.delete(self.collection.document(doc_id))
+            batch.on_commit(lambda: invalidations.publish(self.collection_name, doc_id))
+            return
+
         _s = time.perf_counter()
         self.collection.document(doc_id).delete()
         _e = time.perf_counter() - _s
 
         log_firebase(f"Database deleted {doc_id} [{_e:.2f}s]")
+        invalidations.publish(self.collection_name, doc_id)
 
 
 # from typing import Any, AnyStr, Dict, List
@@ -0,0 +1,135 @@
+from typing import AnyStr, Callable, Dict
+import os
+import glob
+import time
+import uuid
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ..utils.logger import log_cache
+
+
+class ExportProvider:
+    '''
+    Build export files in worker threads and keep them on disk, keyed by
+    name and data version. A repeated download of an unchanged version is
+    served from disk, a new version replaces the previous file of the name.
+    Concurrent requests for the same file share one build.
+    '''
+
+    def __init__(self, directory: AnyStr, max_workers: int = 2, max_files: int = 200):
+        self.directory = directory
+        self.max_workers = max_workers
+        self.max_files = max_files
+        self.stats = {"hits": 0, "builds": 0}
+        self._pool = None
+        self._lock = threading.Lock()
+        self._building: Dict[str, asyncio.Future] = {}
+
+    def __get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="export")
+            return self._pool
+
+    def path(self, name: AnyStr, version: int, extension: AnyStr) -> AnyStr:
+        return os.path.join(self.directory, f"{name}.{version}.{extension}")
+
+    def get(self, name: AnyStr, version: int, extension: AnyStr) -> AnyStr | None:
+        '''
+        Get the path of a built file, None if it is not built.
+        '''
+        path = self.path(name, version, extension)
+        if not os.path.exists(path):
+            return None
+        self.stats["hits"] += 1
+        return path
+
+    def __write(self, write: Callable[[AnyStr], None], path: AnyStr) -> AnyStr:
+        # Write aside and move in place, a file on disk is always complete
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        _s = time.perf_counter()
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        _e = time.perf_counter() - _s
+        log_cache(f"Export built {os.path.basename(path)} [{_e:.2f}s]")
+        return path
+
+    def __prune(self, name: AnyStr, path: AnyStr, extension: AnyStr) -> None:
+        # Older versions of the file, then the least recently built files.
+        # Files being written and files built for one request are left alone.
+        for old_path in glob.glob(os.path.join(self.directory, f"{name}.*.{extension}")):
+            if old_path != path and ".once-" not in old_path:
+                self.__remove(old_path)
+        paths = sorted(
+            [old_path for old_path in glob.glob(os.path.join(self.directory, "*.*.*"))
+             if ".once-" not in old_path and not old_path.endswith(".tmp")],
+            key=self.__mtime)
+        for old_path in paths[:max(0, len(paths) - self.max_files)]:
+            if old_path != path:
+                self.__remove(old_path)
+
+    @staticmethod
+    def __mtime(path: AnyStr) -> float:
+        try:
+            return os.path.getmtime(path)
+        except FileNotFoundError:
+            return 0.0
+
+    @staticmethod
+    def __remove(path: AnyStr) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    async def build(
+        self,
+        name: AnyStr,
+        version: int | None,
+        extension: AnyStr,
+        write: Callable[[AnyStr], None]
+    ) -> AnyStr:
+        '''
+        Get the file of a name and version, built with write(path) in a
+        worker thread when missing. write runs off the event loop, so it
+        must only use synchronous providers.
+        With version None the file is built for this request only, under a
+        unique path the caller removes after opening it.
+        '''
+        if version is None:
+            path = self.path(name, f"once-{uuid.uuid4().hex[:8]}", extension)
+            return await asyncio.get_running_loop().run_in_executor(
+                self.__get_pool(), self.__write, write, path)
+
+        path = self.get(name, version, extension)
+        if path:
+            return path
+
+        path = self.path(name, version, extension)
+        future = self._building.get(path)
+        if future is None:
+            self.stats["builds"] += 1
+            future = asyncio.ensure_future(asyncio.get_running_loop().run_in_executor(
+                self.__get_pool(), self.__write, write, path))
+            self._building[path] = future
+            future.add_done_callback(lambda _: self._building.pop(path, None))
+        path = await asyncio.shield(future)
+        self.__prune(name, path, extension)
+        return path
+
+    def get_stats(self):
+        return {**self.stats, "building": len(self._building)}
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,142 @@
+from typing import AnyStr, List, Set
+import os
+import time
+import asyncio
+import threading
+import concurrent.futures
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from ..utils.extractor import extract_cv_content, ExtractionError, ExtractionTimeout
+from ..utils.logger import log_extract
+
+
+class ExtractionProvider:
+    '''
+    Run CPU-bound CV text extraction in a pool of worker processes,
+    so parsing large documents never blocks the event loop.
+    With max_workers = 0, extraction runs in a thread of this process.
+    Files are parsed in memory unless use_temp_file is set.
+    A worker stuck past timeout + grace retires its pool: the files queued
+    on it still run, then its processes, the stuck one included, are
+    terminated. Other files never fail because of it.
+    '''
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        timeout: float = 30.0,
+        max_pages: int = 30,
+        use_temp_file: bool = False,
+        grace: float = 5.0
+    ):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.use_temp_file = use_temp_file
+        self.grace = grace
+        self._pool = None
+        self._futures: Set[Future] = set()
+        self._lock = threading.Lock()
+
+    def __get_pool(self) -> ProcessPoolExecutor:
+        # Called with the lock held
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def __submit(self, *args) -> Future:
+        # Submitted under the lock, a retired pool takes no new work
+        with self._lock:
+            future = self.__get_pool().submit(extract_cv_content, *args)
+            self._futures.add(future)
+        future.add_done_callback(self.__discard)
+        return future
+
+    def __discard(self, future: Future) -> None:
+        with self._lock:
+            self._futures.discard(future)
+
+    def __retire_pool(self, stuck: Future | None = None) -> None:
+        # The next call starts a new pool. The work queued on the old one
+        # is not cancelled, its processes are terminated once it is done
+        with self._lock:
+            pool, self._pool = self._pool, None
+            futures, self._futures = self._futures, set()
+        if pool is None:
+            return
+        processes = self.__processes(pool)
+        pool.shutdown(wait=False, cancel_futures=False)
+        others = [future for future in futures if future is not stuck]
+        threading.Thread(
+            target=self.__reap, args=(processes, others), name="extraction-reaper", daemon=True).start()
+
+    def __reap(self, processes: List, futures: List[Future]) -> None:
+        concurrent.futures.wait(futures, timeout=self.timeout + self.grace)
+        self.__terminate(processes)
+
+    @staticmethod
+    def __processes(pool: ProcessPoolExecutor) -> List:
+        # Taken before shutdown, which drops the pool's references to them
+        return list((getattr(pool, "_processes", None) or {}).values())
+
+    @staticmethod
+    def __terminate(processes: List) -> None:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    def start(self) -> None:
+        '''
+        Start the worker processes ahead of the first extraction.
+        '''
+        if self.max_workers > 0:
+            with self._lock:
+                self.__get_pool().submit(os.getpid)
+
+    async def extract(self, data: bytes, filename: AnyStr) -> AnyStr:
+        '''
+        Extract the text content of a PDF or DOCX file.
+        Raise ExtractionError if the file can not be parsed,
+        ExtractionTimeout if it takes longer than the timeout.
+        '''
+        _s = time.perf_counter()
+        submitted = None
+        if self.max_workers <= 0:
+            future = asyncio.to_thread(
+                extract_cv_content, data, filename, self.max_pages, None, self.use_temp_file)
+        else:
+            submitted = self.__submit(data, filename, self.max_pages, self.timeout, self.use_temp_file)
+            future = asyncio.wrap_future(submitted)
+
+        try:
+            # The worker enforces the timeout itself, this is only a backstop
+            content = await asyncio.wait_for(future, timeout=self.timeout + self.grace)
+        except asyncio.TimeoutError:
+            # Still queued, it was cancelled; running, its worker is stuck
+            if submitted is not None and not submitted.cancelled():
+                self.__retire_pool(stuck=submitted)
+            raise ExtractionTimeout(f"Extraction of {filename} exceeded {self.timeout}s.")
+        except BrokenProcessPool:
+            self.__retire_pool()
+            raise ExtractionError(f"Extraction worker crashed on {filename}.")
+        except asyncio.CancelledError:
+            # Cancelled in the pool, not this task: the file fails on its own
+            if submitted is not None and submitted.cancelled():
+                raise ExtractionError(f"Extraction of {filename} was cancelled.")
+            raise
+        _e = time.perf_counter() - _s
+
+        log_extract(f"Extracted content of {filename} [{_e:.2f}s]")
+        return content
+
+    def close(self) -> None:
+        '''
+        Stop the worker processes.
+        '''
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._futures = set()
+        if pool is not None:
+            processes = self.__processes(pool)
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.__terminate(processes)
@@ -0,0 +1,55 @@
+from typing import Any, AnyStr, Dict
+import hashlib
+from fastapi import HTTPException
+from .cache_provider import CacheProvider
+from .http_provider import HTTPClientProvider
+from ..utils.constants import GOOGLE_TOKEN_NAMESPACE
+
+
+class GoogleAuthProvider:
+    '''
+    Verify Google access tokens against the userinfo endpoint on the pooled
+    HTTP client. Verified profiles are kept in memory for a short TTL,
+    so repeated or retried logins with the same token skip the network.
+    '''
+
+    def __init__(self, http_client: HTTPClientProvider, cacher: CacheProvider, verify_url: AnyStr, ttl: int = 300):
+        self.http_client = http_client
+        self.cacher = cacher
+        self.verify_url = verify_url
+        self.ttl = ttl
+
+    @staticmethod
+    def __key(access_token: AnyStr) -> AnyStr:
+        # Never keep the raw token as a cache key
+        return f"{GOOGLE_TOKEN_NAMESPACE}:{hashlib.sha256(access_token.encode()).hexdigest()}"
+
+    async def verify(self, access_token: AnyStr) -> Dict[str, Any]:
+        '''
+        Get the Google profile of the access token owner.
+        Raise HTTPException if Google rejects the token.
+        '''
+        # Get from cache
+        key = self.__key(access_token)
+        profile = await self.cacher.aget(key)
+        if profile:
+            return profile
+
+        response = await self.http_client.get("google", self.verify_url + access_token, headers={
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        })
+
+        # Handle error and response
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail="Google API Error"
+            )
+
+        # Only verified tokens are cached
+        profile = response.json()
+        if self.ttl > 0:
+            await self.cacher.aset(key, profile, ttl=self.ttl)
+        return profile
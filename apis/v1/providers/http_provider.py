@@ -0,0 +1,122 @@
+from typing import Any, AnyStr, Dict
+import time
+import threading
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HTTPClientProvider:
+    '''
+    App-lifetime pooled HTTP client for the AI processing and matching services,
+    so requests reuse open connections instead of a new handshake per call.
+    Each call names its endpoint, which selects its timeout and latency metrics.
+    '''
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        timeouts: Dict[AnyStr, float] | None = None,
+        default_timeout: float = 60.0
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        # HTTP/2 needs the h2 package
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.timeouts = dict(timeouts or {})
+        self.default_timeout = default_timeout
+        self.metrics = {}
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self.start()
+        return self._client
+
+    def start(self) -> None:
+        '''
+        Open the connection pool.
+        '''
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                http2=self.http2,
+                timeout=self.default_timeout
+            )
+
+    async def close(self) -> None:
+        '''
+        Close the pooled connections.
+        '''
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    def get_timeout(self, endpoint: AnyStr) -> float:
+        return self.timeouts.get(endpoint, self.default_timeout)
+
+    def __record(self, endpoint: AnyStr, elapsed: float, failed: bool) -> None:
+        with self._lock:
+            metric = self.metrics.setdefault(endpoint, {
+                "requests": 0,
+                "errors": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0
+            })
+            metric["requests"] += 1
+            metric["errors"] += int(failed)
+            metric["total_seconds"] += elapsed
+            metric["max_seconds"] = max(metric["max_seconds"], elapsed)
+
+    async def request(
+        self,
+        method: AnyStr,
+        endpoint: AnyStr,
+        url: AnyStr,
+        timeout: float | None = None,
+        **kwargs
+    ) -> httpx.Response:
+        '''
+        Send a request to the named endpoint.
+        The endpoint timeout applies unless timeout is given.
+        '''
+        _s = time.perf_counter()
+        failed = True
+        try:
+            response = await self.client.request(
+                method, url, timeout=timeout if timeout is not None else self.get_timeout(endpoint), **kwargs)
+            failed = response.status_code >= 400
+            return response
+        finally:
+            self.__record(endpoint, time.perf_counter() - _s, failed)
+
+    async def get(self, endpoint: AnyStr, url: AnyStr, **kwargs) -> httpx.Response:
+        return await self.request("GET", endpoint, url, **kwargs)
+
+    async def post(self, endpoint: AnyStr, url: AnyStr, **kwargs) -> httpx.Response:
+        return await self.request("POST", endpoint, url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        '''
+        Get request count, error count and latency per endpoint.
+        '''
+        with self._lock:
+            stats = {endpoint: dict(metric) for endpoint, metric in self.metrics.items()}
+        for metric in stats.values():
+            metric["avg_seconds"] = metric["total_seconds"] / metric["requests"] if metric["requests"] else 0.0
+        return {
+            "http2": self.http2,
+            "endpoints": stats
+        }
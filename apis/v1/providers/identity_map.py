@@ -0,0 +1,121 @@
+from typing import Any, AnyStr, Dict, List, Tuple
+from contextvars import ContextVar, Token
+
+
+class IdentityMap:
+    '''
+    Request-scoped registry of materialized schema objects.
+    Repeated lookups of one document id within a request return the same
+    object, and the backend reads issued by the request are counted.
+    '''
+
+    def __init__(self):
+        self.objects: Dict[Tuple[AnyStr, AnyStr], Any] = {}
+        self.reads = 0
+        self.documents = 0
+        self.hits = 0
+        self.active = True
+
+    def get(self, collection: AnyStr, doc_id: AnyStr) -> Any | None:
+        obj = self.objects.get((collection, doc_id))
+        if obj is not None:
+            self.hits += 1
+        return obj
+
+    def add(self, collection: AnyStr, doc_id: AnyStr, obj: Any) -> Any:
+        '''
+        Register an object and return the one the map holds for its id.
+        '''
+        return self.objects.setdefault((collection, doc_id), obj)
+
+    def discard(self, collection: AnyStr, doc_id: AnyStr) -> None:
+        self.objects.pop((collection, doc_id), None)
+
+    def close(self) -> None:
+        # Background tasks may still hold a reference, stop serving them
+        self.active = False
+        self.objects.clear()
+
+
+_current_map: ContextVar[IdentityMap | None] = ContextVar(
+    "identity_map", default=None)
+
+
+def open_identity_map() -> Token:
+    '''
+    Start a new identity map for the current request.
+    '''
+    return _current_map.set(IdentityMap())
+
+
+def close_identity_map(token: Token) -> None:
+    '''
+    Close the identity map of the current request.
+    '''
+    identity_map = _current_map.get()
+    if identity_map is not None:
+        identity_map.close()
+    _current_map.reset(token)
+
+
+def current_identity_map() -> IdentityMap | None:
+    '''
+    Get the identity map of the current request, None outside of a request.
+    '''
+    identity_map = _current_map.get()
+    if identity_map is None or not identity_map.active:
+        return None
+    return identity_map
+
+
+def identity_get(collection: AnyStr, doc_id: AnyStr) -> Any | None:
+    identity_map = current_identity_map()
+    if identity_map is None or not doc_id:
+        return None
+    return identity_map.get(collection, doc_id)
+
+
+def identity_add(collection: AnyStr, obj: Any) -> Any:
+    '''
+    Register a schema object by its id.
+    Return the object already registered for that id if there is one.
+    '''
+    identity_map = current_identity_map()
+    if identity_map is None or obj is None or not obj.id:
+        return obj
+    return identity_map.add(collection, obj.id, obj)
+
+
+def identity_discard(collection: AnyStr, doc_id: AnyStr) -> None:
+    identity_map = current_identity_map()
+    if identity_map is not None:
+        identity_map.discard(collection, doc_id)
+
+
+def identity_partition(collection: AnyStr, doc_ids: List[AnyStr]) -> Tuple[List[Any], List[AnyStr]]:
+    '''
+    Split ids into the objects already loaded in the request and the ids
+    that still have to be read.
+    '''
+    identity_map = current_identity_map()
+    if identity_map is None:
+        return [], list(doc_ids)
+
+    known, missing = [], []
+    for doc_id in doc_ids:
+        obj = identity_map.get(collection, doc_id)
+        if obj is not None:
+            known.append(obj)
+        else:
+            missing.append(doc_id)
+    return known, missing
+
+
+def count_read(documents: int = 1) -> None:
+    '''
+    Count one backend round-trip returning the given number of documents.
+    '''
+    identity_map = _current_map.get()
+    if identity_map is not None and identity_map.active:
+        identity_map.reads += 1
+        identity_map.documents += documents
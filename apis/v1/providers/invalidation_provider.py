@@ -0,0 +1,234 @@
+from typing import Any, AnyStr, Callable, Dict, List
+import json
+import time
+import uuid
+import queue
+import threading
+from datetime import datetime, timedelta, timezone
+from .cache_provider import CacheProvider
+from ..utils.logger import log_cache
+
+
+class InvalidationTransport:
+    '''
+    Carry invalidation events between instances.
+    '''
+
+    def send(self, event: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def start(self, receive: Callable[[Dict[str, Any]], None]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class FirestoreInvalidationTransport(InvalidationTransport):
+    '''
+    Events are documents of a Firestore collection, every instance listens
+    to the ones added after it started. Old events should be removed by a
+    Firestore TTL policy on the "expire_at" field.
+    '''
+
+    def __init__(self, db, collection_name: AnyStr = "CacheInvalidations", retention: float = 24 * 3600):
+        self.collection = db.collection(collection_name)
+        self.retention = retention
+        self._watch = None
+
+    def send(self, event: Dict[str, Any]) -> None:
+        now = datetime.now(timezone.utc)
+        self.collection.add({
+            **event,
+            "at": now,
+            "expire_at": now + timedelta(seconds=self.retention)
+        })
+
+    def start(self, receive: Callable[[Dict[str, Any]], None]) -> None:
+        def on_snapshot(_, changes, __):
+            for change in changes:
+                if change.type.name == "ADDED":
+                    receive(change.document.to_dict())
+
+        self._watch = self.collection \
+            .where("at", ">", datetime.now(timezone.utc)) \
+            .on_snapshot(on_snapshot)
+
+    def close(self) -> None:
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+
+class RedisInvalidationTransport(InvalidationTransport):
+    '''
+    Events are published on a Redis pub/sub channel.
+    '''
+
+    def __init__(self, url: AnyStr, channel: AnyStr = "cache-invalidations"):
+        # Optional dependency, only needed with Redis invalidation
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.channel = channel
+        self._pubsub = None
+        self._thread = None
+
+    def send(self, event: Dict[str, Any]) -> None:
+        self.client.publish(self.channel, json.dumps(event))
+
+    def start(self, receive: Callable[[Dict[str, Any]], None]) -> None:
+        def on_message(message):
+            receive(json.loads(message["data"]))
+
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.channel: on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        self.client.close()
+
+
+class InvalidationProvider:
+    '''
+    Versioned invalidation of cached documents across instances.
+    Writes publish the key of the changed document, and every other instance
+    evicts it from its cache. Each key remembers the version at which it was
+    last invalidated, so a read that started before an invalidation does not
+    cache the stale document it got back.
+    Local listeners are notified of every change, local or remote.
+    '''
+
+    def __init__(self, cacher: CacheProvider, transport: InvalidationTransport | None = None, window: float = 300.0):
+        self.cacher = cacher
+        self.transport = transport
+        self.window = window
+        self.instance_id = uuid.uuid4().hex
+        self.epoch = 0
+        self.versions: Dict[str, tuple] = {}
+        self.listeners: List[tuple] = []
+        self.stats = {"published": 0, "received": 0}
+        self._lock = threading.Lock()
+        self._outbox = queue.Queue()
+        self._sender = None
+
+    def snapshot(self) -> int:
+        '''
+        Get the current version, to take before reading documents.
+        '''
+        return self.epoch
+
+    def is_current(self, key: AnyStr, snapshot: int) -> bool:
+        '''
+        Check the key was not invalidated since the snapshot was taken.
+        '''
+        version = self.versions.get(key)
+        return version is None or version[0] <= snapshot
+
+    def subscribe(self, listener: Callable[[AnyStr, AnyStr], None], remote_only: bool = False) -> None:
+        '''
+        Call listener(collection, doc_id) on every document change, or only
+        on changes made by other instances with remote_only.
+        '''
+        self.listeners.append((listener, remote_only))
+
+    def __notify(self, collection: AnyStr, doc_id: AnyStr, remote: bool = False) -> None:
+        for listener, remote_only in self.listeners:
+            if remote_only and not remote:
+                continue
+            try:
+                listener(collection, doc_id)
+            except Exception as e:
+                log_cache(f"Invalidation listener failed. {str(e)}")
+
+    def __prune(self, now: float) -> None:
+        # Caller holds the lock, only recent versions can guard a read
+        for key in [key for key, (_, at) in self.versions.items() if now - at > self.window]:
+            del self.versions[key]
+
+    def publish(self, collection: AnyStr, doc_id: AnyStr) -> None:
+        '''
+        Announce a write to a document.
+        Sending happens in the background and never blocks the caller.
+        '''
+        self.__notify(collection, doc_id)
+        if self.transport is None:
+            return
+        self.stats["published"] += 1
+        self._outbox.put({
+            "collection": collection,
+            "doc_id": doc_id,
+            "origin": self.instance_id
+        })
+
+    def receive(self, event: Dict[str, Any]) -> None:
+        '''
+        Evict the document of an event published by another instance.
+        '''
+        if event.get("origin") == self.instance_id:
+            return
+        collection, doc_id = event["collection"], event["doc_id"]
+        key = f"{collection}:{doc_id}"
+        now = time.time()
+        with self._lock:
+            self.epoch += 1
+            self.versions[key] = (self.epoch, now)
+            if len(self.versions) > 10000:
+                self.__prune(now)
+            self.stats["received"] += 1
+        self.cacher.remove(key)
+        self.__notify(collection, doc_id, remote=True)
+
+    def __send_loop(self) -> None:
+        while True:
+            event = self._outbox.get()
+            if event is None:
+                return
+            try:
+                self.transport.send(event)
+            except Exception as e:
+                log_cache(f"Invalidation publish failed. {str(e)}")
+
+    def start(self) -> None:
+        '''
+        Start listening to and sending invalidation events.
+        '''
+        if self.transport is None or self._sender is not None:
+            return
+        self.transport.start(self.receive)
+        self._sender = threading.Thread(
+            target=self.__send_loop, name="cache-invalidation", daemon=True)
+        self._sender.start()
+
+    def close(self) -> None:
+        if self._sender is not None:
+            self._outbox.put(None)
+            self._sender.join(timeout=5.0)
+            self._sender = None
+        if self.transport is not None:
+            self.transport.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "enabled": self.transport is not None,
+            "pending": self._outbox.qsize()
+        }
+
+
+def create_invalidation_transport(url: AnyStr | None) -> InvalidationTransport | None:
+    '''
+    Create the transport for the url, "firestore" or "redis://host:6379/0".
+    Return None without url, invalidation then stays local to the process.
+    '''
+    if not url:
+        return None
+    if url == "firestore":
+        from ..configs.firebase_config import db
+        return FirestoreInvalidationTransport(db)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisInvalidationTransport(url)
+    raise ValueError(f"Unsupported invalidation transport {url}")
@@ -0,0 +1,242 @@
+from typing import AnyStr, Dict
+import os
+import json
+import time
+import uuid
+import atexit
+import tempfile
+import threading
+from ..utils.constants import SESSION_NAMESPACE
+from ..utils.logger import log_cache
+
+
+class SessionProvider:
+    '''
+    Store of logged-in sessions: one entry per login, keyed by user id and
+    session id, each with its own expiry. Membership checks are O(1) and
+    logging in or out never rewrites the persistent cache.
+    Sessions live in this process. Logins and logouts only mark the store
+    dirty, a background flusher saves it to a small file every
+    flush_interval seconds, or earlier after flush_threshold changes, and
+    on close, so a worker that dies loses at most the last interval.
+    '''
+
+    # Whether other workers can revoke the sessions of this store
+    shared = False
+
+    def __init__(
+        self,
+        ttl: int = 7 * 24 * 3600,
+        persist_path: AnyStr | None = None,
+        flush_interval: float = 5.0,
+        flush_threshold: int = 100
+    ):
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.sessions: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._mutations = 0
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._flusher = None
+        self.__load()
+        if self.persist_path:
+            self._flusher = threading.Thread(
+                target=self.__flush_loop, name="session-flusher", daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
+
+    def __load(self) -> None:
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r") as _file:
+                self.sessions = json.load(_file)
+        except (json.JSONDecodeError, OSError):
+            log_cache("Session file is corrupted. Resetting sessions.")
+            self.sessions = {}
+        self.__prune_all()
+
+    def __prune_all(self) -> None:
+        now = time.time()
+        with self._lock:
+            for uid in list(self.sessions.keys()):
+                self.__prune(uid, now)
+
+    def __prune(self, uid: AnyStr, now: float) -> Dict[str, float] | None:
+        # Drop expired sessions of one user, caller holds the lock
+        user_sessions = self.sessions.get(uid)
+        if user_sessions is None:
+            return None
+        for sid in [sid for sid, expires_at in user_sessions.items() if expires_at <= now]:
+            del user_sessions[sid]
+        if not user_sessions:
+            del self.sessions[uid]
+            return None
+        return user_sessions
+
+    def __changed(self) -> None:
+        # Caller holds the lock, the flusher writes the change
+        self._mutations += 1
+        if self._mutations >= self.flush_threshold:
+            self._wakeup.set()
+
+    def __flush_loop(self) -> None:
+        # Flush on interval, or earlier when the mutation threshold is hit
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log_cache(f"Session flush failed. {str(e)}")
+
+    def create(self, uid: AnyStr) -> AnyStr:
+        '''
+        Open a session for the user, return its session id.
+        '''
+        sid = uuid.uuid4().hex
+        with self._lock:
+            self.sessions.setdefault(uid, {})[sid] = time.time() + self.ttl
+            self.__changed()
+        return sid
+
+    def is_active(self, uid: AnyStr, sid: AnyStr | None) -> bool:
+        '''
+        Check if the session is open and not expired.
+        '''
+        if not sid:
+            return False
+        with self._lock:
+            user_sessions = self.__prune(uid, time.time())
+            return user_sessions is not None and sid in user_sessions
+
+    def revoke(self, uid: AnyStr, sid: AnyStr | None) -> None:
+        '''
+        Close one session of the user.
+        '''
+        with self._lock:
+            user_sessions = self.sessions.get(uid)
+            if user_sessions is None:
+                return
+            user_sessions.pop(sid, None)
+            if not user_sessions:
+                del self.sessions[uid]
+            self.__changed()
+
+    def revoke_all(self, uid: AnyStr) -> None:
+        '''
+        Close every session of the user.
+        '''
+        with self._lock:
+            self.sessions.pop(uid, None)
+            self.__changed()
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(len(user_sessions) for user_sessions in self.sessions.values())
+
+    def flush(self) -> None:
+        '''
+        Save the open sessions if they changed since the last flush.
+        The file is replaced atomically through a temp file + rename.
+        '''
+        if not self.persist_path:
+            return
+        with self._flush_lock:
+            with self._lock:
+                if self._mutations == 0:
+                    return
+                pending = self._mutations
+                now = time.time()
+                for uid in list(self.sessions.keys()):
+                    self.__prune(uid, now)
+                snapshot = json.dumps(self.sessions)
+                self._mutations = 0
+
+            tmp_path = None
+            try:
+                directory = os.path.dirname(self.persist_path)
+                os.makedirs(directory, exist_ok=True)
+                # A temp file of its own, workers never write each other's
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".sessions-", suffix=".tmp")
+                with os.fdopen(fd, "w") as _file:
+                    _file.write(snapshot)
+                os.replace(tmp_path, self.persist_path)
+            except Exception:
+                # Keep the mutations pending so the next flush retries
+                with self._lock:
+                    self._mutations += pending
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def close(self) -> None:
+        '''
+        Stop the background flusher and save the open sessions so they
+        survive a restart.
+        '''
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        if self._flusher and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=self.flush_interval)
+        self.flush()
+
+
+class RedisSessionProvider(SessionProvider):
+    '''
+    Session store shared by every worker through Redis.
+    Each user has one hash of session id -> expiry timestamp.
+    '''
+
+    shared = True
+
+    def __init__(self, url: AnyStr, ttl: int = 7 * 24 * 3600):
+        # Optional dependency, only needed with a shared session backend
+        import redis
+
+        self.ttl = ttl
+        self.persist_path = None
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def __key(uid: AnyStr) -> AnyStr:
+        return f"{SESSION_NAMESPACE}:{uid}"
+
+    def create(self, uid: AnyStr) -> AnyStr:
+        sid = uuid.uuid4().hex
+        key = self.__key(uid)
+        pipe = self.client.pipeline()
+        pipe.hset(key, sid, time.time() + self.ttl)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+        return sid
+
+    def is_active(self, uid: AnyStr, sid: AnyStr | None) -> bool:
+        if not sid:
+            return False
+        expires_at = self.client.hget(self.__key(uid), sid)
+        if expires_at is None:
+            return False
+        if float(expires_at) <= time.time():
+            self.client.hdel(self.__key(uid), sid)
+            return False
+        return True
+
+    def revoke(self, uid: AnyStr, sid: AnyStr | None) -> None:
+        if sid:
+            self.client.hdel(self.__key(uid), sid)
+
+    def revoke_all(self, uid: AnyStr) -> None:
+        self.client.delete(self.__key(uid))
+
+    def count(self) -> int:
+        return sum(self.client.hlen(key) for key in self.client.scan_iter(f"{SESSION_NAMESPACE}:*"))
+
+    def close(self) -> None:
+        self.client.close()
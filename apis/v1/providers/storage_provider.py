@@ -38,6 +38,38 @@ class StorageProvider:
         blob.make_public()
         return path, blob.public_url
 
+    def upload_content_addressed(self, file: bytes, filename: str, content_type: str, digest: str, generation: int = 0) -> tuple[str, str]:
+        '''
+        Upload the file under a path derived from its content digest and the
+        generation of its blob, so identical files share one blob. An
+        existing blob is not uploaded again.
+        Return the file path and the public URL of the file.
+        '''
+        file_extension = filename.split(".")[-1].lower()
+        path = f"{self.directory}/blobs/{digest}.{generation}.{file_extension}" if generation \
+            else f"{self.directory}/blobs/{digest}.{file_extension}"
+
+        blob = bucket.blob(path)
+        if blob.exists():
+            log_firebase(f"Storage reuse {path}")
+            return path, blob.public_url
+
+        _s = time.perf_counter()
+        blob.upload_from_string(file, content_type)
+        blob.make_public()
+        _e = time.perf_counter() - _s
+
+        log_firebase(f"Storage upload to {path} [{_e:.2f}s]")
+        return path, blob.public_url
+
+    def get_content_digest(self, path: str) -> str | None:
+        '''
+        Get the content digest of a content-addressed path, None for other paths.
+        '''
+        if not path or not path.startswith(f"{self.directory}/blobs/"):
+            return None
+        return path.split("/")[-1].split(".")[0]
+
     def download(self, path: str) -> bytes:
         '''
         Download the file from the storage.
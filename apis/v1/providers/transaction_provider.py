@@ -0,0 +1,112 @@
+from typing import Any, AnyStr, Awaitable, Callable, Dict, List
+import time
+from firebase_admin import firestore
+from ._cache_init import invalidations
+from .identity_map import count_read
+from ..configs.firebase_config import db, async_db
+from ..utils.logger import log_firebase
+
+
+class Transaction:
+    '''
+    Reads and writes of one Firestore transaction, across the collections
+    of DatabaseProvider or AsyncDatabaseProvider instances.
+    Reads always go to the database, the cache may be behind. Writes are
+    applied when the transaction commits, and the cached documents they
+    touch are dropped then.
+    '''
+
+    def __init__(self, transaction: Any, is_async: bool):
+        self.transaction = transaction
+        self.is_async = is_async
+        self.written: List[tuple] = []
+
+    def get(self, provider: Any, doc_id: AnyStr) -> Dict[str, Any] | None:
+        snapshot = provider.collection.document(doc_id).get(transaction=self.transaction)
+        count_read()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    async def aget(self, provider: Any, doc_id: AnyStr) -> Dict[str, Any] | None:
+        snapshot = await provider.collection.document(doc_id).get(transaction=self.transaction)
+        count_read()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def get_all(self, provider: Any, doc_ids: List[AnyStr]) -> List[Dict[str, Any] | None]:
+        '''
+        Read several documents at once, None for a missing one.
+        '''
+        if not doc_ids:
+            return []
+        refs = [provider.collection.document(doc_id) for doc_id in doc_ids]
+        docs = {snapshot.id: snapshot.to_dict()
+                for snapshot in db.get_all(refs, transaction=self.transaction) if snapshot.exists}
+        count_read(len(refs))
+        return [docs.get(doc_id) for doc_id in doc_ids]
+
+    async def aget_all(self, provider: Any, doc_ids: List[AnyStr]) -> List[Dict[str, Any] | None]:
+        if not doc_ids:
+            return []
+        refs = [provider.collection.document(doc_id) for doc_id in doc_ids]
+        docs = {snapshot.id: snapshot.to_dict()
+                async for snapshot in async_db.get_all(refs, transaction=self.transaction) if snapshot.exists}
+        count_read(len(refs))
+        return [docs.get(doc_id) for doc_id in doc_ids]
+
+    def set(self, provider: Any, doc_id: AnyStr, data: Dict[str, Any], merge: bool = True) -> None:
+        self.transaction.set(provider.collection.document(doc_id), data, merge=merge)
+        self.written.append((provider, doc_id))
+
+    def delete(self, provider: Any, doc_id: AnyStr) -> None:
+        self.transaction.delete(provider.collection.document(doc_id))
+        self.written.append((provider, doc_id))
+
+    def committed(self) -> None:
+        for provider, doc_id in dict.fromkeys(self.written):
+            provider.cacher.remove(f"{provider.collection_name}:{doc_id}")
+            invalidations.publish(provider.collection_name, doc_id)
+
+    async def acommitted(self) -> None:
+        for provider, doc_id in dict.fromkeys(self.written):
+            await provider.cacher.aremove(f"{provider.collection_name}:{doc_id}")
+            invalidations.publish(provider.collection_name, doc_id)
+
+
+def run_transaction(change: Callable[[Transaction], Any], max_attempts: int = 5) -> Any:
+    '''
+    Run change(transaction) in a Firestore transaction, run again when a
+    document it read is written before the commit. change must read before
+    it writes and only write through the transaction, it may run several times.
+    Return what change returns.
+    '''
+    current = {}
+
+    @firestore.transactional
+    def run(transaction):
+        current["transaction"] = Transaction(transaction, is_async=False)
+        return change(current["transaction"])
+
+    _s = time.perf_counter()
+    result = run(db.transaction(max_attempts=max_attempts))
+    _e = time.perf_counter() - _s
+    current["transaction"].committed()
+    log_firebase(f"Database transaction committed {len(current['transaction'].written)} writes [{_e:.2f}s]")
+    return result
+
+
+async def arun_transaction(change: Callable[[Transaction], Awaitable[Any]], max_attempts: int = 5) -> Any:
+    '''
+    Awaitable run_transaction, change is a coroutine function.
+    '''
+    current = {}
+
+    @firestore.async_transactional
+    async def run(transaction):
+        current["transaction"] = Transaction(transaction, is_async=True)
+        return await change(current["transaction"])
+
+    _s = time.perf_counter()
+    result = await run(async_db.transaction(max_attempts=max_attempts))
+    _e = time.perf_counter() - _s
+    await current["transaction"].acommitted()
+    log_firebase(f"Database transaction committed {len(current['transaction'].written)} writes [{_e:.2f}s]")
+    return result
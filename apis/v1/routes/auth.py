@@ -6,7 +6,8 @@ from ..interfaces.auth_interface import (
 )
 from ..interfaces.user_interface import UserResponseInterface
 from ..schemas.user_schema import UserSchema
-from ..middlewares.auth_middleware import get_current_user
+from fastapi.security import HTTPAuthorizationCredentials
+from ..middlewares.auth_middleware import get_current_user, security
 from ..controllers.auth_controller import login_control, logout_control
 from ..utils.response_fmt import jsonResponseFmt
 
@@ -19,7 +20,7 @@ router = APIRouter(prefix="/auth", tags=["Auth"])
 # @return: token (str) - JWT Token
 @router.post("/login", response_model=LoginResponseInterface)
 async def login(data: AuthInterface):
-    token = login_control(data.gtoken)
+    token = await login_control(data.gtoken)
     return jsonResponseFmt({"token": token})
 
 
@@ -29,6 +30,9 @@ async def get_me(user: Annotated[UserSchema, Depends(get_current_user)]):
 
 
 @router.post("/logout", response_model=LoginResponseInterface)
-async def logout(user: Annotated[UserSchema, Depends(get_current_user)]):
-    logout_control(user)
+async def logout(
+    user: Annotated[UserSchema, Depends(get_current_user)],
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)]
+):
+    logout_control(user, credentials.credentials)
     return jsonResponseFmt(None, msg="Logged out")
@@ -1,6 +1,6 @@
 from typing import Annotated
 from io import BytesIO
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
+from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from fastapi import Form
 from io import BytesIO
@@ -11,12 +11,18 @@ from ..interfaces.cv_interface import (
     CVResponseInterface,
     CVUploadProgressInterface,
     CVUploadResponseInterface,
-    CVDetailResponseInterface
+    CVDetailResponseInterface,
+    CVQueryInterface,
+    CVQueryResponseInterface,
+    TypeExportFormat,
+    TypeExportColumns
 )
 from ..middlewares.auth_middleware import get_current_user
 from ..controllers.cv_controller import (
     get_all_cvs,
     get_all_cvs_summary,
+    export_cvs,
+    query_cvs,
     # get_all_cvs_matching,
     get_cv_by_id,
     upload_cvs_data,
@@ -27,7 +33,8 @@ from ..controllers.cv_controller import (
     get_cv_detail_control,
     delete_current_cv
 )
-from ..utils.response_fmt import jsonResponseFmt
+from ..utils.response_fmt import jsonResponseFmt, pageResponseFmt
+from ..utils.constants import EXPORT_MEDIA_TYPES, PAGE_MAX_LIMIT
 import json
 
 
@@ -36,14 +43,40 @@ router = APIRouter(prefix="/cv", tags=["CV"])
 
 
 @router.get("/{project_id}/{position_id}", response_model=CVsResponseInterface)
-async def get_cvs(project_id: str, position_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    cvs = get_all_cvs(project_id, position_id, user)
-    return jsonResponseFmt([cv.to_dict() for cv in cvs])
+async def get_cvs(
+    project_id: str,
+    position_id: str,
+    user: Annotated[UserSchema, Depends(get_current_user)],
+    limit: Annotated[int | None, Query(ge=1, le=PAGE_MAX_LIMIT)] = None,
+    cursor: str | None = None
+):
+    """
+    Get the position's CVs in the order they were added. With limit, one
+    page at a time: pass the next_cursor of a page to get the next one.
+    """
+    cvs, next_cursor = await get_all_cvs(project_id, position_id, user, limit, cursor)
+    return pageResponseFmt([cv.to_dict() for cv in cvs], next_cursor)
+
+
+@router.post("/{project_id}/{position_id}/query", response_model=CVQueryResponseInterface)
+async def query_position_cvs(
+    project_id: str,
+    position_id: str,
+    query: CVQueryInterface,
+    user: Annotated[UserSchema, Depends(get_current_user)]
+):
+    """
+    Filter the position's CVs by status, labels and score ranges, and get
+    the top_k by a score with the status and label counts of the matches.
+    """
+    result = await query_cvs(project_id, position_id, user, query)
+    result["cvs"] = [cv.to_dict() for cv in result["cvs"]]
+    return jsonResponseFmt(result)
 
 
 @router.get("/{project_id}/{position_id}/{cv_id}", response_model=CVResponseInterface)
 async def get_cv(project_id: str, position_id: str, cv_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    cv = get_cv_by_id(project_id, position_id, cv_id, user)
+    cv = await get_cv_by_id(project_id, position_id, cv_id, user)
     return jsonResponseFmt(cv.to_dict())
 
 
@@ -86,7 +119,7 @@ async def rematch_cvs(
 
 @router.get("/{watch_id}", response_model=CVUploadProgressInterface)
 async def get_progress(watch_id: str):
-    progress = get_upload_progress(watch_id)
+    progress = await get_upload_progress(watch_id)
     return jsonResponseFmt(progress)
 
 
@@ -98,21 +131,41 @@ async def download_cv(project_id: str, position_id: str, cv_id: str, user: Annot
 
 @router.get("/{project_id}/{position_id}/{cv_id}/detail", response_model=CVDetailResponseInterface)
 async def get_detail_cv(project_id: str, position_id: str, cv_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    cv_detail = get_cv_detail_control(project_id, position_id, cv_id, user)
+    cv_detail = await get_cv_detail_control(project_id, position_id, cv_id, user)
     return jsonResponseFmt(cv_detail)
 
 
 @router.get("/{project_id}/{position_id}/download/summary", response_class=StreamingResponse)
 async def download_cvs_summary_list(project_id: str, position_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    excel_buffer = get_all_cvs_summary(project_id, position_id, user)
+    excel_chunks = await get_all_cvs_summary(project_id, position_id, user)
     filename = f"HiringRequestSummary_{position_id}.xlsx"
     return StreamingResponse(
-        excel_buffer,
+        excel_chunks,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
+@router.get("/{project_id}/{position_id}/download/export", response_class=StreamingResponse)
+async def download_cvs_export(
+    project_id: str,
+    position_id: str,
+    user: Annotated[UserSchema, Depends(get_current_user)],
+    format: TypeExportFormat = "csv",
+    columns: TypeExportColumns = "summary"
+):
+    """
+    Export the position's CVs as CSV, NDJSON or Parquet, with the columns
+    of the summary or matching sheet of the xlsx export.
+    """
+    export_chunks = await export_cvs(project_id, position_id, user, format, columns)
+    filename = f"HiringRequest{columns.capitalize()}_{position_id}.{format}"
+    return StreamingResponse(
+        export_chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 @router.delete("/{project_id}/{position_id}/{cv_id}", response_model=CVResponseInterface)
 async def delete_cv(project_id: str, position_id: str, cv_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    delete_current_cv(project_id, position_id, cv_id, user)
+    await delete_current_cv(project_id, position_id, cv_id, user)
     return jsonResponseFmt(None, f"CV {cv_id} deleted successfully")
@@ -15,7 +15,7 @@ router = APIRouter(prefix="/jd", tags=["JD"])
 
 @router.get("/{project_id}/{position_id}", response_model=JDResponseInterface)
 async def get_jd(project_id: str, position_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    jd = get_current_jd(project_id, position_id, user)
+    jd = await get_current_jd(project_id, position_id, user)
     return jsonResponseFmt(jd.to_dict())
 
 
@@ -1,5 +1,5 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends
+from typing import Annotated, List
+from fastapi import APIRouter, Depends, BackgroundTasks, Query
 from ..schemas.user_schema import UserSchema
 from ..interfaces.position_interface import (
     CreatePositionInterface,
@@ -7,7 +7,8 @@ from ..interfaces.position_interface import (
     PositionsResponseInterface,
     PositionResponseInterface,
     PublicPositionInterface,
-    PositionDashboardResponseInterface
+    PositionDashboardResponseInterface,
+    PositionAnalyticsResponseInterface
 )
 from ..middlewares.auth_middleware import get_current_user
 from ..controllers.position_controller import (
@@ -19,61 +20,71 @@ from ..controllers.position_controller import (
     update_status_current_position,
     delete_current_position,
 )
-from ..controllers.dashboard_controller import get_position_dashboard_stats
-from ..utils.response_fmt import jsonResponseFmt
+from ..controllers.dashboard_controller import get_position_dashboard_stats, get_position_analytics
+from ..utils.response_fmt import jsonResponseFmt, pageResponseFmt
+from ..utils.constants import PAGE_MAX_LIMIT
 
 
 router = APIRouter(prefix="/position", tags=["Hiring Request"])
 
 
 @router.get("/{project_id}", response_model=PositionsResponseInterface)
-async def get_positions(project_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    positions = get_all_positions_by_ids(project_id, user)
-    return jsonResponseFmt([position.to_dict() for position in positions], "Get positions successfully")
+async def get_positions(
+    project_id: str,
+    user: Annotated[UserSchema, Depends(get_current_user)],
+    limit: Annotated[int | None, Query(ge=1, le=PAGE_MAX_LIMIT)] = None,
+    cursor: str | None = None
+):
+    """
+    Get the project's positions in the order they were created. With limit,
+    one page at a time: pass the next_cursor of a page to get the next one.
+    """
+    positions, next_cursor = await get_all_positions_by_ids(project_id, user, limit, cursor)
+    return pageResponseFmt([position.to_dict() for position in positions], next_cursor, "Get positions successfully")
 
 
 @router.get("/public/{position_id}", response_model=PublicPositionInterface)
 async def get_public_position(position_id: str):
-    position = get_public_position_by_id(position_id)
+    position = await get_public_position_by_id(position_id)
     return jsonResponseFmt(position.to_dict(minimal=True), f"Get public position with id {position_id} successfully")
 
 
 @router.get("/{project_id}/{position_id}", response_model=PositionResponseInterface)
 async def get_position(project_id: str, position_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    position = get_position_by_id(project_id, position_id, user)
+    position = await get_position_by_id(project_id, position_id, user)
     return jsonResponseFmt(position.to_dict(), f"Get position with id {position_id} successfully")
 
 
 @router.post("/{project_id}", response_model=PositionResponseInterface)
 async def create_position(project_id: str, data: CreatePositionInterface, user: Annotated[UserSchema, Depends(get_current_user)]):
-    position = create_new_position(project_id, data, user)
+    position = await create_new_position(project_id, data, user)
     return jsonResponseFmt(position.to_dict(), f"Create position successfully")
 
 
 @router.put("/{project_id}/{position_id}", response_model=PositionResponseInterface)
 async def update_position(project_id: str, position_id: str, data: UpdatePositionInterface, user: Annotated[UserSchema, Depends(get_current_user)]):
-    update_current_position(project_id, position_id, data, user)
+    await update_current_position(project_id, position_id, data, user)
     return jsonResponseFmt(None, f"Update position with id {position_id} successfully")
 
 
 @router.put("/{project_id}/close/{position_id}", response_model=PositionResponseInterface)
 async def close_position(project_id: str, position_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    update_status_current_position(
+    await update_status_current_position(
         project_id, position_id, user, is_closed=True)
     return jsonResponseFmt(None, f"Close position with id {position_id} successfully")
 
 
 @router.put("/{project_id}/open/{position_id}", response_model=PositionResponseInterface)
 async def open_position(project_id: str, position_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    update_status_current_position(
+    await update_status_current_position(
         project_id, position_id, user, is_closed=False)
     return jsonResponseFmt(None, f"Open position with id {position_id} successfully")
 
 
 @router.delete("/{project_id}/{position_id}", response_model=PositionResponseInterface)
-async def delete_position(project_id: str, position_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    delete_current_position(project_id, position_id, user)
-    return jsonResponseFmt(None, f"Delete position with id {position_id} successfully")
+async def delete_position(project_id: str, position_id: str, user: Annotated[UserSchema, Depends(get_current_user)], bg_tasks: BackgroundTasks):
+    purge_id = await delete_current_position(project_id, position_id, user, bg_tasks)
+    return jsonResponseFmt({"purge_id": purge_id}, f"Delete position with id {position_id} successfully")
 
 
 @router.get("/{project_id}/{position_id}/dashboard", response_model=PositionDashboardResponseInterface)
@@ -87,3 +98,21 @@ async def get_position_dashboard(project_id: str, position_id: str, user: Annota
     """
     stats = await get_position_dashboard_stats(project_id, position_id, user)
     return jsonResponseFmt(stats, f"Position {position_id} dashboard statistics retrieved successfully")
+
+
+@router.get("/{project_id}/{position_id}/dashboard/analytics", response_model=PositionAnalyticsResponseInterface)
+async def get_position_dashboard_analytics(
+    project_id: str,
+    position_id: str,
+    user: Annotated[UserSchema, Depends(get_current_user)],
+    bins: Annotated[List[float] | None, Query()] = None,
+    percentiles: Annotated[List[float] | None, Query()] = None
+):
+    """
+    Get position's score analytics, e.g. ?bins=0&bins=50&bins=100&percentiles=50:
+    - Score histograms with the given bin edges (default 0, 20, 40, 60, 80, 100)
+    - Count, mean, standard deviation, min, max and percentiles of each score
+    - Correlations between scores
+    """
+    analytics = await get_position_analytics(project_id, position_id, user, bins, percentiles)
+    return jsonResponseFmt(analytics, f"Position {position_id} analytics retrieved successfully")
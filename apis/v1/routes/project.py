@@ -1,5 +1,6 @@
 from typing import Annotated, Optional, AnyStr
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse
 from ..interfaces.project_interface import (
     ProjectsResponseInterface,
     ProjectResponseInterface,
@@ -9,7 +10,9 @@ from ..interfaces.project_interface import (
     UpdateLastOpenedProjectInterface,
     UpdateMemberProjectInterface,
     ProjectDashboardResponseInterface,
+    PurgeJobResponseInterface,
 )
+from ..interfaces.cv_interface import TypeExportFormat, TypeExportColumns
 from ..schemas.user_schema import UserSchema
 from ..middlewares.auth_middleware import get_current_user
 from ..controllers.project_controller import (
@@ -22,21 +25,33 @@ from ..controllers.project_controller import (
     restore_current_project
 )
 from ..controllers.dashboard_controller import get_project_dashboard_stats
-from ..utils.response_fmt import jsonResponseFmt
+from ..controllers.purge_controller import get_purge_progress
+from ..controllers.cv_controller import export_cvs
+from ..utils.response_fmt import jsonResponseFmt, pageResponseFmt
+from ..utils.constants import EXPORT_MEDIA_TYPES, PAGE_MAX_LIMIT
 
 
 router = APIRouter(prefix="/project", tags=["Project"])
 
 
 @router.get("/", response_model=ProjectsResponseInterface)
-async def get_projects(user: Annotated[UserSchema, Depends(get_current_user)], get_type: TypeGetAllProjects = "owned"):
-    projects = get_all_projects_by_ids(user, get_type)
-    return jsonResponseFmt([project.to_dict(include_id=True) for project in projects], f"Get {get_type} projects successfully")
+async def get_projects(
+    user: Annotated[UserSchema, Depends(get_current_user)],
+    get_type: TypeGetAllProjects = "owned",
+    limit: Annotated[int | None, Query(ge=1, le=PAGE_MAX_LIMIT)] = None,
+    cursor: Optional[str] = None
+):
+    """
+    Get the user's projects of a type. With limit, one page at a time:
+    pass the next_cursor of a page to get the next one.
+    """
+    projects, next_cursor = await get_all_projects_by_ids(user, get_type, limit, cursor)
+    return pageResponseFmt([project.to_dict(include_id=True) for project in projects], next_cursor, f"Get {get_type} projects successfully")
 
 
 @router.get("/{project_id}", response_model=ProjectResponseInterface)
 async def get_project(project_id: AnyStr, user: Annotated[UserSchema, Depends(get_current_user)], use_alias: Optional[bool] = False):
-    project = get_project_by_id(project_id, use_alias, user)
+    project = await get_project_by_id(project_id, use_alias, user)
     return jsonResponseFmt(project.to_dict(include_id=True), f"Get project with id {project_id} successfully")
 
 
@@ -53,43 +68,69 @@ async def get_project_dashboard(project_id: str, user: Annotated[UserSchema, Dep
     return jsonResponseFmt(stats, f"Project {project_id} dashboard statistics retrieved successfully")
 
 
+@router.get("/{project_id}/export", response_class=StreamingResponse)
+async def get_project_export(
+    project_id: str,
+    user: Annotated[UserSchema, Depends(get_current_user)],
+    format: TypeExportFormat = "csv",
+    columns: TypeExportColumns = "summary"
+):
+    """
+    Export the CVs of every hiring request of the project as CSV, NDJSON or
+    Parquet, with the hiring request of each CV in the first columns.
+    """
+    export_chunks = await export_cvs(project_id, None, user, format, columns)
+    filename = f"Project{columns.capitalize()}_{project_id}.{format}"
+    return StreamingResponse(
+        export_chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
 @router.post("/", response_model=ProjectResponseInterface)
 async def create_project(data: CreateProjectInterface, user: Annotated[UserSchema, Depends(get_current_user)]):
-    project = create_new_project(data, user)
+    project = await create_new_project(data, user)
     return jsonResponseFmt(project.to_dict(include_id=True), f"Project {project.id} created successfully")
 
 
 @router.put("/{project_id}", response_model=ProjectResponseInterface)
 async def update_project(project_id: str, data: UpdateProjectInterface, user: Annotated[UserSchema, Depends(get_current_user)]):
-    update_current_project(project_id, data, user)
+    await update_current_project(project_id, data, user)
     return jsonResponseFmt(None, f"Project {project_id} updated successfully")
 
 
 @router.put("/last/{project_id}", response_model=ProjectResponseInterface)
 async def update_last_opened_project(project_id: str, data: UpdateLastOpenedProjectInterface, user: Annotated[UserSchema, Depends(get_current_user)]):
-    update_current_project(project_id, data, user)
+    await update_current_project(project_id, data, user)
     return jsonResponseFmt(None, f"Project {project_id} last opened updated successfully")
 
 
 @router.put("/share/{project_id}", response_model=ProjectResponseInterface)
 async def share_project(project_id: str, data: UpdateMemberProjectInterface, user: Annotated[UserSchema, Depends(get_current_user)]):
-    update_member_project(project_id, data, user)
+    await update_member_project(project_id, data, user)
     return jsonResponseFmt(None, f"Project {project_id} shared successfully")
 
 
 @router.delete("/{project_id}")
 async def delete_project(project_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    delete_current_project(project_id, user)
+    await delete_current_project(project_id, user)
     return jsonResponseFmt(None, f"Delete project with id {project_id} successfully")
 
 
 @router.put("/restore/{project_id}")
 async def restore_project(project_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    restore_current_project(project_id, user)
+    await restore_current_project(project_id, user)
     return jsonResponseFmt(None, f"Restore project with id {project_id} successfully")
 
 
 @router.delete("/purge/{project_id}")
-async def purge_project(project_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    delete_current_project(project_id, user, is_purge=True)
-    return jsonResponseFmt(None, f"Purge project with id {project_id} successfully")
+async def purge_project(project_id: str, user: Annotated[UserSchema, Depends(get_current_user)], bg_tasks: BackgroundTasks):
+    purge_id = await delete_current_project(project_id, user, is_purge=True, bg_tasks=bg_tasks)
+    return jsonResponseFmt({"purge_id": purge_id}, f"Purging project with id {project_id}")
+
+
+@router.get("/purge/{purge_id}", response_model=PurgeJobResponseInterface)
+async def get_purge(purge_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
+    progress = await get_purge_progress(purge_id, user)
+    return jsonResponseFmt(progress, f"Get purge job with id {purge_id} successfully")
@@ -26,17 +26,17 @@ admin_guard = GuardCondition(
 
 @router.get("/", response_model=UsersResponseInterface)
 async def get_users(user: Annotated[UserSchema, Depends(user_guard_middleware(admin_guard))]):
-    users = get_all_users(user)
+    users = await get_all_users(user)
     return jsonResponseFmt([user.to_dict() for user in users])
 
 
 @router.get("/find", response_model=UsersMinimalResponseInterface)
 async def find_users(query: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    users = find_user_by_query(query, user)
+    users = await find_user_by_query(query, user)
     return jsonResponseFmt([user.to_dict(minimal=True) for user in users])
 
 
 @router.get("/{user_id}", response_model=UserResponseInterface)
 async def get_user(user_id: str, user: Annotated[UserSchema, Depends(get_current_user)]):
-    current_user = get_user_by_id(user_id, user)
+    current_user = await get_user_by_id(user_id, user)
     return jsonResponseFmt(current_user.to_dict())
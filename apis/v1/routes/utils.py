@@ -1,7 +1,7 @@
 from typing import Annotated
 from fastapi import APIRouter, Depends, File, UploadFile
 from ..middlewares.password_middleware import password_middleware
-from ..controllers.utils_controller import clear_cache_control, extract_content_control
+from ..controllers.utils_controller import clear_cache_control, get_cache_stats_control, get_http_stats_control, extract_content_control
 from ..utils.extractor import get_cv_content
 from ..utils.response_fmt import jsonResponseFmt
 
@@ -18,6 +18,22 @@ async def reset_cache():
     return jsonResponseFmt(None, "Cache cleared.")
 
 
+@router.get("/cache/stats", dependencies=[Depends(password_middleware)])
+async def cache_stats():
+    '''
+    Get cache statistics.
+    '''
+    return jsonResponseFmt(get_cache_stats_control())
+
+
+@router.get("/http/stats", dependencies=[Depends(password_middleware)])
+async def http_stats():
+    '''
+    Get AI services client statistics.
+    '''
+    return jsonResponseFmt(get_http_stats_control())
+
+
 @router.post("/extract-content")
 async def extract_content(file: Annotated[UploadFile, File(...)]):
     '''
@@ -25,4 +41,4 @@ async def extract_content(file: Annotated[UploadFile, File(...)]):
     '''
     # Read the content of the file
     filedata = await file.read()
-    return jsonResponseFmt(extract_content_control(filedata=filedata, filename=file.filename))
+    return jsonResponseFmt(await extract_content_control(filedata=filedata, filename=file.filename))
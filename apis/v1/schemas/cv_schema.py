@@ -1,10 +1,17 @@
-from typing import AnyStr, Dict
+from typing import AnyStr, Dict, List
 import enum
+import asyncio
 from pydantic import BaseModel, Field
 # from .score_schema import ScoreSchema, ScoreModel
-from ..providers import cv_db
-from ..providers import storage_db
+from ..providers import cv_db, cv_adb
+from .tracked_schema import TrackedSchema
+from .stats_schema import PositionStatsSchema, cv_counts, changed
+from ..providers import storage_db, content_cache, cv_index
+from ..providers.identity_map import identity_get, identity_add, identity_discard, identity_partition
+from ..providers.transaction_provider import Transaction
 from ..utils.utils import get_current_time
+from ..utils.counters import diff_counts
+from ..utils.constants import CV_INDEX_FIELDS
 
 
 class CVStatus(enum.Enum):
@@ -26,13 +33,17 @@ class CVModel(BaseModel):
     labels: list[str] = Field([], title="CV Labels")
     status: CVStatus = Field(CVStatus.applying, title="CV Status")
     upload_at: str = Field("", title="CV Upload At")
+    position: str = Field(None, title="Hiring Request ID")
 
 
-class CVSchema:
+class CVSchema(TrackedSchema):
     '''
     Schema and Validation for CV.
     '''
 
+    _db = cv_db
+    _adb = cv_adb
+
     def __init__(
         self,
         cv_id: AnyStr = None,
@@ -45,7 +56,8 @@ class CVSchema:
         content: AnyStr = "",
         labels: list[AnyStr] = [],
         status: CVStatus = CVStatus.applying,
-        upload_at: AnyStr = get_current_time()
+        upload_at: AnyStr = get_current_time(),
+        position_id: AnyStr = None
     ):
         self.id = cv_id
         self.name = name
@@ -58,6 +70,7 @@ class CVSchema:
         self.labels = labels
         self.status = status
         self.upload_at = upload_at
+        self.position_id = position_id
 
     def to_dict(self, include_id=True):
         data_dict = {
@@ -70,7 +83,8 @@ class CVSchema:
             "content": self.content,
             "labels": self.labels,
             "status": self.status.value,
-            "upload_at": self.upload_at
+            "upload_at": self.upload_at,
+            "position": self.position_id
         }
         if include_id:
             data_dict["id"] = self.id
@@ -89,13 +103,46 @@ class CVSchema:
             content=data.get("content"),
             labels=data.get("labels"),
             status=CVStatus(data.get("status")),
-            upload_at=data.get("upload_at")
+            upload_at=data.get("upload_at"),
+            position_id=data.get("position")
         )
 
+    def counts(self) -> Dict:
+        '''
+        Get what the CV adds to the counters of its position.
+        '''
+        return cv_counts(self.status.value, self.matching)
+
+    def _count(self, counts: Dict):
+        PositionStatsSchema.add_counts(self.position_id, counts)
+
+    async def _acount(self, counts: Dict):
+        await PositionStatsSchema.aadd_counts(self.position_id, counts)
+
+    def reindex(self):
+        '''
+        Apply the CV to the query index of its position.
+        '''
+        cv_index.update_cv(self.position_id, self.id, {
+            "status": self.status.value,
+            "labels": self.labels,
+            "matching": self.matching
+        })
+
     @staticmethod
     def find_by_ids(cv_ids: list[AnyStr]):
         return [CVSchema.from_dict(cv) for cv in cv_db.get_all_by_ids(cv_ids)]
 
+    @staticmethod
+    def iter_by_ids(cv_ids: List[AnyStr], chunk_size: int = 100):
+        '''
+        Load CVs chunk by chunk, in the order of cv_ids.
+        '''
+        for i in range(0, len(cv_ids), chunk_size):
+            chunk = cv_ids[i:i + chunk_size]
+            cvs = {cv.id: cv for cv in CVSchema.find_by_ids(chunk)}
+            yield [cvs[cv_id] for cv_id in chunk if cv_id in cvs]
+
     @staticmethod
     def find_by_id(cv_id: AnyStr):
         data = cv_db.get_by_id(cv_id)
@@ -103,6 +150,89 @@ class CVSchema:
             return None
         return CVSchema.from_dict(data)
 
+    @staticmethod
+    async def afind_by_ids(cv_ids: list[AnyStr]):
+        # Reuse CVs already loaded in this request
+        cvs, missing_ids = identity_partition(cv_adb.collection_name, cv_ids)
+        if missing_ids:
+            cvs += [identity_add(cv_adb.collection_name, CVSchema.from_dict(cv))
+                    for cv in await cv_adb.get_all_by_ids(missing_ids)]
+        return cvs
+
+    @staticmethod
+    async def afind_by_ids_in(transaction: Transaction, cv_ids: list[AnyStr]):
+        '''
+        Read CVs in a transaction, which runs again if one is written before it commits.
+        '''
+        docs = await transaction.aget_all(cv_adb, cv_ids)
+        return [CVSchema.from_dict({**doc, "id": cv_id}) for cv_id, doc in zip(cv_ids, docs) if doc]
+
+    @staticmethod
+    async def afind_scores_by_ids(cv_ids: list[AnyStr]):
+        '''
+        Get the "overall_result" scores of CVs without loading their content.
+        '''
+        docs = await cv_adb.get_fields_by_ids(cv_ids, ["matching.overall_result"])
+        return [doc["matching"].get("overall_result") if isinstance(doc.get("matching"), dict) else None
+                for doc in docs]
+
+    @staticmethod
+    async def aiter_by_ids(cv_ids: List[AnyStr], chunk_size: int = 100):
+        '''
+        Load CVs chunk by chunk, in the order of cv_ids.
+        They are not added to the identity map, only one chunk is held at a time.
+        '''
+        for i in range(0, len(cv_ids), chunk_size):
+            chunk = cv_ids[i:i + chunk_size]
+            cvs = {cv["id"]: cv for cv in await cv_adb.get_all_by_ids(chunk)}
+            yield [CVSchema.from_dict(cvs[cv_id]) for cv_id in chunk if cv_id in cvs]
+
+    @staticmethod
+    async def asort_ids_by_upload(cv_ids: List[AnyStr]):
+        '''
+        Sort CV ids by upload time, newest first, reading only "upload_at".
+        '''
+        docs = await cv_adb.get_fields_by_ids(cv_ids, ["upload_at"])
+        # ISO timestamps sort as strings, a CV without one goes last
+        docs = sorted(docs, key=lambda doc: doc.get("upload_at") or "", reverse=True)
+        return [doc["id"] for doc in docs]
+
+    @staticmethod
+    async def aindex_by_position(position_id: AnyStr, cv_ids: List[AnyStr]):
+        '''
+        Get the query index of a position, built or brought up to date with
+        a projection read of only the CVs it is missing.
+        '''
+        missing_ids = cv_index.missing(position_id, cv_ids)
+        if missing_ids:
+            for doc in await cv_adb.get_fields_by_ids(missing_ids, CV_INDEX_FIELDS):
+                cv_index.update_cv(position_id, doc["id"], doc)
+        # The index may have been evicted while reading
+        index = cv_index.get(position_id) if missing_ids is not None else None
+        if index is None:
+            docs = await cv_adb.get_fields_by_ids(cv_ids, CV_INDEX_FIELDS)
+            index = cv_index.build(position_id, docs)
+        return index
+
+    @staticmethod
+    async def afind_page_by_ids(cv_ids: List[AnyStr], limit: int | None, cursor: AnyStr | None = None):
+        '''
+        Get one page of cvs in the order of cv_ids, and the cursor of the next page.
+        '''
+        cvs, next_cursor = await cv_adb.get_page_by_ids(cv_ids, limit, cursor)
+        cvs = [identity_add(cv_adb.collection_name, CVSchema.from_dict(cv)) for cv in cvs]
+        return cvs, next_cursor
+
+    @staticmethod
+    async def afind_by_id(cv_id: AnyStr):
+        cv = identity_get(cv_adb.collection_name, cv_id)
+        if cv:
+            return cv
+        data = await cv_adb.get_by_id(cv_id)
+        if not data:
+            return None
+        return identity_add(cv_adb.collection_name, CVSchema.from_dict(data))
+
     def create_cv(self):
         cv_id = cv_db.create(self.to_dict(include_id=False))
         self.id = cv_id
@@ -111,34 +241,40 @@ class CVSchema:
     def update_path_url(self, path: AnyStr, url: AnyStr):
         self.path = path
         self.url = url
-        cv_db.update(self.id, {
+        self._write({
             "path": path,
             "url": url
         })
 
     def update_weight(self, weight: Dict[str, AnyStr]):
         self.weight = weight
-        cv_db.update(self.id, {
+        self._write({
             "weight": weight
         })
 
     def update_summary(self, summary: AnyStr):
         self.summary = summary
-        cv_db.update(self.id, {
+        self._write({
             "summary": summary
         })
+        self._add_counts(changed())
 
     def update_labels(self, labels: AnyStr):
-        self.summary = labels
-        cv_db.update(self.id, {
+        self.labels = labels
+        self._write({
             "labels": labels
         })
+        self._add_counts(changed())
+        self.reindex()
 
     def update_matching(self, matching: AnyStr):
+        before = self.counts()
         self.matching = matching
-        cv_db.update(self.id, {
+        self._write({
             "matching": matching
         })
+        self._add_counts(changed(diff_counts(before, self.counts())))
+        self.reindex()
 
     def download_content(self):
         try:
@@ -148,28 +284,121 @@ class CVSchema:
 
     def delete_cv(self):
         cv_db.delete(self.id)
-        storage_db.remove(self.path)
+        # A shared blob is only removed with the last CV referencing it
+        digest = storage_db.get_content_digest(self.path)
+        if digest is None or content_cache.release_blob(digest, self.path):
+            storage_db.remove(self.path)
 
     def update_score(self, score_data: Dict[str, AnyStr]):
         self.score.update_score(score_data)
-        cv_db.update(self.id, {
+        self._write({
             "score": self.score.to_dict()
         })
 
     def update_content(self, content: AnyStr):
         self.content = content
-        cv_db.update(self.id, {
+        self._write({
             "content": content
         })
 
     def update_summary(self, summary: AnyStr):
         self.summary = summary
-        cv_db.update(self.id, {
+        self._write({
             "summary": summary
         })
+        self._add_counts(changed())
 
     def update_status(self, status: CVStatus):
+        before = self.counts()
         self.status = status
-        cv_db.update(self.id, {
+        self._write({
             "status": status.value
         })
+        self._add_counts(changed(diff_counts(before, self.counts())))
+        self.reindex()
+
+    async def acreate_cv(self):
+        cv_id = await cv_adb.create(self.to_dict(include_id=False))
+        self.id = cv_id
+        return identity_add(cv_adb.collection_name, self)
+
+    async def aupdate_path_url(self, path: AnyStr, url: AnyStr):
+        self.path = path
+        self.url = url
+        await self._awrite({
+            "path": path,
+            "url": url
+        })
+
+    async def aupdate_weight(self, weight: Dict[str, AnyStr]):
+        self.weight = weight
+        await self._awrite({
+            "weight": weight
+        })
+
+    async def aupdate_summary(self, summary: AnyStr):
+        self.summary = summary
+        await self._awrite({
+            "summary": summary
+        })
+        await self._aadd_counts(changed())
+
+    async def aupdate_labels(self, labels: AnyStr):
+        self.labels = labels
+        await self._awrite({
+            "labels": labels
+        })
+        await self._aadd_counts(changed())
+        self.reindex()
+
+    async def aupdate_matching(self, matching: AnyStr):
+        before = self.counts()
+        self.matching = matching
+        await self._awrite({
+            "matching": matching
+        })
+        await self._aadd_counts(changed(diff_counts(before, self.counts())))
+        self.reindex()
+
+    async def aupdate_content(self, content: AnyStr):
+        self.content = content
+        await self._awrite({
+            "content": content
+        })
+
+    async def aupdate_status(self, status: CVStatus):
+        before = self.counts()
+        self.status = status
+        await self._awrite({
+            "status": status.value
+        })
+        await self._aadd_counts(changed(diff_counts(before, self.counts())))
+        self.reindex()
+
+    async def aupdate_position(self, position_id: AnyStr):
+        self.position_id = position_id
+        await self._awrite({
+            "position": position_id
+        })
+
+    async def adownload_content(self):
+        # Storage client is synchronous, keep it off the event loop
+        return await asyncio.to_thread(self.download_content)
+
+    @staticmethod
+    async def adelete_by_ids(cv_ids: List[AnyStr]):
+        '''
+        Delete CVs by ids without loading them.
+        Their blobs are left to the caller.
+        '''
+        for doc_id in cv_ids:
+            await cv_adb.delete(doc_id)
+            identity_discard(cv_adb.collection_name, doc_id)
+
+    async def adelete_cv(self):
+        await cv_adb.delete(self.id)
+        identity_discard(cv_adb.collection_name, self.id)
+        # A shared blob is only removed with the last CV referencing it
+        digest = storage_db.get_content_digest(self.path)
+        if digest is None or await content_cache.arelease_blob(digest, self.path):
+            await asyncio.to_thread(storage_db.remove, self.path)
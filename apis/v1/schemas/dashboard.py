@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Any, Dict
 from pydantic import BaseModel
 
 class ProjectDashboardResponseInterface(BaseModel):
@@ -17,4 +17,11 @@ class PositionDashboardResponseInterface(BaseModel):
     personal_projects_score_distribution: Dict[str, int]
     work_experience_score_distribution: Dict[str, int]
     publications_score_distribution: Dict[str, int]
-    matching_score_distribution: Dict[str, int]
\ No newline at end of file
+    matching_score_distribution: Dict[str, int]
+
+class PositionAnalyticsResponseInterface(BaseModel):
+    total_cvs: int
+    scored_cvs: int
+    histograms: Dict[str, Dict[str, int]]
+    summary: Dict[str, Dict[str, Any]]
+    correlations: Dict[str, Dict[str, float | None]]
@@ -1,6 +1,8 @@
-from typing import AnyStr, Dict
+from typing import AnyStr, Dict, List
 from pydantic import BaseModel, Field
-from ..providers import jd_db
+from ..providers import jd_db, jd_adb
+from .tracked_schema import TrackedSchema
+from ..providers.identity_map import identity_get, identity_add, identity_discard
 
 
 class JDModel(BaseModel):
@@ -9,11 +11,14 @@ class JDModel(BaseModel):
     extraction: dict = Field({}, title="JD Extraction")
 
 
-class JDSchema:
+class JDSchema(TrackedSchema):
     '''
     Schema and Validation for JD.
     '''
 
+    _db = jd_db
+    _adb = jd_adb
+
     def __init__(
         self,
         jd_id: AnyStr = None,
@@ -50,6 +55,16 @@ class JDSchema:
             return None
         return JDSchema.from_dict(jd)
 
+    @staticmethod
+    async def afind_by_id(jd_id: AnyStr):
+        jd = identity_get(jd_adb.collection_name, jd_id)
+        if jd:
+            return jd
+        data = await jd_adb.get_by_id(jd_id)
+        if not data:
+            return None
+        return identity_add(jd_adb.collection_name, JDSchema.from_dict(data))
+
     def create_jd(self):
         jd_id = jd_db.create(self.to_dict(include_id=False, minimal=True))
         self.id = jd_id
@@ -63,15 +78,44 @@ class JDSchema:
     #     })
 
     def update_summary(self, summary: AnyStr):
-        jd_db.update(self.id, {
+        self._write({
             "summary": summary
         })
 
     def update_content(self, content: AnyStr):
         self.content = content
-        jd_db.update(self.id, {
+        self._write({
             "content": content
         })
 
     def delete_jd(self):
         jd_db.delete(self.id)
+
+    async def acreate_jd(self):
+        jd_id = await jd_adb.create(self.to_dict(include_id=False, minimal=True))
+        self.id = jd_id
+        return identity_add(jd_adb.collection_name, self)
+
+    async def aupdate_summary(self, summary: AnyStr):
+        await self._awrite({
+            "summary": summary
+        })
+
+    async def aupdate_content(self, content: AnyStr):
+        self.content = content
+        await self._awrite({
+            "content": content
+        })
+
+    @staticmethod
+    async def adelete_by_ids(jd_ids: List[AnyStr]):
+        '''
+        Delete JDs by ids without loading them.
+        '''
+        for doc_id in jd_ids:
+            await jd_adb.delete(doc_id)
+            identity_discard(jd_adb.collection_name, doc_id)
+
+    async def adelete_jd(self):
+        await jd_adb.delete(self.id)
+        identity_discard(jd_adb.collection_name, self.id)
@@ -2,8 +2,14 @@ from typing import AnyStr, List, Dict
 from pydantic import BaseModel, Field
 from enum import Enum
 from .jd_schema import JDModel, JDSchema
-from ..providers import position_db
+from ..providers import position_db, position_adb
+from .cv_schema import CVSchema
+from .stats_schema import PositionStatsSchema, ProjectStatsSchema, changed
+from .tracked_schema import TrackedSchema
+from ..providers.identity_map import identity_get, identity_add, identity_discard, identity_partition
+from ..providers.transaction_provider import Transaction
 from ..utils.utils import get_current_time
+from ..utils.counters import add_counts
 
 
 class PositionStatus(str, Enum):
@@ -27,6 +33,7 @@ class PositionModel(BaseModel):
     # criterias: list[CriteriaModel] = Field([], title="Criterias")
     re_analyzing: bool = Field(False, title="Re-analyzing")
     match_detail: dict = Field({}, title="Match Detail")
+    project: str = Field(None, title="Project ID")
 
 
 class PositionMinimalModel(BaseModel):
@@ -38,11 +45,14 @@ class PositionMinimalModel(BaseModel):
     jd: str | JDModel = Field("", title="Job Description")
 
 
-class PositionSchema:
+class PositionSchema(TrackedSchema):
     '''
     Schema and Validation for Position.
     '''
 
+    _db = position_db
+    _adb = position_adb
+
     def __init__(
         self,
         position_id: AnyStr = None,
@@ -58,6 +68,7 @@ class PositionSchema:
         # criterias: List[CriteriaSchema] = [],
         re_analyzing: bool = False,
         match_detail: Dict = {},
+        project_id: AnyStr = None,
     ):
         self.id = position_id
         self.name = name
@@ -72,6 +83,7 @@ class PositionSchema:
         # self.criterias = criterias
         self.re_analyzing = re_analyzing
         self.match_detail = match_detail
+        self.project_id = project_id
 
     def to_dict(self, include_id=True, minimal=False):
         data_dict = {
@@ -90,6 +102,7 @@ class PositionSchema:
             #                         for criteria in self.criterias]
             data_dict["re_analyzing"] = self.re_analyzing
             data_dict["match_detail"] = self.match_detail
+            data_dict["project"] = self.project_id
         if include_id:
             data_dict["id"] = self.id
         return data_dict
@@ -110,7 +123,8 @@ class PositionSchema:
             # criterias=[CriteriaSchema.from_dict(
             #     criteria) for criteria in data.get("criterias")],
             re_analyzing=data.get("re_analyzing"),
-            match_detail=data.get("match_detail")
+            match_detail=data.get("match_detail"),
+            project_id=data.get("project")
         )
 
     @staticmethod
@@ -129,6 +143,59 @@ class PositionSchema:
         position = position_db.get_by_id(position_id)
         return PositionSchema.from_dict(position)
 
+    @staticmethod
+    async def afind_all_by_ids(position_ids: List[AnyStr]):
+        '''
+        Find all positions by list of position ids.
+        '''
+        # Reuse positions already loaded in this request
+        positions, missing_ids = identity_partition(
+            position_adb.collection_name, position_ids)
+        if missing_ids:
+            positions += [identity_add(position_adb.collection_name, PositionSchema.from_dict(position))
+                          for position in await position_adb.get_all_by_ids(missing_ids)]
+        return positions
+
+    @staticmethod
+    async def afind_all_by_ids_in(transaction: Transaction, position_ids: List[AnyStr]):
+        '''
+        Read positions in a transaction, which runs again if one is written before it commits.
+        '''
+        docs = await transaction.aget_all(position_adb, position_ids)
+        return [PositionSchema.from_dict({**doc, "id": position_id})
+                for position_id, doc in zip(position_ids, docs) if doc]
+
+    @staticmethod
+    async def afind_page_by_ids(position_ids: List[AnyStr], limit: int | None, cursor: AnyStr | None = None):
+        '''
+        Get one page of positions in the order of position_ids, and the cursor of the next page.
+        '''
+        positions, next_cursor = await position_adb.get_page_by_ids(position_ids, limit, cursor)
+        positions = [identity_add(position_adb.collection_name, PositionSchema.from_dict(position)) for position in positions]
+        return positions, next_cursor
+
+    @staticmethod
+    async def afind_by_id(position_id: AnyStr):
+        '''
+        Find position by id.
+        '''
+        position = identity_get(position_adb.collection_name, position_id)
+        if position:
+            return position
+        data = await position_adb.get_by_id(position_id)
+        if not data:
+            return None
+        return identity_add(position_adb.collection_name, PositionSchema.from_dict(data))
+
+
+    def _count(self, counts: Dict):
+        # CV counts of the position, and its status counted in its project
+        PositionStatsSchema.add_counts(self.id, counts.get("position"))
+        ProjectStatsSchema.increment(self.project_id, counts.get("project"))
+
+    async def _acount(self, counts: Dict):
+        await PositionStatsSchema.aadd_counts(self.id, counts.get("position"))
+        await ProjectStatsSchema.aincrement(self.project_id, counts.get("project"))
 
     def create_position(self):
         position_id = position_db.create(self.to_dict(include_id=False))
@@ -139,11 +206,16 @@ class PositionSchema:
         return self
 
     def update_position(self, data: Dict):
-        position_db.update(self.id, data)
+        self._write(data)
 
     def update_status(self, new_status:PositionStatus):
+        before = self.status
+        self.status = PositionStatus(new_status)
         data = {"status": new_status}  # Fix: wrap string in dict
-        position_db.update(self.id, data)
+        self._write(data)
+        if before != self.status:
+            self._add_counts({"project": {
+                "position_status": {before.value: -1, self.status.value: 1}}})
 
     def delete_position(self):
         position_db.delete(self.id)
@@ -152,17 +224,23 @@ class PositionSchema:
         '''
         Update CVs in position.
         '''
-        if is_add:
-            self.cvs.append(cv_id)
-            # Update status to PROCESSING when CVs are added
-            if self.status == PositionStatus.OPEN:
-                self.update_status(PositionStatus.PROCESSING)
-        else:
-            self.cvs.remove(cv_id)
-            # Update status to OPEN if no CVs left
-            if not self.cvs and self.status == PositionStatus.PROCESSING:
-                self.update_status(PositionStatus.OPEN)
-        self.update_position({"cvs": self.cvs})
+        counts = {}
+        if (cv_id in self.cvs) != is_add:
+            counts = changed(self.cv_counts(CVSchema.find_by_ids([cv_id]), is_add))
+        # Status, CVs and their counters are written together
+        with self.deferred():
+            self._add_counts({"position": counts})
+            if is_add:
+                self.cvs.append(cv_id)
+                # Update status to PROCESSING when CVs are added
+                if self.status == PositionStatus.OPEN:
+                    self.update_status(PositionStatus.PROCESSING)
+            else:
+                self.cvs.remove(cv_id)
+                # Update status to OPEN if no CVs left
+                if not self.cvs and self.status == PositionStatus.PROCESSING:
+                    self.update_status(PositionStatus.OPEN)
+            self.update_position({"cvs": self.cvs})
 
     def update_jd(self, jd_id: AnyStr):
         '''
@@ -182,4 +260,113 @@ class PositionSchema:
         """
         if cv_id in self.cvs:
             return self.jd
-        return None 
\ No newline at end of file
+        return None
+
+    async def acreate_position(self):
+        position_id = await position_adb.create(self.to_dict(include_id=False))
+        self.id = position_id
+        # Add data to cache
+        await position_adb.cacher.aset(
+            f"{position_adb.collection_name}:{position_id}", self.to_dict(include_id=True))
+        # Start the counters of the position and count it in its project
+        await PositionStatsSchema.from_counts(position_id, self.project_id, {}).asave()
+        await ProjectStatsSchema.aincrement(
+            self.project_id, ProjectStatsSchema.position_counts(self.status.value, None))
+        return identity_add(position_adb.collection_name, self)
+
+    async def aupdate_position(self, data: Dict):
+        await self._awrite(data)
+        # Raw field updates are not applied to this object, reload it next time
+        identity_discard(position_adb.collection_name, self.id)
+
+    async def aupdate_status(self, new_status: PositionStatus):
+        before = self.status
+        self.status = PositionStatus(new_status)
+        await self._awrite({"status": new_status})
+        if before != self.status:
+            await self._aadd_counts({"project": {
+                "position_status": {before.value: -1, self.status.value: 1}}})
+
+    async def aupdate_project(self, project_id: AnyStr):
+        self.project_id = project_id
+        await self._awrite({"project": project_id})
+
+    @staticmethod
+    def cv_counts(cvs: List[CVSchema], is_add: bool = True) -> Dict:
+        '''
+        Get what CVs add to (or take from) the counters of a position.
+        '''
+        counts = {}
+        for cv in cvs:
+            counts = add_counts(counts, cv.counts(), 1 if is_add else -1)
+        return counts
+
+    @staticmethod
+    async def adelete_by_ids(position_ids: List[AnyStr]):
+        '''
+        Delete positions by ids without loading them.
+        '''
+        for doc_id in position_ids:
+            await position_adb.delete(doc_id)
+            identity_discard(position_adb.collection_name, doc_id)
+
+    async def adelete_position(self):
+        await position_adb.delete(self.id)
+        identity_discard(position_adb.collection_name, self.id)
+
+    async def aupdate_cv(self, cv_id: AnyStr, is_add: bool = True):
+        '''
+        Update CVs in position.
+        '''
+        counts = {}
+        if (cv_id in self.cvs) != is_add:
+            counts = changed(self.cv_counts(await CVSchema.afind_by_ids([cv_id]), is_add))
+        # Status, CVs and their counters are written together
+        async with self.deferred():
+            await self._aadd_counts({"position": counts})
+            if is_add:
+                self.cvs.append(cv_id)
+                # Update status to PROCESSING when CVs are added
+                if self.status == PositionStatus.OPEN:
+                    await self.aupdate_status(PositionStatus.PROCESSING)
+            else:
+                self.cvs.remove(cv_id)
+                # Update status to OPEN if no CVs left
+                if not self.cvs and self.status == PositionStatus.PROCESSING:
+                    await self.aupdate_status(PositionStatus.OPEN)
+            await self.aupdate_position({"cvs": self.cvs})
+
+    async def aupdate_cvs(self, cv_ids: List[AnyStr], is_add: bool = True):
+        '''
+        Add or remove several CVs in position with a single write.
+        '''
+        changed_ids = [cv_id for cv_id in dict.fromkeys(cv_ids) if (cv_id in self.cvs) != is_add]
+        counts = {}
+        if changed_ids:
+            counts = changed(self.cv_counts(await CVSchema.afind_by_ids(changed_ids), is_add))
+        # Status, CVs and their counters are written together
+        async with self.deferred():
+            await self._aadd_counts({"position": counts})
+            if is_add:
+                self.cvs.extend(cv_id for cv_id in cv_ids if cv_id not in self.cvs)
+                # Update status to PROCESSING when CVs are added
+                if self.status == PositionStatus.OPEN:
+                    await self.aupdate_status(PositionStatus.PROCESSING)
+            else:
+                self.cvs = [cv_id for cv_id in self.cvs if cv_id not in cv_ids]
+                # Update status to OPEN if no CVs left
+                if not self.cvs and self.status == PositionStatus.PROCESSING:
+                    await self.aupdate_status(PositionStatus.OPEN)
+            await self.aupdate_position({"cvs": self.cvs})
+
+    async def aupdate_jd(self, jd_id: AnyStr):
+        '''
+        Update JD in position.
+        '''
+        await self.aupdate_position({"jd": jd_id})
+
+    async def aupdate_match_detail(self, detail: Dict):
+        '''
+        Update match detail.
+        '''
+        await self.aupdate_position({"match_detail": detail})
@@ -1,7 +1,10 @@
 from typing import Dict, AnyStr, List
 from pydantic import BaseModel, Field
 from ..schemas.user_schema import UserSchema, UserMinimalModel
-from ..providers import project_db
+from ..providers import project_db, project_adb
+from .stats_schema import ProjectStatsSchema
+from .tracked_schema import TrackedSchema
+from ..providers.identity_map import identity_get, identity_add, identity_discard, identity_partition
 from ..utils.utils import get_current_time
 
 
@@ -16,11 +19,14 @@ class ProjectModel(BaseModel):
     last_opened: str = Field(..., title="Project Last Opened")
 
 
-class ProjectSchema:
+class ProjectSchema(TrackedSchema):
     '''
     Schema and Validation for Project.
     '''
 
+    _db = project_db
+    _adb = project_adb
+
     def __init__(
         self,
         project_id: AnyStr = None,
@@ -82,6 +88,20 @@ class ProjectSchema:
                 f"{project_db.collection_name}:{alias}", queries)
         return ProjectSchema.from_dict(queries[0])
 
+    @staticmethod
+    async def afind_by_alias(alias: AnyStr):
+        # Get in cache
+        queries = await project_adb.cacher.aget(
+            f"{project_adb.collection_name}:{alias}")
+        if not queries:
+            queries = await project_adb.query_equal("alias", alias)
+            if len(queries) == 0:
+                return None
+            # Save to cache
+            await project_adb.cacher.aset(
+                f"{project_adb.collection_name}:{alias}", queries)
+        return identity_add(project_adb.collection_name, ProjectSchema.from_dict(queries[0]))
+
     @staticmethod
     def find_by_id(project_id: AnyStr):
         data = project_db.get_by_id(project_id)
@@ -94,6 +114,35 @@ class ProjectSchema:
         projects = project_db.get_all_by_ids(ids=project_ids)
         return [ProjectSchema.from_dict(project) for project in projects]
 
+    @staticmethod
+    async def afind_page_by_ids(project_ids: List[AnyStr], limit: int | None, cursor: AnyStr | None = None):
+        '''
+        Get one page of projects in the order of project_ids, and the cursor of the next page.
+        '''
+        projects, next_cursor = await project_adb.get_page_by_ids(project_ids, limit, cursor)
+        projects = [identity_add(project_adb.collection_name, ProjectSchema.from_dict(project)) for project in projects]
+        return projects, next_cursor
+
+    @staticmethod
+    async def afind_by_id(project_id: AnyStr):
+        project = identity_get(project_adb.collection_name, project_id)
+        if project:
+            return project
+        data = await project_adb.get_by_id(project_id)
+        if not data:
+            return None
+        return identity_add(project_adb.collection_name, ProjectSchema.from_dict(data))
+
+    @staticmethod
+    async def afind_all_by_ids(project_ids: List[AnyStr]):
+        # Reuse projects already loaded in this request
+        projects, missing_ids = identity_partition(
+            project_adb.collection_name, project_ids)
+        if missing_ids:
+            projects += [identity_add(project_adb.collection_name, ProjectSchema.from_dict(project))
+                         for project in await project_adb.get_all_by_ids(ids=missing_ids)]
+        return projects
+
     def create_project(self):
         project_id = project_db.create(self.to_dict(include_id=False))
         self.id = project_id
@@ -103,7 +152,7 @@ class ProjectSchema:
         return self
 
     def update_project(self, data):
-        project_db.update(self.id, data)
+        self._write(data)
 
     def update_members(self, members: List[AnyStr], is_add: bool = True):
         if is_add:
@@ -111,7 +160,7 @@ class ProjectSchema:
         else:
             self.members = list(set(self.members) - set(members))
         # Add data to cache
-        project_db.update(self.id, {"members": self.members})
+        self._write({"members": self.members})
 
     def delete_project(self):
         project_db.delete(self.id)
@@ -122,5 +171,50 @@ class ProjectSchema:
         else:
             self.positions.remove(positions_id)
         # Add data to cache
-        project_db.update(self.id, {"hiring_requests": self.positions})
+        self._write({"hiring_requests": self.positions})
+        return self
+
+    async def acreate_project(self):
+        project_id = await project_adb.create(self.to_dict(include_id=False))
+        self.id = project_id
+        # Add data to cache
+        await project_adb.cacher.aset(
+            f"{project_adb.collection_name}:{project_id}", self.to_dict(include_id=True))
+        # Start the counters of the project
+        await ProjectStatsSchema.from_counts(project_id, {}).asave()
+        return identity_add(project_adb.collection_name, self)
+
+    async def aupdate_project(self, data):
+        await self._awrite(data)
+        # Raw field updates are not applied to this object, reload it next time
+        identity_discard(project_adb.collection_name, self.id)
+
+    async def aupdate_members(self, members: List[AnyStr], is_add: bool = True):
+        if is_add:
+            self.members = list(set(self.members) | set(members))
+        else:
+            self.members = list(set(self.members) - set(members))
+        # Add data to cache
+        await self._awrite({"members": self.members})
+
+    @staticmethod
+    async def adelete_by_ids(project_ids: List[AnyStr]):
+        '''
+        Delete projects by ids without loading them.
+        '''
+        for doc_id in project_ids:
+            await project_adb.delete(doc_id)
+            identity_discard(project_adb.collection_name, doc_id)
+
+    async def adelete_project(self):
+        await project_adb.delete(self.id)
+        identity_discard(project_adb.collection_name, self.id)
+
+    async def aupdate_positions(self, positions_id: AnyStr, is_add: bool):
+        if is_add:
+            self.positions.append(positions_id)
+        else:
+            self.positions.remove(positions_id)
+        # Add data to cache
+        await self._awrite({"hiring_requests": self.positions})
         return self
@@ -0,0 +1,268 @@
+from typing import Any, AnyStr, Dict, List
+import time
+from enum import Enum
+from pydantic import BaseModel, Field
+from ..providers import purge_db, purge_adb, write_batch
+from ..providers.async_db_provider import AsyncDatabaseProvider
+from ..providers.transaction_provider import Transaction, arun_transaction
+from .tracked_schema import TrackedSchema
+from ..utils.utils import get_current_time
+from ..utils.constants import PURGE_JOB_COLLECTION, PURGE_PLAN_COLLECTION
+
+
+class PurgeStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class PurgeJobModel(BaseModel):
+    id: str = Field(..., title="Purge Job ID")
+    status: PurgeStatus = Field(PurgeStatus.PENDING, title="Purge Job Status")
+    total: int = Field(0, title="Blobs and documents to delete")
+    done: int = Field(0, title="Blobs and documents deleted")
+    percent: float = Field(0.0, title="Purge Progress")
+    error: str | None = Field(None, title="Purge Error")
+
+
+class PurgeJobSchema(TrackedSchema):
+    '''
+    Schema for a bulk purge job.
+    What is left to delete is stored as chunk documents in the "Plan"
+    subcollection of the job, so an interrupted purge resumes where it
+    stopped and the job document stays small. A "blobs" chunk holds the
+    storage paths of CVs, the other chunks the document ids of a collection.
+    The instance running the job holds a lease on it, renewed as it works,
+    and a job is given up after a number of attempts.
+    '''
+
+    _db = purge_db
+    _adb = purge_adb
+
+    def __init__(
+        self,
+        job_id: AnyStr = None,
+        status: PurgeStatus = PurgeStatus.PENDING,
+        roots: Dict[str, List[AnyStr]] = {},
+        user_id: AnyStr = None,
+        project_id: AnyStr = None,
+        collected: bool = False,
+        total: int = 0,
+        done: int = 0,
+        error: AnyStr | None = None,
+        attempts: int = 0,
+        lease_owner: AnyStr | None = None,
+        lease_expires_at: float = 0.0,
+        created_at: AnyStr = None,
+        updated_at: AnyStr = None
+    ):
+        self.id = job_id
+        self.status = status
+        self.roots = roots
+        self.user_id = user_id
+        self.project_id = project_id
+        self.collected = collected
+        self.total = total
+        self.done = done
+        self.error = error
+        self.attempts = attempts
+        self.lease_owner = lease_owner
+        self.lease_expires_at = lease_expires_at
+        self.created_at = created_at or get_current_time()
+        self.updated_at = updated_at or self.created_at
+
+    def to_dict(self, include_id=True):
+        data_dict = {
+            "status": self.status,
+            "roots": self.roots,
+            "user": self.user_id,
+            "project": self.project_id,
+            "collected": self.collected,
+            "total": self.total,
+            "done": self.done,
+            "error": self.error,
+            "attempts": self.attempts,
+            "lease_owner": self.lease_owner,
+            "lease_expires_at": self.lease_expires_at,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+        if include_id:
+            data_dict["id"] = self.id
+        return data_dict
+
+    def to_progress(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "percent": round(self.done / self.total * 100, 2) if self.total else
+            (100.0 if self.status == PurgeStatus.COMPLETED else 0.0),
+            "error": self.error
+        }
+
+    @staticmethod
+    def from_dict(data: Dict):
+        return PurgeJobSchema(
+            job_id=data.get("id"),
+            status=PurgeStatus(data.get("status", PurgeStatus.PENDING)),
+            roots=data.get("roots", {}),
+            user_id=data.get("user"),
+            project_id=data.get("project"),
+            collected=data.get("collected", False),
+            total=data.get("total", 0),
+            done=data.get("done", 0),
+            error=data.get("error"),
+            attempts=data.get("attempts", 0),
+            lease_owner=data.get("lease_owner"),
+            lease_expires_at=data.get("lease_expires_at", 0.0),
+            created_at=data.get("created_at"),
+            updated_at=data.get("updated_at")
+        )
+
+    @property
+    def plan_adb(self) -> AsyncDatabaseProvider:
+        return AsyncDatabaseProvider(
+            collection_name=f"{PURGE_JOB_COLLECTION}/{self.id}/{PURGE_PLAN_COLLECTION}")
+
+    @staticmethod
+    async def afind_by_id(job_id: AnyStr):
+        data = await purge_adb.get_by_id(job_id)
+        if not data:
+            return None
+        return PurgeJobSchema.from_dict(data)
+
+    @staticmethod
+    async def afind_unfinished():
+        jobs = []
+        for status in (PurgeStatus.PENDING, PurgeStatus.RUNNING, PurgeStatus.FAILED):
+            jobs += [PurgeJobSchema.from_dict(job)
+                     for job in await purge_adb.query_equal("status", status.value)]
+        return jobs
+
+    async def acreate_job(self):
+        self.id = await purge_adb.create(self.to_dict(include_id=False))
+        return self
+
+    def can_access(self, user: Any) -> bool:
+        '''
+        Check the user started the job or is a member of its project.
+        '''
+        project_ids = [self.project_id] if self.project_id else self.roots.get("projects", [])
+        return self.user_id == user.id or any(
+            project_id in user.projects or project_id in user.shared or project_id in user.trash
+            for project_id in project_ids)
+
+    def is_claimable(self, owner: AnyStr, max_attempts: int, now: float) -> bool:
+        '''
+        Check owner may run the job: it is not finished, no other instance
+        holds a live lease on it and it has attempts left.
+        '''
+        if self.status == PurgeStatus.COMPLETED or self.attempts >= max_attempts:
+            return False
+        return self.lease_owner in (None, owner) or self.lease_expires_at <= now
+
+    async def aclaim(self, owner: AnyStr, ttl: float, max_attempts: int) -> bool:
+        '''
+        Take the lease of the job for owner and count an attempt, in a
+        transaction so only one instance runs it.
+        Return False when the job cannot be claimed.
+        '''
+        async def claim(transaction: Transaction):
+            data = await transaction.aget(purge_adb, self.id)
+            if not data:
+                return None
+            job = PurgeJobSchema.from_dict({**data, "id": self.id})
+            now = time.time()
+            if not job.is_claimable(owner, max_attempts, now):
+                return None
+            changes = {
+                "status": PurgeStatus.RUNNING,
+                "attempts": job.attempts + 1,
+                "lease_owner": owner,
+                "lease_expires_at": now + ttl,
+                "updated_at": get_current_time()
+            }
+            transaction.set(purge_adb, self.id, changes)
+            return {**data, **changes, "id": self.id}
+
+        data = await arun_transaction(claim)
+        if data is None:
+            return False
+        self.__dict__.update(PurgeJobSchema.from_dict(data).__dict__)
+        return True
+
+    async def arenew_lease(self, owner: AnyStr, ttl: float) -> bool:
+        '''
+        Extend the lease of owner. Return False when it was lost.
+        '''
+        async def renew(transaction: Transaction):
+            data = await transaction.aget(purge_adb, self.id)
+            if not data or data.get("lease_owner") != owner:
+                return False
+            transaction.set(purge_adb, self.id, {"lease_expires_at": time.time() + ttl})
+            return True
+
+        return await arun_transaction(renew)
+
+    async def aupdate_status(self, status: PurgeStatus, error: AnyStr | None = None):
+        '''
+        Set the status, a finished or failed job releases its lease.
+        '''
+        self.status = status
+        self.error = error
+        self.updated_at = get_current_time()
+        changes = {
+            "status": status,
+            "error": error,
+            "updated_at": self.updated_at
+        }
+        if status in (PurgeStatus.COMPLETED, PurgeStatus.FAILED):
+            self.lease_owner, self.lease_expires_at = None, 0.0
+            changes.update({"lease_owner": None, "lease_expires_at": 0.0})
+        await self._awrite(changes)
+
+    async def afind_plan(self) -> List[Dict[str, Any]]:
+        '''
+        Get the chunks left to delete, in order.
+        '''
+        return sorted(await self.plan_adb.get_all(), key=lambda chunk: chunk["id"])
+
+    async def aset_plan(self, chunks: List[Dict[str, Any]]):
+        '''
+        Save the collected subtree to delete, replacing a partly saved plan.
+        Each chunk has a "kind", "blobs" or a collection, and "ids".
+        '''
+        plan_adb = self.plan_adb
+        async with write_batch():
+            for chunk in await plan_adb.get_all():
+                await plan_adb.delete(chunk["id"])
+        async with write_batch():
+            for i, chunk in enumerate(chunks):
+                await plan_adb.update(f"{i:06d}", chunk)
+
+        self.collected = True
+        self.total = sum(len(chunk["ids"]) for chunk in chunks)
+        self.done = 0
+        self.updated_at = get_current_time()
+        await self._awrite({
+            "collected": True,
+            "total": self.total,
+            "done": 0,
+            "updated_at": self.updated_at
+        })
+
+    async def aupdate_chunk(self, chunk_id: AnyStr, data: Dict[str, Any]):
+        await self.plan_adb.update(chunk_id, data)
+
+    async def aremove_chunk(self, chunk_id: AnyStr, done: int):
+        '''
+        Drop a deleted chunk from the plan and count it as done.
+        Inside an open write batch this joins the deletes of the chunk.
+        '''
+        async with write_batch():
+            await self.plan_adb.delete(chunk_id)
+            await purge_adb.increment(self.id, {"done": done})
+        self.done += done
@@ -0,0 +1,316 @@
+from typing import Any, AnyStr, Dict, List
+from ..providers import (
+    position_stats_db,
+    position_stats_adb,
+    project_stats_db,
+    project_stats_adb,
+    write_batch
+)
+from ..providers.transaction_provider import Transaction
+from ..utils.counters import add_counts
+from ..utils.constants import SCORE_FIELDS, SCORE_BINS
+
+
+def score_bin(score: Any) -> AnyStr | None:
+    '''
+    Get the histogram bin of a score, None for a missing score.
+    '''
+    if isinstance(score, bool) or not isinstance(score, (int, float)):
+        return None
+    for label, upper in SCORE_BINS.items():
+        if score <= upper:
+            return label
+    return None
+
+
+def cv_counts(status: AnyStr, matching: Any) -> Dict[str, Any]:
+    '''
+    Get what one CV adds to the counters of its position.
+    '''
+    counts = {"total_cvs": 1, "cv_status": {status: 1}}
+    overall_result = matching.get("overall_result") if isinstance(matching, dict) else None
+    if isinstance(overall_result, dict):
+        scores = {}
+        for field in SCORE_FIELDS:
+            label = score_bin(overall_result.get(field))
+            if label:
+                scores[field] = {label: 1}
+        if scores:
+            counts["scores"] = scores
+    return counts
+
+
+def changed(counts: Dict[str, Any] = {}) -> Dict[str, Any]:
+    '''
+    Add a change of the position's data to counts, bumping its version.
+    '''
+    return {**counts, "version": 1}
+
+
+def _cv_part(counts: Dict[str, Any]) -> Dict[str, Any]:
+    # Score histograms are only kept per position
+    return {key: value for key, value in counts.items() if key in ("total_cvs", "cv_status")}
+
+
+class PositionStatsSchema:
+    '''
+    Counters of a position: CVs, CVs per status and score histograms.
+    They are updated with increments by the CV and position update methods,
+    so the dashboard reads one document. A document written only by
+    increments is not "built" and is rebuilt from the CVs when read.
+    "version" counts the changes of the position's CVs, exports are cached by it.
+    '''
+
+    def __init__(
+        self,
+        position_id: AnyStr = None,
+        project_id: AnyStr = None,
+        total_cvs: int = 0,
+        cv_status: Dict[str, int] = {},
+        scores: Dict[str, Dict[str, int]] = {},
+        built: bool = True,
+        version: int = 0
+    ):
+        self.id = position_id
+        self.project_id = project_id
+        self.total_cvs = total_cvs
+        self.cv_status = cv_status
+        self.scores = scores
+        self.built = built
+        self.version = version
+
+    def to_dict(self, include_id=True):
+        data_dict = {
+            "project": self.project_id,
+            "total_cvs": self.total_cvs,
+            "cv_status": self.cv_status,
+            "scores": self.scores,
+            "built": self.built,
+            "version": self.version
+        }
+        if include_id:
+            data_dict["id"] = self.id
+        return data_dict
+
+    @staticmethod
+    def from_dict(data: Dict):
+        return PositionStatsSchema(
+            position_id=data.get("id"),
+            project_id=data.get("project"),
+            total_cvs=data.get("total_cvs", 0),
+            cv_status=data.get("cv_status", {}),
+            scores=data.get("scores", {}),
+            built=data.get("built", False),
+            version=data.get("version", 0)
+        )
+
+    @staticmethod
+    def from_counts(position_id: AnyStr, project_id: AnyStr, counts: Dict[str, Any]):
+        return PositionStatsSchema(
+            position_id=position_id,
+            project_id=project_id,
+            total_cvs=counts.get("total_cvs", 0),
+            cv_status=counts.get("cv_status", {}),
+            scores=counts.get("scores", {})
+        )
+
+    @staticmethod
+    async def afind_by_id(position_id: AnyStr):
+        data = await position_stats_adb.get_by_id(position_id)
+        if not data or not data.get("built"):
+            return None
+        return PositionStatsSchema.from_dict(data)
+
+    @staticmethod
+    async def aget_version(position_id: AnyStr) -> int | None:
+        '''
+        Get the data version of a position, None until its counters are built.
+        '''
+        data = await position_stats_adb.get_by_id(position_id)
+        if not data or not data.get("built"):
+            return None
+        return data.get("version", 0)
+
+    async def asave(self):
+        '''
+        Replace the counters of the position, as a new version.
+        '''
+        data = await position_stats_adb.get_by_id(self.id)
+        self.version = (data or {}).get("version", 0) + 1
+        async with write_batch():
+            await position_stats_adb.delete(self.id)
+            await position_stats_adb.update(self.id, self.to_dict(include_id=False))
+        return self
+
+    @staticmethod
+    async def arebuild(transaction: Transaction, position_id: AnyStr, project_id: AnyStr, counts: Dict[str, Any]):
+        '''
+        Replace the counters of the position with counts, as a new version, in
+        a transaction: it runs again when they are incremented before it commits.
+        '''
+        data = await transaction.aget(position_stats_adb, position_id)
+        stats = PositionStatsSchema.from_counts(position_id, project_id, counts)
+        stats.version = (data or {}).get("version", 0) + 1
+        transaction.set(position_stats_adb, position_id, stats.to_dict(include_id=False), merge=False)
+        return stats
+
+    @staticmethod
+    async def afind_by_ids_in(transaction: Transaction, position_ids: List[AnyStr]):
+        '''
+        Read the built counters of positions in a transaction, by position id.
+        '''
+        docs = await transaction.aget_all(position_stats_adb, position_ids)
+        return {
+            position_id: PositionStatsSchema.from_dict({**doc, "id": position_id})
+            for position_id, doc in zip(position_ids, docs) if doc and doc.get("built")
+        }
+
+    async def aupdate_project(self, project_id: AnyStr):
+        self.project_id = project_id
+        await position_stats_adb.update(self.id, {"project": project_id})
+
+    @staticmethod
+    def add_counts(position_id: AnyStr, counts: Dict[str, Any]):
+        '''
+        Add CV counts to the position and its project.
+        '''
+        if not position_id or not counts:
+            return
+        position_stats_db.increment(position_id, counts)
+        project_id = (position_stats_db.get_by_id(position_id) or {}).get("project")
+        if project_id and _cv_part(counts):
+            project_stats_db.increment(project_id, _cv_part(counts))
+
+    @staticmethod
+    async def aadd_counts(position_id: AnyStr, counts: Dict[str, Any]):
+        '''
+        Add CV counts to the position and its project.
+        '''
+        if not position_id or not counts:
+            return
+        await position_stats_adb.increment(position_id, counts)
+        project_id = (await position_stats_adb.get_by_id(position_id) or {}).get("project")
+        if project_id and _cv_part(counts):
+            await project_stats_adb.increment(project_id, _cv_part(counts))
+
+    @staticmethod
+    async def adelete_by_ids(position_ids: List[AnyStr]):
+        for doc_id in position_ids:
+            await position_stats_adb.delete(doc_id)
+
+
+class ProjectStatsSchema:
+    '''
+    Counters of a project: positions per status, CVs and CVs per status.
+    Same rules as PositionStatsSchema.
+    '''
+
+    def __init__(
+        self,
+        project_id: AnyStr = None,
+        total_positions: int = 0,
+        position_status: Dict[str, int] = {},
+        total_cvs: int = 0,
+        cv_status: Dict[str, int] = {},
+        built: bool = True
+    ):
+        self.id = project_id
+        self.total_positions = total_positions
+        self.position_status = position_status
+        self.total_cvs = total_cvs
+        self.cv_status = cv_status
+        self.built = built
+
+    def to_dict(self, include_id=True):
+        data_dict = {
+            "total_positions": self.total_positions,
+            "position_status": self.position_status,
+            "total_cvs": self.total_cvs,
+            "cv_status": self.cv_status,
+            "built": self.built
+        }
+        if include_id:
+            data_dict["id"] = self.id
+        return data_dict
+
+    @staticmethod
+    def from_dict(data: Dict):
+        return ProjectStatsSchema(
+            project_id=data.get("id"),
+            total_positions=data.get("total_positions", 0),
+            position_status=data.get("position_status", {}),
+            total_cvs=data.get("total_cvs", 0),
+            cv_status=data.get("cv_status", {}),
+            built=data.get("built", False)
+        )
+
+    @staticmethod
+    def from_counts(project_id: AnyStr, counts: Dict[str, Any]):
+        return ProjectStatsSchema(
+            project_id=project_id,
+            total_positions=counts.get("total_positions", 0),
+            position_status=counts.get("position_status", {}),
+            total_cvs=counts.get("total_cvs", 0),
+            cv_status=counts.get("cv_status", {})
+        )
+
+    @staticmethod
+    def position_counts(status: AnyStr, stats: PositionStatsSchema | None) -> Dict[str, Any]:
+        '''
+        Get what one position adds to the counters of its project.
+        '''
+        counts = {"total_positions": 1, "position_status": {status: 1}}
+        if stats:
+            counts["total_cvs"] = stats.total_cvs
+            counts["cv_status"] = stats.cv_status
+        return counts
+
+    @staticmethod
+    async def afind_by_id(project_id: AnyStr):
+        data = await project_stats_adb.get_by_id(project_id)
+        if not data or not data.get("built"):
+            return None
+        return ProjectStatsSchema.from_dict(data)
+
+    @staticmethod
+    async def arebuild(transaction: Transaction, project_id: AnyStr, counts: Dict[str, Any]):
+        '''
+        Replace the counters of the project with counts, in a transaction:
+        it runs again when they are incremented before it commits.
+        '''
+        await transaction.aget(project_stats_adb, project_id)
+        stats = ProjectStatsSchema.from_counts(project_id, counts)
+        transaction.set(project_stats_adb, project_id, stats.to_dict(include_id=False), merge=False)
+        return stats
+
+    async def asave(self):
+        '''
+        Replace the counters of the project.
+        '''
+        async with write_batch():
+            await project_stats_adb.delete(self.id)
+            await project_stats_adb.update(self.id, self.to_dict(include_id=False))
+        return self
+
+    @staticmethod
+    def increment(project_id: AnyStr, counts: Dict[str, Any]):
+        if project_id and counts:
+            project_stats_db.increment(project_id, counts)
+
+    @staticmethod
+    async def aincrement(project_id: AnyStr, counts: Dict[str, Any]):
+        if project_id and counts:
+            await project_stats_adb.increment(project_id, counts)
+
+    @staticmethod
+    async def aremove_position(project_id: AnyStr, status: AnyStr, stats: PositionStatsSchema | None):
+        '''
+        Take a removed position out of the counters of its project.
+        '''
+        await ProjectStatsSchema.aincrement(
+            project_id, add_counts({}, ProjectStatsSchema.position_counts(status, stats), sign=-1))
+
+    @staticmethod
+    async def adelete_by_ids(project_ids: List[AnyStr]):
+        for doc_id in project_ids:
+            await project_stats_adb.delete(doc_id)
@@ -0,0 +1,140 @@
+from typing import Any, Dict
+from contextvars import ContextVar, Token
+from ..providers import write_batch
+from ..utils.counters import add_counts
+
+
+class TrackedSchema:
+    '''
+    Dirty-field tracking for schemas.
+    Inside `with schema.deferred():` (or `async with`), update methods only
+    record the fields and counter increments they change, and the block
+    writes them all in one batch on exit. Outside of it every update is
+    written at once.
+    The recorded changes belong to the task running the block, so tasks
+    sharing a schema instance through the identity map never write each
+    other's fields.
+    Subclasses set _db and _adb to their database providers, and override
+    _count/_acount to apply counter increments.
+    '''
+
+    _db = None
+    _adb = None
+
+    def _after_write(self) -> None:
+        '''
+        Hook run after the fields are written to the database.
+        '''
+        pass
+
+    def _count(self, counts: Dict[str, Any]) -> None:
+        '''
+        Hook applying counter increments of the updates.
+        '''
+        pass
+
+    async def _acount(self, counts: Dict[str, Any]) -> None:
+        pass
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        pending = _pending_of(self)
+        if pending is not None:
+            pending.dirty.update(data)
+            return
+        self._db.update(self.id, data)
+        self._after_write()
+
+    async def _awrite(self, data: Dict[str, Any]) -> None:
+        pending = _pending_of(self)
+        if pending is not None:
+            pending.dirty.update(data)
+            return
+        await self._adb.update(self.id, data)
+        self._after_write()
+
+    def _add_counts(self, counts: Dict[str, Any]) -> None:
+        pending = _pending_of(self)
+        if pending is not None:
+            pending.counts = add_counts(pending.counts, counts)
+            return
+        self._count(counts)
+
+    async def _aadd_counts(self, counts: Dict[str, Any]) -> None:
+        pending = _pending_of(self)
+        if pending is not None:
+            pending.counts = add_counts(pending.counts, counts)
+            return
+        await self._acount(counts)
+
+    def deferred(self) -> "_Deferred":
+        '''
+        Coalesce the updates of a block into one write.
+        '''
+        return _Deferred(self)
+
+
+class _Pending:
+    def __init__(self):
+        self.dirty: Dict[str, Any] = {}
+        self.counts: Dict[str, Any] = {}
+
+
+# Deferred blocks open in the current task, by schema instance
+_deferred: ContextVar[Dict[int, _Pending]] = ContextVar("deferred", default={})
+
+
+def _pending_of(schema: TrackedSchema) -> _Pending | None:
+    return _deferred.get().get(id(schema))
+
+
+class _Deferred:
+    def __init__(self, schema: TrackedSchema):
+        self.schema = schema
+        self._token: Token | None = None
+
+    def __open(self) -> TrackedSchema:
+        # A nested block joins the outer one
+        if _pending_of(self.schema) is None:
+            self._token = _deferred.set({**_deferred.get(), id(self.schema): _Pending()})
+        return self.schema
+
+    def __close(self, exc: BaseException | None) -> _Pending | None:
+        if self._token is None:
+            return None
+        pending = _pending_of(self.schema)
+        _deferred.reset(self._token)
+        # Changes of a failed block are dropped
+        if exc is not None or not (pending.dirty or pending.counts):
+            return None
+        return pending
+
+    def __enter__(self) -> TrackedSchema:
+        return self.__open()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pending = self.__close(exc)
+        if pending is None:
+            return
+        # Fields and their counters are committed together
+        with write_batch():
+            if pending.dirty:
+                self.schema._db.update(self.schema.id, pending.dirty)
+            if pending.counts:
+                self.schema._count(pending.counts)
+        if pending.dirty:
+            self.schema._after_write()
+
+    async def __aenter__(self) -> TrackedSchema:
+        return self.__open()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        pending = self.__close(exc)
+        if pending is None:
+            return
+        async with write_batch():
+            if pending.dirty:
+                await self.schema._adb.update(self.schema.id, pending.dirty)
+            if pending.counts:
+                await self.schema._acount(pending.counts)
+        if pending.dirty:
+            self.schema._after_write()
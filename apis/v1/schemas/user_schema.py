@@ -1,6 +1,8 @@
 from typing import Dict, AnyStr, List
 from pydantic import BaseModel, Field
-from ..providers import user_db
+from ..providers import user_db, user_adb, auth_cache
+from .tracked_schema import TrackedSchema
+from ..providers.identity_map import identity_get, identity_add, identity_partition
 from ..utils.utils import get_current_time
 from ..utils.constants import PLACEHOLDER_IMAGE
 
@@ -23,7 +25,14 @@ class UserMinimalModel(BaseModel):
     avatar: str = Field(..., title="User Avatar")
 
 
-class UserSchema:
+class UserSchema(TrackedSchema):
+    _db = user_db
+    _adb = user_adb
+
+    def _after_write(self):
+        # Requests authenticated as this user must see the change
+        auth_cache.invalidate_user(self.id)
+
     def __init__(
         self,
         uid: AnyStr = None,
@@ -101,6 +110,42 @@ class UserSchema:
         users = user_db.query_similar("email", substring)
         return [UserSchema.from_dict(user) for user in users]
 
+    @staticmethod
+    async def afind_all():
+        users = await user_adb.get_all()
+        return [UserSchema.from_dict(user) for user in users]
+
+    @staticmethod
+    async def afind_by_email(email: AnyStr):
+        queries = await user_adb.query_equal("email", email)
+        if len(queries) == 0:
+            return None
+        return UserSchema.from_dict(queries[0])
+
+    @staticmethod
+    async def afind_by_id(uid: AnyStr):
+        user = identity_get(user_adb.collection_name, uid)
+        if user:
+            return user
+        data = await user_adb.get_by_id(uid)
+        if not data:
+            return None
+        return identity_add(user_adb.collection_name, UserSchema.from_dict(data))
+
+    @staticmethod
+    async def afind_all_by_ids(uids: List[AnyStr]):
+        # Reuse users already loaded in this request
+        users, missing_ids = identity_partition(user_adb.collection_name, uids)
+        if missing_ids:
+            users += [identity_add(user_adb.collection_name, UserSchema.from_dict(user))
+                      for user in await user_adb.get_all_by_ids(missing_ids) if user]
+        return users
+
+    @staticmethod
+    async def afind_user_by_substring(substring: AnyStr):
+        users = await user_adb.query_similar("email", substring)
+        return [UserSchema.from_dict(user) for user in users]
+
     def create_user(self):
         user_id = user_db.create(self.to_dict(include_id=False))
         self.id = user_id
@@ -113,4 +158,18 @@ class UserSchema:
         else:
             setattr(self, key, list(
                 set(getattr(self, key)) - set([project_id])))
-        user_db.update(self.id, {f"{key}": getattr(self, key)})
+        self._write({f"{key}": getattr(self, key)})
+
+    async def acreate_user(self):
+        user_id = await user_adb.create(self.to_dict(include_id=False))
+        self.id = user_id
+        return self
+
+    async def aupdate_user_projects(self, project_id: AnyStr, is_add: bool, key: AnyStr = "projects"):
+        if is_add:
+            setattr(self, key, list(
+                set(getattr(self, key)) | set([project_id])))
+        else:
+            setattr(self, key, list(
+                set(getattr(self, key)) - set([project_id])))
+        await self._awrite({f"{key}": getattr(self, key)})
@@ -0,0 +1,130 @@
+from typing import Any, AnyStr, Dict, List, Sequence
+import math
+import warnings
+import numpy as np
+from .constants import SCORE_FIELDS, ANALYTICS_BIN_EDGES, ANALYTICS_PERCENTILES
+
+
+def _number(value: Any) -> float:
+    # Missing or non-numeric scores are NaN
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return math.nan
+    return float(value)
+
+
+def _value(value: float) -> float | None:
+    # NaN is not valid JSON
+    return None if math.isnan(value) else round(float(value), 4)
+
+
+def _edge(value: float) -> AnyStr:
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def bin_labels(edges: Sequence[float]) -> List[AnyStr]:
+    '''
+    Label the bins between edges, closed on the right like the dashboard
+    ones: integer edges [0, 20, 40] give "0-20" and "21-40".
+    '''
+    labels = []
+    for i in range(len(edges) - 1):
+        low, high = edges[i], edges[i + 1]
+        if i > 0 and float(low).is_integer() and float(high).is_integer():
+            low += 1
+        labels.append(f"{_edge(low)}-{_edge(high)}")
+    return labels
+
+
+class ScoreMatrix:
+    '''
+    Matching scores of CVs as a matrix, one row per CV and one column per
+    score field. Missing scores are NaN and left out of every statistic.
+    Each statistic is computed for all fields at once.
+    '''
+
+    def __init__(self, values: np.ndarray, fields: List[AnyStr] = SCORE_FIELDS):
+        self.values = values
+        self.fields = list(fields)
+
+    @staticmethod
+    def from_results(results: List[Dict[str, Any] | None], fields: List[AnyStr] = SCORE_FIELDS) -> "ScoreMatrix":
+        '''
+        Build the matrix from "overall_result" dicts, CVs without one are skipped.
+        '''
+        rows = [[_number(result.get(field)) for field in fields]
+                for result in results if isinstance(result, dict)]
+        return ScoreMatrix(np.array(rows, dtype=float).reshape(len(rows), len(fields)), fields)
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def histograms(self, edges: Sequence[float] = ANALYTICS_BIN_EDGES) -> Dict[str, Dict[str, int]]:
+        '''
+        Count the scores of each field per bin.
+        Scores beyond the first or last edge count in the first or last bin.
+        '''
+        edges = sorted(edges)
+        labels = bin_labels(edges)
+        size = len(labels)
+        # Bin of every score, NaN scores go to an extra bin dropped below
+        index = np.searchsorted(np.asarray(edges[1:-1], dtype=float), self.values, side="left")
+        index = np.where(np.isnan(self.values), size, index)
+        # Offset each column so one bincount counts all fields
+        offsets = np.arange(len(self.fields)) * (size + 1)
+        counts = np.bincount((index + offsets).ravel(), minlength=len(self.fields) * (size + 1))
+        counts = counts.reshape(len(self.fields), size + 1)[:, :size]
+        return {
+            field: dict(zip(labels, counts[i].tolist()))
+            for i, field in enumerate(self.fields)
+        }
+
+    def describe(self, percentiles: Sequence[float] = ANALYTICS_PERCENTILES) -> Dict[str, Dict[str, Any]]:
+        '''
+        Get count, mean, standard deviation, min, max and percentiles of each field.
+        '''
+        count = np.sum(~np.isnan(self.values), axis=0)
+        if len(self) == 0:
+            nan = np.full(len(self.fields), np.nan)
+            mean = std = low = high = nan
+            points = np.full((len(percentiles), len(self.fields)), np.nan)
+        else:
+            # Fields without any score give NaN, reported as None
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                mean = np.nanmean(self.values, axis=0)
+                std = np.nanstd(self.values, axis=0)
+                low = np.nanmin(self.values, axis=0)
+                high = np.nanmax(self.values, axis=0)
+                points = np.nanpercentile(self.values, list(percentiles), axis=0) \
+                    if len(percentiles) else np.empty((0, len(self.fields)))
+        return {
+            field: {
+                "count": int(count[i]),
+                "mean": _value(mean[i]),
+                "std": _value(std[i]),
+                "min": _value(low[i]),
+                "max": _value(high[i]),
+                "percentiles": {
+                    f"p{_edge(percentile)}": _value(points[j][i])
+                    for j, percentile in enumerate(percentiles)
+                }
+            }
+            for i, field in enumerate(self.fields)
+        }
+
+    def correlations(self) -> Dict[str, Dict[str, float | None]]:
+        '''
+        Get the Pearson correlation of each pair of fields, over the CVs
+        scored on every field. None when a field does not vary.
+        '''
+        complete = self.values[~np.isnan(self.values).any(axis=1)]
+        if complete.shape[0] < 2:
+            matrix = np.full((len(self.fields), len(self.fields)), np.nan)
+        else:
+            with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+                warnings.simplefilter("ignore", RuntimeWarning)
+                matrix = np.atleast_2d(np.corrcoef(complete, rowvar=False))
+        return {
+            field: {other: _value(matrix[i][j]) for j, other in enumerate(self.fields)}
+            for i, field in enumerate(self.fields)
+        }
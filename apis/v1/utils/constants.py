@@ -1,5 +1,15 @@
 # Google Verify Access Token URL
 GOOGLE_VERIFY_URL = "https://www.googleapis.com/oauth2/v3/userinfo?access_token="
+GOOGLE_TOKEN_NAMESPACE = "GoogleToken"
+GOOGLE_TOKEN_TTL = 300
+
+# Login sessions
+SESSION_NAMESPACE = "Session"
+SESSION_TTL = 7 * 24 * 3600
+SESSION_FLUSH_INTERVAL = 5.0
+SESSION_FLUSH_THRESHOLD = 100
+AUTH_CACHE_MAX_ENTRIES = 1024
+AUTH_CACHE_TTL = 60
 
 # Qdrant vectors
 DEFAULT_EMBEDDING_PROVIDER = "mxbai"
@@ -14,10 +24,106 @@ POSITION_COLLECTION = "HiringRequests"
 CV_COLLECTION = "CVs"
 JD_COLLECTION = "JDs"
 QUESTION_COLLECTION = "Questions"
+PURGE_JOB_COLLECTION = "PurgeJobs"
+PURGE_PLAN_COLLECTION = "Plan"
+POSITION_STATS_COLLECTION = "HiringRequestStats"
+PROJECT_STATS_COLLECTION = "ProjectStats"
+BLOB_REF_COLLECTION = "BlobRefs"
+
+# Content-addressed CV cache namespaces
+CV_CONTENT_NAMESPACE = "CVContent"
+CV_SUMMARY_NAMESPACE = "CVSummary"
+
+# Cache eviction (per collection namespace)
+CACHE_EVICTION_POLICY = "lru"
+CACHE_NAMESPACE_LIMITS = {
+    USER_COLLECTION: {"max_entries": 5000, "max_bytes": 16 * 1024 * 1024},
+    PROJECT_COLLECTION: {"max_entries": 5000, "max_bytes": 16 * 1024 * 1024},
+    POSITION_COLLECTION: {"max_entries": 5000, "max_bytes": 32 * 1024 * 1024},
+    CV_COLLECTION: {"max_entries": 2000, "max_bytes": 128 * 1024 * 1024},
+    JD_COLLECTION: {"max_entries": 2000, "max_bytes": 32 * 1024 * 1024},
+    CV_CONTENT_NAMESPACE: {"max_entries": 5000, "max_bytes": 64 * 1024 * 1024},
+    CV_SUMMARY_NAMESPACE: {"max_entries": 10000, "max_bytes": 64 * 1024 * 1024},
+}
 
 # Firebase storage
 CV_STORAGE = "CVs"
 
+# Cursor pagination of list endpoints
+PAGE_MAX_LIMIT = 500
+
+# CV query indexes: positions kept in memory and CV fields they are built from
+CV_INDEX_MAX_POSITIONS = 256
+CV_INDEX_FIELDS = ["status", "labels", "matching.overall_result"]
+
+# File exports: worker threads, files kept on disk and CVs loaded per read
+EXPORT_MAX_WORKERS = 2
+EXPORT_MAX_FILES = 200
+EXPORT_CHUNK_SIZE = 100
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# CV ingestion: concurrent files per stage of one upload batch
+CV_INGEST_STAGE_LIMITS = {
+    "storage": 4,
+    "extract": 2,
+    "database": 8,
+}
+
+# AI processing / matching dispatch
+AI_DISPATCH_CHUNK_SIZE = 5
+AI_DISPATCH_MAX_IN_FLIGHT = 3
+AI_DISPATCH_MAX_RETRIES = 3
+AI_DISPATCH_BACKOFF = 1.0
+
+# Pooled HTTP client for the AI services (timeouts in seconds, processing is per document)
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+HTTP_KEEPALIVE_EXPIRY = 30.0
+HTTP_ENDPOINT_TIMEOUTS = {
+    "processing": 120.0,
+    "matching": 60.0,
+    "google": 10.0,
+}
+
+# Dashboard score histograms: bin labels and their upper bounds
+SCORE_FIELDS = [
+    "education_score",
+    "language_skills_score",
+    "technical_skills_score",
+    "personal_projects_score",
+    "work_experience_score",
+    "publications_score",
+    "overall_score",
+]
+SCORE_BINS = {
+    "0-20": 20,
+    "21-40": 40,
+    "41-60": 60,
+    "61-80": 80,
+    "81-100": float("inf"),
+}
+
+# Score analytics defaults: histogram bin edges and percentiles
+ANALYTICS_BIN_EDGES = [0, 20, 40, 60, 80, 100]
+ANALYTICS_PERCENTILES = [25, 50, 75, 90]
+
+# Bulk purge: blobs removed concurrently, progress saved every chunk
+PURGE_BLOB_CONCURRENCY = 8
+PURGE_BLOB_CHUNK_SIZE = 50
+# Seconds an instance holds a purge job without renewing, attempts before a job is given up
+PURGE_LEASE_TTL = 300
+PURGE_MAX_ATTEMPTS = 5
+
+# CV text extraction
+EXTRACTION_MAX_WORKERS = 2
+EXTRACTION_TIMEOUT = 30.0
+EXTRACTION_MAX_PAGES = 30
+EXTRACTION_GRACE = 5.0
+
 # Utilities
 PLACEHOLDER_IMAGE = "https://i.pravatar.cc/150"
 DEFAULT_LLM_PROVIDER = "gemini"
@@ -0,0 +1,33 @@
+from typing import Any, Dict
+
+
+def add_counts(base: Dict[str, Any], counts: Dict[str, Any], sign: int = 1) -> Dict[str, Any]:
+    '''
+    Add nested counts to a copy of base, e.g.
+    add_counts({"a": {"x": 1}}, {"a": {"x": 2, "y": 1}}) == {"a": {"x": 3, "y": 1}}.
+    '''
+    result = dict(base or {})
+    for key, value in counts.items():
+        if isinstance(value, dict):
+            current = result.get(key)
+            result[key] = add_counts(current if isinstance(current, dict) else {}, value, sign)
+        else:
+            current = result.get(key)
+            result[key] = (current if isinstance(current, (int, float)) else 0) + sign * value
+    return result
+
+
+def diff_counts(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Get the counts to add to go from before to after, without zero entries.
+    '''
+    result = {}
+    for key in {**before, **after}:
+        old, new = before.get(key), after.get(key)
+        if isinstance(old, dict) or isinstance(new, dict):
+            value = diff_counts(old or {}, new or {})
+            if value:
+                result[key] = value
+        elif (new or 0) != (old or 0):
+            result[key] = (new or 0) - (old or 0)
+    return result
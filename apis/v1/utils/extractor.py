@@ -1,18 +1,82 @@
+from typing import BinaryIO
+import io
 import os
+import signal
+import tempfile
+import threading
+from itertools import islice
+from contextlib import contextmanager
 from fastapi import HTTPException, status
 from bs4 import BeautifulSoup
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
+import docx2txt
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 
-def _load_pdf_docx(filepath: str):
+class ExtractionError(Exception):
+    '''
+    The content of a file could not be extracted.
+    '''
+
+
+class ExtractionTimeout(ExtractionError):
+    '''
+    The extraction of a file exceeded its time limit.
+    '''
+
+
+Source = str | bytes | bytearray | memoryview | BinaryIO
+
+
+def _open_source(source: Source) -> str | BinaryIO:
+    '''
+    Get a path or a readable buffer for the source, without copying
+    buffers that are already file-like.
+    '''
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+
+def _load_pdf(source: Source, filename: str, max_pages: int = None):
+    '''
+    Load the pages of the PDF file, at most max_pages of them.
+    '''
+    reader = PdfReader(_open_source(source))
+    pages = reader.pages if max_pages is None else islice(reader.pages, max_pages)
+    return [
+        Document(
+            page_content=page.extract_text(),
+            metadata={"source": filename, "page": page_number}
+        )
+        for page_number, page in enumerate(pages)
+    ]
+
+
+def _load_docx(source: Source, filename: str):
+    '''
+    Load the DOCX file as a single document.
+    '''
+    return [
+        Document(
+            page_content=docx2txt.process(_open_source(source)),
+            metadata={"source": filename}
+        )
+    ]
+
+
+def _load_pdf_docx(source: Source, max_pages: int = None, filename: str = None):
     '''
     Load the PDF or DOCX file and split the content into the list of documents.
+    The source is a file path, or the file bytes / buffer with its filename.
     '''
-    if os.path.basename(filepath).endswith(".pdf") or os.path.basename(filepath).endswith(".PDF"):
-        loader = PyPDFLoader(filepath)
+    filename = os.path.basename(filename or source)
+    if filename.endswith(".pdf") or filename.endswith(".PDF"):
+        documents = _load_pdf(source, filename, max_pages)
 
-    elif os.path.basename(filepath).endswith(".docx") or os.path.basename(filepath).endswith(".DOCX"):
-        loader = Docx2txtLoader(filepath)
+    elif filename.endswith(".docx") or filename.endswith(".DOCX"):
+        documents = _load_docx(source, filename)
 
     else:
         raise HTTPException(
@@ -20,15 +84,17 @@ def _load_pdf_docx(filepath: str):
             detail="File type not supported."
         )
 
-    # Load and split the content
-    return loader.load_and_split()
+    # Split the content
+    return RecursiveCharacterTextSplitter().split_documents(documents)
 
 
-def get_cv_content(filepath: str) -> str:
+def get_cv_content(source: Source, max_pages: int = None, filename: str = None) -> str:
     '''
     Get the content of the CV file. Weathers it is a PDF or DOCX file.
+    The file is read from a path, or parsed in memory from bytes, a
+    memoryview or a BytesIO, in which case filename gives its type.
     '''
-    data = _load_pdf_docx(filepath)
+    data = _load_pdf_docx(source, max_pages, filename)
 
     content = ""
     for _data in data:
@@ -39,6 +105,59 @@ def get_cv_content(filepath: str) -> str:
     return content
 
 
+@contextmanager
+def _time_limit(timeout: float = None):
+    # SIGALRM can only interrupt the main thread of a process
+    if not timeout or not hasattr(signal, "setitimer") \
+            or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _raise_timeout(signum, frame):
+        raise ExtractionTimeout(f"Extraction exceeded {timeout}s.")
+
+    previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def extract_cv_content(
+    data: bytes,
+    filename: str,
+    max_pages: int = None,
+    timeout: float = None,
+    use_temp_file: bool = False
+) -> str:
+    '''
+    Get the content of a CV file from its bytes, parsed in memory.
+    With use_temp_file, the bytes are written to a temp file and parsed
+    from disk instead.
+    Run inside an extraction worker, any failure is raised as ExtractionError.
+    '''
+    filepath = None
+    try:
+        with _time_limit(timeout):
+            if not use_temp_file:
+                return get_cv_content(data, max_pages, filename)
+
+            extension = os.path.splitext(filename)[1].lower()
+            fd, filepath = tempfile.mkstemp(suffix=extension)
+            with os.fdopen(fd, "wb") as _file:
+                _file.write(data)
+            return get_cv_content(filepath, max_pages)
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(f"Could not extract content of {filename}. {str(e)}")
+    finally:
+        if filepath and os.path.exists(filepath):
+            os.remove(filepath)
+
+
 def get_jd_content(html_content: str):
     '''
     Get the content of the job description.
@@ -1,4 +1,9 @@
 import pandas as pd
+import os
+import io
+import csv
+import json
+import xlsxwriter
 from io import BytesIO
 from datetime import datetime
 
@@ -40,72 +45,205 @@ def format_languages(langs):
         for l in langs
     ])
 
-def build_cv_summary_file(cvs):
+CV_SUMMARY_COLUMNS = [
+    "ID",
+    "Name",
+    "Email",
+    "Phone Number",
+    "Address",
+    "Professional Summary",
+    "Education",
+    "Technical Skills",
+    "Work Experience",
+    "Soft Skills",
+    "Certifications",
+    "Languages"
+]
+
+CV_MATCHING_COLUMNS = [
+    "ID",
+    "Name",
+    "Email",
+    "Phone Number",
+    "Education Score",
+    "Language Skills Score",
+    "Technical Skills Score",
+    "Work Experience Score",
+    "Personal Projects Score",
+    "Publications Score",
+    "Overall Score",
+    "Education Explanation",
+    "Language Skills Explanation",
+    "Technical Skills Explanation",
+    "Work Experience Explanation",
+    "Personal Projects Explanation",
+    "Publications Explanation"
+]
+
+def sort_by_upload(cvs):
     # Sort by upload_at (newest first)
-    cvs = sorted(cvs, key=lambda x: datetime.fromisoformat(x["upload_at"]), reverse=True)
-
-    rows = []
-    for i, cv in enumerate(cvs, start=1):
-        summary = cv["summary"]
-        pi = summary.get("PersonalInformation", {})
-        contact = pi.get("ContactInformation", {})
-        skills = summary.get("Skills", {})
-        row = {
-            "ID": i,
-            "upload_at": cv["upload_at"],
-            "Name": pi.get("FullName", ""),
-            "Email": contact.get("Email", ""),
-            "Phone Number": contact.get("PhoneNumber", ""),
-            "Address": contact.get("Address", ""),
-            "Professional Summary": summary.get("ProfessionalSummary", ""),
-            "Education": format_education(summary.get("Education", [])),
-            "Technical Skills": ", ".join(skills.get("TechnicalSkills", [])),
-            "Work Experience": format_work_experience(summary.get("WorkExperience", [])),
-            "Soft Skills": ", ".join(skills.get("SoftSkills", [])),
-            "Certifications": format_certifications(summary.get("CertificationsAndTraining", [])),
-            "Languages": format_languages(summary.get("Languages", []))
-        }
-        rows.append(row)
-
-    df = pd.DataFrame(rows)
-    df.drop(columns=["upload_at"], inplace=True)
-    return df
+    return sorted(cvs, key=lambda x: datetime.fromisoformat(x["upload_at"]), reverse=True)
+
+def cv_summary_row(i, cv):
+    summary = cv["summary"] or {}
+    pi = summary.get("PersonalInformation", {})
+    contact = pi.get("ContactInformation", {})
+    skills = summary.get("Skills", {})
+    return {
+        "ID": i,
+        "Name": pi.get("FullName", ""),
+        "Email": contact.get("Email", ""),
+        "Phone Number": contact.get("PhoneNumber", ""),
+        "Address": contact.get("Address", ""),
+        "Professional Summary": summary.get("ProfessionalSummary", ""),
+        "Education": format_education(summary.get("Education", [])),
+        "Technical Skills": ", ".join(skills.get("TechnicalSkills", [])),
+        "Work Experience": format_work_experience(summary.get("WorkExperience", [])),
+        "Soft Skills": ", ".join(skills.get("SoftSkills", [])),
+        "Certifications": format_certifications(summary.get("CertificationsAndTraining", [])),
+        "Languages": format_languages(summary.get("Languages", []))
+    }
+
+def cv_matching_row(i, cv):
+    summary = cv["summary"] or {}
+    pi = summary.get("PersonalInformation", {})
+    contact = pi.get("ContactInformation", {})
+    matching = cv.get("matching") or {}
+    overall = matching.get("overall_result", {})
+    detailed = matching.get("detailed_result", {})
+    return {
+        "ID": i,
+        "Name": pi.get("FullName", ""),
+        "Email": contact.get("Email", ""),
+        "Phone Number": contact.get("PhoneNumber", ""),
+        "Education Score": overall.get("education_score", 0),
+        "Language Skills Score": overall.get("language_skills_score", 0),
+        "Technical Skills Score": overall.get("technical_skills_score", 0),
+        "Work Experience Score": overall.get("work_experience_score", 0),
+        "Personal Projects Score": overall.get("personal_projects_score", 0),
+        "Publications Score": overall.get("publications_score", 0),
+        "Overall Score": overall.get("overall_score", 0),
+        "Education Explanation": detailed.get("education", {}).get("explanation", ""),
+        "Language Skills Explanation": "\n".join([x.get("explanation", "") for x in detailed.get("language_skills", [])]),
+        "Technical Skills Explanation": detailed.get("technical_skills", {}).get("explanation", ""),
+        "Work Experience Explanation": "\n".join([x.get("explanation", "") for x in detailed.get("work_experience", [])]),
+        "Personal Projects Explanation": "\n".join([x.get("explanation", "") for x in detailed.get("personal_projects", [])]),
+        "Publications Explanation": "\n".join([x.get("explanation", "") for x in detailed.get("publications", [])]),
+    }
+
+def build_cv_summary_file(cvs):
+    rows = [cv_summary_row(i, cv) for i, cv in enumerate(sort_by_upload(cvs), start=1)]
+    return pd.DataFrame(rows, columns=CV_SUMMARY_COLUMNS)
 
 def build_cv_matching_file(cvs):
-    # Sort by upload_at (newest first)
-    cvs = sorted(cvs, key=lambda x: datetime.fromisoformat(x["upload_at"]), reverse=True)
-
-    rows = []
-    for i, cv in enumerate(cvs, start=1):
-        summary = cv["summary"]
-        pi = summary.get("PersonalInformation", {})
-        contact = pi.get("ContactInformation", {})
-        matching = cv.get("matching", {})
-        overall = matching.get("overall_result", {})
-        detailed = matching.get("detailed_result", {})
-
-        row = {
-            "ID": i,
-            "upload_at": cv["upload_at"],
-            "Name": pi.get("FullName", ""),
-            "Email": contact.get("Email", ""),
-            "Phone Number": contact.get("PhoneNumber", ""),
-            "Education Score": overall.get("education_score", 0),
-            "Language Skills Score": overall.get("language_skills_score", 0),
-            "Technical Skills Score": overall.get("technical_skills_score", 0),
-            "Work Experience Score": overall.get("work_experience_score", 0),
-            "Personal Projects Score": overall.get("personal_projects_score", 0),
-            "Publications Score": overall.get("publications_score", 0),
-            "Overall Score": overall.get("overall_score", 0),
-            "Education Explanation": detailed.get("education", {}).get("explanation", ""),
-            "Language Skills Explanation": "\n".join([x.get("explanation", "") for x in detailed.get("language_skills", [])]),
-            "Technical Skills Explanation": detailed.get("technical_skills", {}).get("explanation", ""),
-            "Work Experience Explanation": "\n".join([x.get("explanation", "") for x in detailed.get("work_experience", [])]),
-            "Personal Projects Explanation": "\n".join([x.get("explanation", "") for x in detailed.get("personal_projects", [])]),
-            "Publications Explanation": "\n".join([x.get("explanation", "") for x in detailed.get("publications", [])]),
-        }
-        rows.append(row)
-
-    df = pd.DataFrame(rows)
-    df.drop(columns=["upload_at"], inplace=True)
-    return df
\ No newline at end of file
+    rows = [cv_matching_row(i, cv) for i, cv in enumerate(sort_by_upload(cvs), start=1)]
+    return pd.DataFrame(rows, columns=CV_MATCHING_COLUMNS)
+
+# Flat columns of each export, with the row builder filling them
+CV_EXPORT_COLUMNS = {
+    "summary": (CV_SUMMARY_COLUMNS, cv_summary_row),
+    "matching": (CV_MATCHING_COLUMNS, cv_matching_row)
+}
+
+# Leading columns of project exports, which hold the CVs of several positions
+POSITION_EXPORT_COLUMNS = ["Hiring Request ID", "Hiring Request"]
+
+def csv_lines(rows, columns, header=False):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([[row.get(column) for column in columns] for row in rows])
+    return output.getvalue()
+
+def ndjson_lines(rows, columns):
+    return "".join(
+        json.dumps({column: row.get(column) for column in columns}, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+class ParquetRowWriter:
+    '''
+    Write export rows to a Parquet file, one row group per call to write,
+    so only the rows of one chunk are in memory.
+    Raise ImportError when pyarrow is not installed.
+    '''
+
+    def __init__(self, file, columns):
+        # Optional dependency, only needed for Parquet exports
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.columns = columns
+        self.schema = pa.schema([(column, self.__type(column)) for column in columns])
+        self.writer = pq.ParquetWriter(file, self.schema)
+
+    def __type(self, column):
+        if column == "ID":
+            return self.pa.int64()
+        if column.endswith("Score"):
+            return self.pa.float64()
+        return self.pa.string()
+
+    @staticmethod
+    def __value(column, value):
+        if column == "ID":
+            return value
+        if column.endswith("Score"):
+            return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+        return None if value is None else str(value)
+
+    def write(self, rows):
+        if not rows:
+            return
+        self.writer.write_table(self.pa.Table.from_pylist(
+            [{column: self.__value(column, row.get(column)) for column in self.columns} for row in rows],
+            schema=self.schema
+        ))
+
+    def close(self):
+        self.writer.close()
+
+def _column_width(column, total):
+    # Same widths as the former pandas export: content length + 2, at most 30.
+    # Text columns are not measured, they are assumed to reach the maximum.
+    if column == "ID":
+        return max(len(str(total)), len(column)) + 2
+    if column.endswith("Score"):
+        return len(column) + 2
+    return 30
+
+def write_cv_summary_workbook(path, cv_chunks, total):
+    '''
+    Write the "CVs Summary" and "Matching Scores" sheets row by row in
+    constant_memory mode, so only the current row of each sheet is in memory.
+    cv_chunks yields lists of CV dicts, newest first.
+    '''
+    workbook = xlsxwriter.Workbook(path, {
+        "constant_memory": True,
+        "tmpdir": os.path.dirname(path) or None
+    })
+    header_format = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    wrap_format = workbook.add_format({"text_wrap": True, "valign": "top"})
+
+    sheets = []
+    for sheet_name, columns, build_row in (
+        ("CVs Summary", CV_SUMMARY_COLUMNS, cv_summary_row),
+        ("Matching Scores", CV_MATCHING_COLUMNS, cv_matching_row)
+    ):
+        worksheet = workbook.add_worksheet(sheet_name)
+        # Column formats must be set before any row is written
+        for col, column in enumerate(columns):
+            worksheet.set_column(col, col, _column_width(column, total), wrap_format)
+        worksheet.write_row(0, 0, columns, header_format)
+        sheets.append((worksheet, columns, build_row))
+
+    i = 0
+    for cvs in cv_chunks:
+        for cv in cvs:
+            i += 1
+            for worksheet, columns, build_row in sheets:
+                row = build_row(i, cv)
+                worksheet.write_row(i, 0, [row[column] for column in columns])
+    workbook.close()
@@ -23,3 +23,9 @@ def log_cache(msg: str):
     prefix = f"{Fore.BLUE}CACHE{Style.RESET_ALL}:"
     print(prefix + " "*4, end="")
     print(msg)
+
+
+def log_extract(msg: str):
+    prefix = f"{Fore.MAGENTA}EXTRACT{Style.RESET_ALL}:"
+    print(prefix + " "*2, end="")
+    print(msg)
@@ -0,0 +1,48 @@
+from typing import AnyStr, List
+import json
+import base64
+
+
+def encode_cursor(last_id: AnyStr, next_id: AnyStr, position: int) -> AnyStr:
+    '''
+    Make the opaque cursor of the page after the item last_id, which starts
+    with next_id at position in the list.
+    '''
+    data = json.dumps({"after": last_id, "next": next_id, "position": position}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def cursor_start(ids: List[AnyStr], cursor: AnyStr | None) -> int:
+    '''
+    Get the index in ids where the page of cursor starts.
+    The page starts after the last item of the previous page, wherever it
+    moved since. When that item was removed, the page starts at the item
+    that was next, or at the former position when both were removed.
+    Raise ValueError for an invalid cursor.
+    '''
+    if not cursor:
+        return 0
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        last_id, next_id, position = data["after"], data["next"], int(data["position"])
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor.")
+
+    if 0 < position <= len(ids) and ids[position - 1] == last_id:
+        return position
+    if last_id in ids:
+        return ids.index(last_id) + 1
+    if next_id in ids:
+        return ids.index(next_id)
+    return min(max(position - 1, 0), len(ids))
+
+
+def page_ids(ids: List[AnyStr], limit: int | None, cursor: AnyStr | None = None):
+    '''
+    Get the ids of one page and the cursor of the next page, None on the last page.
+    Without limit, the page holds every id after the cursor.
+    '''
+    start = cursor_start(ids, cursor)
+    end = len(ids) if limit is None else min(start + limit, len(ids))
+    next_cursor = encode_cursor(ids[end - 1], ids[end], end) if start < end < len(ids) else None
+    return ids[start:end], next_cursor
@@ -0,0 +1,63 @@
+from typing import Any, AnyStr, Awaitable, Callable, Dict, List, Tuple
+import asyncio
+
+
+class StageLimiter:
+    '''
+    Bound the number of tasks running concurrently in each named stage
+    of a pipeline, e.g. `async with limiter.stage("storage"): ...`.
+    '''
+
+    def __init__(self, limits: Dict[AnyStr, int]):
+        self.limits = {name: max(1, int(limit)) for name, limit in limits.items()}
+        self.semaphores = {
+            name: asyncio.Semaphore(limit) for name, limit in self.limits.items()
+        }
+
+    def stage(self, name: AnyStr) -> asyncio.Semaphore:
+        if name not in self.semaphores:
+            raise KeyError(f"Unknown pipeline stage {name}")
+        return self.semaphores[name]
+
+
+async def dispatch_chunks(
+    items: List[Any],
+    send: Callable[[List[Any]], Awaitable[Any]],
+    on_result: Callable[[List[Any], Any], Awaitable[None]],
+    chunk_size: int = 5,
+    max_in_flight: int = 3,
+    max_retries: int = 3,
+    backoff: float = 1.0
+) -> List[Tuple[List[Any], Exception]]:
+    '''
+    Split items into chunks and send them concurrently, at most max_in_flight
+    at a time. A failing chunk is retried on its own with exponential backoff,
+    and on_result is awaited as soon as a chunk succeeds.
+    Return the chunks that still failed, with their last error.
+    '''
+    chunk_size = max(1, chunk_size)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    semaphore = asyncio.Semaphore(max(1, max_in_flight))
+    failures = []
+
+    async def _dispatch(chunk: List[Any]):
+        for attempt in range(max_retries + 1):
+            try:
+                async with semaphore:
+                    result = await send(chunk)
+                break
+            except Exception as e:
+                if attempt == max_retries:
+                    failures.append((chunk, e))
+                    return
+                # Back off without holding a slot
+                await asyncio.sleep(backoff * 2 ** attempt)
+
+        # Results are written once, a failure here is not retried
+        try:
+            await on_result(chunk, result)
+        except Exception as e:
+            failures.append((chunk, e))
+
+    await asyncio.gather(*[_dispatch(chunk) for chunk in chunks])
+    return failures
@@ -7,3 +7,11 @@ def jsonResponseFmt(data: Any, msg: str = "Success", code: int = 200, **kwargs):
         "msg": msg,
         "data": data
     }, code, **kwargs)
+
+
+def pageResponseFmt(data: Any, next_cursor: str | None, msg: str = "Success", code: int = 200, **kwargs):
+    return JSONResponse({
+        "msg": msg,
+        "data": data,
+        "next_cursor": next_cursor
+    }, code, **kwargs)
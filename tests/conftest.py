@@ -0,0 +1,66 @@
+import os
+import sys
+import types
+import tempfile
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The caches write under the working directory
+os.chdir(tempfile.mkdtemp(prefix="smart4it-tests-"))
+
+# Credentials of a throwaway service account, nothing is sent with them
+_key = rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+    serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()).decode()
+os.environ.update({
+    "FIREBASE_PROJECT_ID": "smart4it-test",
+    "FIREBASE_PRIVATE_KEY_ID": "test",
+    "FIREBASE_PRIVATE_KEY": _key,
+    "FIREBASE_CLIENT_EMAIL": "test@smart4it-test.iam.gserviceaccount.com",
+    "FIREBASE_CLIENT_ID": "1",
+    "FIREBASE_TOKEN_URI": "https://oauth2.googleapis.com/token",
+    "JWT_SECRET": "test",
+    "CACHE_WRITE_BEHIND": "false",
+})
+
+import fakes  # noqa: E402
+fakes.install()
+
+from apis.v1.providers import cacher, memory_cacher, cv_index  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def store():
+    '''
+    Start every test with an empty database, storage and caches.
+    '''
+    fakes.reset()
+    cacher.reset_cache()
+    memory_cacher.reset_cache()
+    for position_id in list(cv_index.indexes):
+        cv_index.drop(position_id)
+    yield fakes.STORE
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    '''
+    Stand in for the redis package: both clients share one in-memory server.
+    '''
+    data = {}
+    clients = {"sync": fakes.FakeRedis(data=data), "async": fakes.FakeRedis(awaitable=True, data=data)}
+    redis = types.ModuleType("redis")
+    redis.Redis = types.SimpleNamespace(from_url=lambda url, **kwargs: clients["sync"])
+    redis.asyncio = types.ModuleType("redis.asyncio")
+    redis.asyncio.Redis = types.SimpleNamespace(from_url=lambda url, **kwargs: clients["async"])
+    monkeypatch.setitem(sys.modules, "redis", redis)
+    monkeypatch.setitem(sys.modules, "redis.asyncio", redis.asyncio)
+    return clients
@@ -0,0 +1,418 @@
+'''
+In-memory stand-ins for Firestore, Firebase Storage and Redis, so the tests
+run without credentials or servers. Only what the providers use is covered.
+'''
+import copy
+import asyncio
+import time
+import uuid
+import fnmatch
+from google.cloud.firestore_v1 import transforms
+
+
+STORE = {}
+BLOBS = {}
+
+
+def _apply(doc, data, merge):
+    base = copy.deepcopy(doc) if merge and doc is not None else {}
+    for key, value in data.items():
+        # Only update() reads dotted keys as field paths
+        parts = key.split(".") if merge == "update" else [key]
+        target = base
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        current = target.get(parts[-1])
+        if isinstance(value, transforms.Increment):
+            target[parts[-1]] = (current or 0) + value.value
+        elif isinstance(value, transforms.ArrayUnion):
+            current = current or []
+            target[parts[-1]] = current + [item for item in value.values if item not in current]
+        elif isinstance(value, transforms.ArrayRemove):
+            target[parts[-1]] = [item for item in current or [] if item not in value.values]
+        elif merge and isinstance(value, dict):
+            target[parts[-1]] = _apply(current if isinstance(current, dict) else {}, value, True)
+        else:
+            target[parts[-1]] = copy.deepcopy(value)
+    return base
+
+
+def _project(data, field_paths):
+    out = {}
+    for field_path in field_paths:
+        parts = field_path.split(".")
+        value = data
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            target = out
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = copy.deepcopy(value)
+    return out
+
+
+def _maybe_async(is_async, value):
+    if not is_async:
+        return value
+
+    async def result():
+        return value
+    return result()
+
+
+class Snapshot:
+    def __init__(self, ref, data, field_paths=None):
+        self.reference = ref
+        self.id = ref.id
+        self.exists = data is not None
+        self._data = None
+        if data is not None:
+            self._data = _project(data, field_paths) if field_paths is not None else copy.deepcopy(data)
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path):
+        value = self._data
+        for part in field_path.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+
+
+class DocumentReference:
+    def __init__(self, collection, doc_id, is_async):
+        self.collection, self.id, self.is_async = collection, doc_id, is_async
+        self.path = f"{collection}/{doc_id}"
+
+    def _read(self, field_paths=None):
+        return Snapshot(self, STORE.get(self.collection, {}).get(self.id), field_paths)
+
+    def _write(self, data, merge=False):
+        documents = STORE.setdefault(self.collection, {})
+        documents[self.id] = _apply(documents.get(self.id), data, merge)
+
+    def _delete(self):
+        STORE.get(self.collection, {}).pop(self.id, None)
+
+    def get(self, field_paths=None, transaction=None):
+        if transaction is not None:
+            transaction._track(self)
+        return _maybe_async(self.is_async, self._read(field_paths))
+
+    def set(self, data, merge=False):
+        return _maybe_async(self.is_async, self._write(data, merge))
+
+    def update(self, data):
+        return _maybe_async(self.is_async, self._write(data, "update"))
+
+    def delete(self):
+        return _maybe_async(self.is_async, self._delete())
+
+
+class Query:
+    def __init__(self, collection, is_async, filters=()):
+        self.collection, self.is_async, self.filters = collection, is_async, list(filters)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return Query(self.collection, self.is_async, self.filters + [(field_path, op_string, value)])
+
+    def _run(self):
+        snapshots = []
+        for doc_id, data in list(STORE.get(self.collection, {}).items()):
+            snapshot = Snapshot(DocumentReference(self.collection, doc_id, self.is_async), data)
+            if all(self.__match(snapshot.get(field), op, value) for field, op, value in self.filters):
+                snapshots.append(snapshot)
+        return snapshots
+
+    @staticmethod
+    def __match(current, op, value):
+        if op == "==":
+            return current == value
+        if op == ">=":
+            return current is not None and current >= value
+        if op == "<=":
+            return current is not None and current <= value
+        if op == "in":
+            return current in value
+        raise NotImplementedError(op)
+
+    def stream(self):
+        snapshots = self._run()
+        if not self.is_async:
+            return iter(snapshots)
+
+        async def stream():
+            for snapshot in snapshots:
+                yield snapshot
+        return stream()
+
+
+class CollectionReference(Query):
+    def __init__(self, name, is_async):
+        super().__init__(name, is_async)
+        self.id = name
+
+    def document(self, doc_id=None):
+        return DocumentReference(self.collection, doc_id or uuid.uuid4().hex[:20], self.is_async)
+
+    def add(self, data):
+        ref = self.document()
+        ref._write(data)
+        return _maybe_async(self.is_async, (None, ref))
+
+
+class WriteBatch:
+    def __init__(self, is_async):
+        self.is_async = is_async
+        self.ops = []
+
+    def set(self, ref, data, merge=False):
+        self.ops.append((ref, data, merge))
+
+    def update(self, ref, data):
+        self.ops.append((ref, data, "update"))
+
+    def delete(self, ref):
+        self.ops.append((ref, None, None))
+
+    def _commit(self):
+        assert len(self.ops) <= 500, "Firestore batches hold at most 500 writes"
+        for ref, data, merge in self.ops:
+            ref._delete() if data is None else ref._write(data, merge)
+        COMMITS.append(len(self.ops))
+        return []
+
+    def commit(self):
+        if not self.is_async:
+            return self._commit()
+
+        async def commit():
+            return self._commit()
+        return commit()
+
+
+# Sizes of the committed batches and transactions
+COMMITS = []
+
+
+class Transaction(WriteBatch):
+    def __init__(self, is_async, max_attempts=5):
+        super().__init__(is_async)
+        self.max_attempts = max_attempts
+        self.reads = {}
+
+    def _track(self, ref):
+        self.reads.setdefault(ref.path, (ref, copy.deepcopy(ref._read()._data)))
+
+    def _conflicts(self):
+        return any(ref._read()._data != data for ref, data in self.reads.values())
+
+    def _retry(self):
+        self.ops, self.reads = [], {}
+
+
+def transactional(function):
+    # Like Firestore, run again when a document read was written before the commit
+    def run(transaction, *args, **kwargs):
+        for _ in range(transaction.max_attempts):
+            result = function(transaction, *args, **kwargs)
+            if not transaction._conflicts():
+                transaction._commit()
+                return result
+            transaction._retry()
+        raise ValueError("Transaction contention")
+    return run
+
+
+def async_transactional(function):
+    async def run(transaction, *args, **kwargs):
+        for _ in range(transaction.max_attempts):
+            result = await function(transaction, *args, **kwargs)
+            if not transaction._conflicts():
+                transaction._commit()
+                return result
+            transaction._retry()
+        raise ValueError("Transaction contention")
+    return run
+
+
+class Client:
+    def __init__(self, is_async):
+        self.is_async = is_async
+
+    def collection(self, name):
+        return CollectionReference(name, self.is_async)
+
+    def batch(self):
+        return WriteBatch(self.is_async)
+
+    def transaction(self, max_attempts=5, **kwargs):
+        return Transaction(self.is_async, max_attempts)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        if transaction is not None:
+            for ref in references:
+                transaction._track(ref)
+        snapshots = [ref._read(field_paths) for ref in references]
+        if not self.is_async:
+            return iter(snapshots)
+
+        async def stream():
+            for snapshot in snapshots:
+                yield snapshot
+        return stream()
+
+
+class Blob:
+    def __init__(self, name):
+        self.name = name
+        self.public_url = f"https://storage.test/{name}"
+
+    def upload_from_string(self, data, content_type=None):
+        BLOBS[self.name] = data
+
+    def make_public(self):
+        pass
+
+    def exists(self):
+        return self.name in BLOBS
+
+    def download_as_bytes(self):
+        return BLOBS[self.name]
+
+    def delete(self):
+        from google.api_core.exceptions import NotFound
+        if self.name not in BLOBS:
+            raise NotFound(self.name)
+        del BLOBS[self.name]
+
+
+class Bucket:
+    def blob(self, name):
+        return Blob(name)
+
+
+def install():
+    '''
+    Point the providers at the in-memory Firestore and Storage.
+    '''
+    from firebase_admin import firestore
+    import apis.v1.configs.firebase_config as firebase_config
+    import apis.v1.providers as providers
+    from apis.v1.providers import db_provider, async_db_provider, batch_provider, storage_provider, transaction_provider
+
+    db, async_db, bucket = Client(False), Client(True), Bucket()
+    firebase_config.db, firebase_config.async_db, firebase_config.bucket = db, async_db, bucket
+    for module in (db_provider, batch_provider, transaction_provider):
+        module.db = db
+    for module in (async_db_provider, batch_provider, transaction_provider):
+        module.async_db = async_db
+    storage_provider.bucket = bucket
+    firestore.transactional = transactional
+    firestore.async_transactional = async_transactional
+    for provider in vars(providers).values():
+        if isinstance(provider, db_provider.DatabaseProvider):
+            provider.collection = db.collection(provider.collection_name)
+        elif isinstance(provider, async_db_provider.AsyncDatabaseProvider):
+            provider.collection = async_db.collection(provider.collection_name)
+
+
+def reset():
+    STORE.clear()
+    BLOBS.clear()
+    COMMITS.clear()
+
+
+class FakeRedis:
+    '''
+    Redis commands used by RedisCacheBackend, for both the sync and the
+    asyncio clients (awaitable=True).
+    '''
+
+    def __init__(self, awaitable=False, data=None):
+        self.awaitable = awaitable
+        self.data = {} if data is None else data
+        self.calls = []
+
+    def __result(self, value):
+        if not self.awaitable:
+            return value
+
+        async def result():
+            # Like a round trip to the server, other tasks run meanwhile
+            await asyncio.sleep(0)
+            return value
+        return result()
+
+    def __alive(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            self.data.pop(key, None)
+            return None
+        return value
+
+    def get(self, key):
+        self.calls.append("get")
+        return self.__result(self.__alive(key))
+
+    def mget(self, keys):
+        self.calls.append("mget")
+        return self.__result([self.__alive(key) for key in keys])
+
+    def set(self, key, value, px=None):
+        self.calls.append("set")
+        self.data[key] = (value, time.time() + px / 1000 if px else None)
+        return self.__result(True)
+
+    def delete(self, *keys):
+        self.calls.append("delete")
+        for key in keys:
+            self.data.pop(key, None)
+        return self.__result(len(keys))
+
+    def scan_iter(self, match):
+        keys = [key for key in list(self.data) if fnmatch.fnmatchcase(key, match) and self.__alive(key) is not None]
+        if not self.awaitable:
+            return iter(keys)
+
+        async def scan():
+            for key in keys:
+                yield key
+        return scan()
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def close(self):
+        return self.__result(None)
+
+    def aclose(self):
+        return self.__result(None)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def set(self, *args, **kwargs):
+        self.ops.append((args, kwargs))
+        return self
+
+    def execute(self):
+        client = FakeRedis(data=self.client.data)
+        for args, kwargs in self.ops:
+            client.set(*args, **kwargs)
+        self.client.calls.append("pipeline")
+        return _maybe_async(self.client.awaitable, [True] * len(self.ops))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
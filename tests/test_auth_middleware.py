@@ -0,0 +1,63 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from apis.v1.middlewares import auth_middleware
+from apis.v1.middlewares.auth_middleware import get_current_user
+from apis.v1.providers import jwt, user_adb, invalidations, auth_cache as shared_auth_cache
+from apis.v1.providers.auth_cache_provider import AuthCacheProvider
+from apis.v1.providers.session_provider import SessionProvider
+import fakes
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    '''
+    An empty auth cache and an in-process session store.
+    '''
+    auth_cache = AuthCacheProvider(user_adb.collection_name)
+    sessions = SessionProvider()
+    monkeypatch.setattr(auth_middleware, "auth_cache", auth_cache)
+    monkeypatch.setattr(auth_middleware, "sessions", sessions)
+    return auth_cache, sessions
+
+
+def _login(sessions, uid="u1"):
+    fakes.STORE.setdefault(user_adb.collection_name, {})[uid] = {"name": "Ann", "email": "ann@example.com"}
+    sid = sessions.create(uid)
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=jwt.encrypt({"id": uid, "sid": sid})), sid
+
+
+async def test_user_changed_on_another_instance_is_resolved_again(auth):
+    auth_cache, sessions = auth
+    credentials, _ = _login(sessions)
+    await get_current_user(credentials)
+    assert auth_cache.get(credentials.credentials) is not None
+
+    auth_cache.receive(user_adb.collection_name, "u1")
+
+    assert auth_cache.get(credentials.credentials) is None
+    assert (await get_current_user(credentials)).id == "u1"
+
+
+async def test_auth_cache_listens_to_remote_user_changes():
+    assert (shared_auth_cache.receive, True) in invalidations.listeners
+
+
+async def test_session_revoked_by_another_worker_fails_a_cached_token(auth):
+    auth_cache, sessions = auth
+    sessions.shared = True
+    credentials, sid = _login(sessions)
+    await get_current_user(credentials)
+    assert await get_current_user(credentials)
+    hits = auth_cache.stats["hits"]
+
+    # Logged out through another worker, whose cache this one does not see
+    sessions.revoke("u1", sid)
+
+    with pytest.raises(HTTPException) as error:
+        await get_current_user(credentials)
+    assert error.value.status_code == 401
+    assert auth_cache.stats["hits"] == hits + 1
+    assert auth_cache.get(credentials.credentials) is None
@@ -0,0 +1,52 @@
+import pytest
+from apis.v1.providers import cv_db, cv_adb, cacher, write_batch
+import fakes
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_batch_commits_in_chunks_of_at_most_500_writes():
+    async with write_batch():
+        for i in range(1201):
+            await cv_adb.update(f"cv{i}", {"name": f"cv{i}"})
+        # Nothing is committed before the block exits
+        assert fakes.COMMITS == [] and "CVs" not in fakes.STORE
+
+    assert fakes.COMMITS == [500, 500, 201]
+    assert len(fakes.STORE["CVs"]) == 1201
+
+
+async def test_nested_batch_joins_the_outer_one():
+    async with write_batch():
+        await cv_adb.update("a", {"name": "a"})
+        async with write_batch():
+            await cv_adb.increment("a", {"total": 1})
+            await cv_adb.delete("b")
+        assert fakes.COMMITS == []
+
+    assert fakes.COMMITS == [3]
+    assert fakes.STORE["CVs"]["a"] == {"name": "a", "total": 1}
+
+
+def test_sync_batch_honours_a_smaller_limit():
+    cv_ids = [cv_db.create({"name": f"cv{i}"}) for i in range(5)]
+    with write_batch(max_ops=2):
+        for cv_id in cv_ids:
+            cv_db.update(cv_id, {"status": "HIRED"})
+
+    assert fakes.COMMITS == [2, 2, 1]
+    assert all(doc["status"] == "HIRED" for doc in fakes.STORE["CVs"].values())
+
+
+async def test_failed_block_writes_nothing_and_drops_the_cache():
+    await cv_adb.update("a", {"name": "a"})
+    commits = list(fakes.COMMITS)
+
+    with pytest.raises(RuntimeError):
+        async with write_batch():
+            await cv_adb.update("a", {"name": "b"})
+            raise RuntimeError()
+
+    assert fakes.COMMITS == commits
+    assert fakes.STORE["CVs"]["a"] == {"name": "a"}
+    assert cacher.get("CVs:a") is None
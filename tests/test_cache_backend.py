@@ -0,0 +1,75 @@
+import time
+import pytest
+from apis.v1.providers.cache_backend import RedisCacheBackend, SQLiteCacheBackend, create_cache_backend
+from apis.v1.providers.cache_provider import CacheProvider
+import fakes
+
+pytestmark = pytest.mark.anyio
+
+
+def test_redis_backend_prefixes_keys_and_expires(redis_server):
+    backend = create_cache_backend("redis://localhost:6379/0", "cache")
+    assert isinstance(backend, RedisCacheBackend)
+
+    backend.set("CVs:1", {"name": "a"})
+    backend.set_many({"CVs:2": {"name": "b"}, "CVs:3": {"name": "c"}}, ttl=0.05)
+    assert backend.get("CVs:1") == {"name": "a"}
+    assert backend.get_many(["CVs:2", "CVs:4"]) == [{"name": "b"}, None]
+    assert set(redis_server["sync"].data) == {"cache|CVs:1", "cache|CVs:2", "cache|CVs:3"}
+
+    time.sleep(0.06)
+    assert backend.get("CVs:2") is None and backend.count() == 1
+    backend.clear()
+    assert backend.count() == 0
+
+
+async def test_redis_backend_awaits_the_asyncio_client(redis_server):
+    backend = RedisCacheBackend("redis://localhost:6379/0", prefix="memory")
+
+    await backend.aset("watch", {"percent": {}})
+    await backend.aset_many({"a": 1, "b": 2}, ttl=60)
+    assert await backend.aget("watch") == {"percent": {}}
+    assert await backend.aget_many(["a", "b", "c"]) == [1, 2, None]
+    await backend.adelete_many(["a", "b"])
+    await backend.adelete("watch")
+    assert await backend.aget_many(["a", "watch"]) == [None, None]
+
+    # The blocking client is never used on the async path
+    assert redis_server["sync"].calls == []
+    assert "pipeline" in redis_server["async"].calls
+    await backend.aclose()
+    assert backend._aclient is None
+
+
+async def test_cache_provider_uses_the_async_backend(redis_server):
+    cacher = CacheProvider(in_memory=True, backend=RedisCacheBackend("redis://localhost:6379/0"))
+
+    await cacher.aset("Users:u1", {"name": "A"}, ttl=60)
+    await cacher.asets({"Users:u2": {"name": "B"}})
+    assert await cacher.aget("Users:u1") == {"name": "A"}
+    assert await cacher.agets(["Users:u1", "Users:u2"]) == [{"name": "A"}, {"name": "B"}]
+    await cacher.aremoves(["Users:u1"])
+    await cacher.aremove("Users:u2")
+    assert await cacher.agets(["Users:u1", "Users:u2"]) == [None, None]
+    assert redis_server["sync"].calls == []
+
+    # Both clients see the same server
+    cacher.set("Users:u3", {"name": "C"})
+    assert await cacher.aget("Users:u3") == {"name": "C"}
+
+
+async def test_sqlite_backend_runs_blocking_calls_in_a_thread(tmp_path):
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"), table="cache")
+
+    await backend.aset_many({"a": 1, "b": 2})
+    assert await backend.aget_many(["a", "b", "c"]) == [1, 2, None]
+    await backend.adelete("a")
+    assert await backend.aget("a") is None and backend.get("b") == 2
+    backend.close()
+
+
+def test_cache_with_a_backend_has_no_write_behind_flusher(redis_server):
+    cacher = CacheProvider(write_behind=True, backend=RedisCacheBackend("redis://localhost:6379/0"))
+
+    assert cacher.in_memory and not cacher.write_behind
+    assert cacher._flusher is None
@@ -0,0 +1,75 @@
+import pytest
+from apis.v1.providers import cacher, content_cache, storage_db
+from apis.v1.schemas.cv_schema import CVSchema
+import fakes
+
+pytestmark = pytest.mark.anyio
+
+DIGEST = "ab" * 32
+
+
+async def _upload(name):
+    # The dedup branch of the upload controller
+    blob = await content_cache.aadd_blob_ref(DIGEST)
+    if blob["path"]:
+        return blob["path"], blob["url"]
+    path, url = storage_db.upload_content_addressed(b"%PDF", name, "application/pdf", DIGEST, blob["generation"])
+    await content_cache.aset_blob(DIGEST, blob["generation"], path, url)
+    return path, url
+
+
+async def test_blob_is_kept_until_its_last_reference():
+    first, _ = await _upload("a.pdf")
+    second, _ = await _upload("b.pdf")
+    assert first == second
+    assert fakes.STORE["BlobRefs"][DIGEST]["refs"] == 2
+
+    assert await content_cache.arelease_blob(DIGEST, first) is False
+    assert await content_cache.arelease_blob(DIGEST, first) is True
+    assert fakes.STORE["BlobRefs"][DIGEST]["refs"] == 0
+
+
+async def test_count_survives_a_cache_reset():
+    path, _ = await _upload("a.pdf")
+    await _upload("b.pdf")
+    cacher.reset_cache()
+    assert await content_cache.arelease_blob(DIGEST, path) is False
+
+
+async def test_blob_without_a_count_is_kept():
+    assert await content_cache.arelease_blob(DIGEST, f"CVs/blobs/{DIGEST}.pdf") is False
+    path, _ = await _upload("a.pdf")
+    # A blob of an older generation is not counted any more
+    assert await content_cache.arelease_blob(DIGEST, f"CVs/blobs/{DIGEST}.pdf") is False
+    assert fakes.STORE["BlobRefs"][DIGEST]["refs"] == 1
+
+
+async def test_released_blob_is_uploaded_again_under_a_new_path():
+    path, _ = await _upload("a.pdf")
+    assert await content_cache.arelease_blob(DIGEST, path) is True
+    new_path, _ = await _upload("a.pdf")
+    assert new_path != path
+    assert new_path in fakes.BLOBS
+
+
+def test_sync_release_matches_async():
+    blob = content_cache.add_blob_ref(DIGEST)
+    path, url = storage_db.upload_content_addressed(b"%PDF", "a.pdf", "application/pdf", DIGEST, blob["generation"])
+    content_cache.set_blob(DIGEST, blob["generation"], path, url)
+    assert content_cache.add_blob_ref(DIGEST)["path"] == path
+    assert content_cache.release_blob(DIGEST, path) is False
+    assert content_cache.release_blob(DIGEST, path) is True
+
+
+async def test_deleting_a_cv_keeps_a_blob_other_cvs_use():
+    cvs = []
+    for name in ("a.pdf", "b.pdf"):
+        cv = await CVSchema(name=name).acreate_cv()
+        path, url = await _upload(name)
+        await cv.aupdate_path_url(path, url)
+        cvs.append(cv)
+
+    await cvs[0].adelete_cv()
+    assert cvs[1].path in fakes.BLOBS
+    await cvs[1].adelete_cv()
+    assert cvs[1].path not in fakes.BLOBS
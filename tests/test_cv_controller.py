@@ -0,0 +1,118 @@
+import asyncio
+import httpx
+import pytest
+from apis.v1.controllers import cv_controller
+from apis.v1.controllers.cv_controller import get_upload_progress, set_cache_error, start_progress, update_cache_percent
+from apis.v1.providers import content_cache, extraction_pool, http_client
+from apis.v1.providers.cache_backend import RedisCacheBackend
+from apis.v1.providers.cache_provider import CacheProvider
+from apis.v1.schemas.position_schema import PositionSchema, PositionStatus
+import fakes
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def no_retries(monkeypatch):
+    monkeypatch.setitem(cv_controller.ai_dispatch_config, "max_retries", 0)
+    monkeypatch.setitem(cv_controller.ai_dispatch_config, "backoff", 0)
+
+
+async def _upload(files, filenames):
+    position = await PositionSchema(name="Backend", cvs=[]).acreate_position()
+    await position.aupdate_status(PositionStatus.PROCESSING)
+    await start_progress("watch", filenames)
+    await cv_controller._upload_cvs_data(files, filenames, "watch", position, {}, "gemini")
+    return await PositionSchema.afind_by_id(position.id), await get_upload_progress("watch")
+
+
+async def test_failed_extraction_removes_the_cv_and_releases_its_blob(monkeypatch):
+    monkeypatch.setattr(content_cache, "dedup_blobs", True)
+
+    async def extract(data, filename):
+        raise ValueError("unreadable")
+    monkeypatch.setattr(extraction_pool, "extract", extract)
+
+    position, watch = await _upload([b"%PDF-a", b"%PDF-a"], ["a.pdf", "b.pdf"])
+    assert watch["status"] == "failed" and watch["error"]["a.pdf"] == "unreadable"
+    assert position.status == PositionStatus.OPEN and position.cvs == []
+    assert not fakes.STORE.get("CVs")
+    assert fakes.BLOBS == {}
+    digest = content_cache.digest(b"%PDF-a")
+    assert fakes.STORE["BlobRefs"][digest]["refs"] == 0
+
+
+async def test_failed_upload_releases_the_blob_reference(monkeypatch):
+    monkeypatch.setattr(content_cache, "dedup_blobs", True)
+
+    def upload(*args):
+        raise ConnectionError("storage down")
+    monkeypatch.setattr(cv_controller.storage_db, "upload_content_addressed", upload)
+
+    position, watch = await _upload([b"%PDF-a"], ["a.pdf"])
+    assert watch["status"] == "failed" and position.status == PositionStatus.OPEN
+    assert not fakes.STORE.get("CVs")
+    assert fakes.STORE["BlobRefs"][content_cache.digest(b"%PDF-a")]["refs"] == 0
+
+
+async def test_position_leaves_processing_when_no_chunk_is_processed(monkeypatch):
+    async def extract(data, filename):
+        return "text"
+
+    async def post(*args, **kwargs):
+        raise ConnectionError("processing down")
+    monkeypatch.setattr(extraction_pool, "extract", extract)
+    monkeypatch.setattr(http_client, "post", post)
+
+    position, watch = await _upload([b"%PDF-a", b"%PDF-b"], ["a.pdf", "b.pdf"])
+    assert position.status == PositionStatus.OPEN
+    assert len(position.cvs) == 2
+    assert watch["status"] == "failed"
+    assert watch["percent"] == {"a.pdf": -1, "b.pdf": -1}
+
+
+async def test_concurrent_file_updates_against_a_shared_backend_are_all_kept(redis_server, monkeypatch):
+    monkeypatch.setattr(cv_controller, "memory_cacher", CacheProvider(
+        in_memory=True, backend=RedisCacheBackend("redis://localhost:6379/0", prefix="memory")))
+    filenames = [f"{i}.pdf" for i in range(8)]
+    await start_progress("watch", filenames + ["bad.pdf"])
+
+    async def ingest(filename):
+        for delta in (10, 10, 15, 5):
+            await update_cache_percent("watch", filename, delta)
+    await asyncio.gather(*[ingest(filename) for filename in filenames], set_cache_error("watch", "bad.pdf", "unreadable"))
+
+    progress = await get_upload_progress("watch")
+    assert progress["percent"] == {**{filename: 40 for filename in filenames}, "bad.pdf": -1}
+    assert progress["error"] == {"bad.pdf": "unreadable"} and progress["status"] == "processing"
+    assert redis_server["sync"].calls == []
+
+
+async def test_files_of_a_failed_matching_chunk_are_reported_as_errors(monkeypatch):
+    monkeypatch.setitem(cv_controller.ai_dispatch_config, "chunk_size", 1)
+    names = {}
+
+    async def extract(data, filename):
+        return "text"
+
+    async def post(endpoint, url, json, **kwargs):
+        if endpoint == "processing":
+            results = [{"doc_id": cv_id, "summary": "summary", "labels": []} for cv_id in json["doc_ids"]]
+        elif names[json["cv_ids"][0]] == "b.pdf":
+            raise ConnectionError("matching down")
+        else:
+            results = [{"cv_id": cv_id, "matching_result": {}} for cv_id in json["cv_ids"]]
+        return httpx.Response(200, json={"results": results}, request=httpx.Request("POST", f"http://ai/{endpoint}"))
+    monkeypatch.setattr(extraction_pool, "extract", extract)
+    monkeypatch.setattr(http_client, "post", post)
+    create_cv = cv_controller.CVSchema.acreate_cv
+
+    async def acreate_cv(self):
+        cv = await create_cv(self)
+        names[cv.id] = self.name
+        return cv
+    monkeypatch.setattr(cv_controller.CVSchema, "acreate_cv", acreate_cv)
+
+    _, watch = await _upload([b"%PDF-a", b"%PDF-b"], ["a.pdf", "b.pdf"])
+    assert watch["percent"] == {"a.pdf": 100, "b.pdf": -1}
+    assert watch["error"] == {"b.pdf": "matching down"}
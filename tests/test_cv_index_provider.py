@@ -0,0 +1,67 @@
+from apis.v1.providers.cv_index_provider import CVIndexProvider, PositionIndex
+
+
+def _doc(status="APPLYING", labels=(), overall=None):
+    matching = {"overall_result": {"overall_score": overall}} if overall is not None else ""
+    return {"status": status, "labels": list(labels), "matching": matching}
+
+
+def _index(docs):
+    index = PositionIndex()
+    for cv_id, doc in docs.items():
+        index.set_cv(cv_id, doc)
+    return index
+
+
+def test_filters_and_facets_of_the_matching_cvs():
+    index = _index({
+        "a": _doc("APPLYING", ["python"], 80),
+        "b": _doc("HIRED", ["python", "go"], 40),
+        "c": _doc("APPLYING", ["go"], 60),
+        "d": _doc("APPLYING", ["python"])
+    })
+
+    result = index.query(["a", "b", "c", "d"], status=["APPLYING"], labels=["python"])
+    assert result["total"] == 2 and result["cv_ids"] == ["a", "d"]
+    assert result["facets"] == {"status": {"APPLYING": 2, "HIRED": 0}, "labels": {"python": 2}}
+
+    result = index.query(["a", "b", "c", "d"], min_scores={"overall_score": 50}, max_scores={"overall_score": 80})
+    assert result["cv_ids"] == ["a", "c"]
+
+
+def test_sorted_results_put_unscored_cvs_last_in_the_given_order():
+    index = _index({
+        "x": _doc(),
+        "a": _doc(overall=40),
+        "y": _doc(),
+        "b": _doc(overall=90),
+        "z": _doc()
+    })
+    order_ids = ["z", "y", "b", "a", "x"]
+
+    assert index.query(order_ids, sort_by="overall_score")["cv_ids"] == ["b", "a", "z", "y", "x"]
+    assert index.query(order_ids, sort_by="overall_score", descending=False)["cv_ids"] == ["a", "b", "z", "y", "x"]
+    assert index.query(order_ids, sort_by="overall_score", top_k=3)["cv_ids"] == ["b", "a", "z"]
+    assert index.query(order_ids, sort_by="overall_score", top_k=1)["cv_ids"] == ["b"]
+
+
+def test_updated_and_removed_cvs_leave_the_bitmaps():
+    index = _index({"a": _doc("APPLYING", ["python"], 80), "b": _doc("APPLYING", [], 20)})
+    index.set_cv("a", _doc("HIRED", [], 10))
+    index.remove_cv("b")
+
+    result = index.query(["a", "b"], sort_by="overall_score")
+    assert result["total"] == 1 and result["cv_ids"] == ["a"]
+    assert result["facets"] == {"status": {"HIRED": 1}, "labels": {}}
+    assert len(index) == 1
+
+
+def test_provider_reconciles_the_members_of_a_position():
+    provider = CVIndexProvider("CVs")
+    provider.build("p1", [{"id": "a", **_doc()}, {"id": "b", **_doc()}])
+
+    # Removed members leave the index, new and dirty ones are read again
+    provider.receive("CVs", "a")
+    assert provider.missing("p1", ["a", "c"]) == ["a", "c"]
+    assert provider.get("p1").query(["a", "b", "c"])["cv_ids"] == ["a"]
+    assert provider.missing("p2", ["a"]) is None
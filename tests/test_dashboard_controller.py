@@ -0,0 +1,89 @@
+import pytest
+from fastapi import HTTPException
+from apis.v1.controllers.dashboard_controller import get_position_analytics, get_position_dashboard_stats
+from apis.v1.schemas.cv_schema import CVSchema, CVStatus
+from apis.v1.schemas.position_schema import PositionSchema
+from apis.v1.schemas.project_schema import ProjectSchema
+from apis.v1.schemas.stats_schema import PositionStatsSchema
+from apis.v1.schemas.user_schema import UserSchema
+import fakes
+
+pytestmark = pytest.mark.anyio
+
+
+async def _project_with_position():
+    position = await PositionSchema(name="Backend", cvs=[]).acreate_position()
+    project = await ProjectSchema(name="Hiring", owner="u1", positions=[position.id]).acreate_project()
+    return project, position
+
+
+async def test_analytics_of_a_position_of_the_project():
+    project, position = await _project_with_position()
+    user = UserSchema(uid="u1", projects=[project.id])
+
+    analytics = await get_position_analytics(project.id, position.id, user)
+    assert analytics["total_cvs"] == 0 and analytics["scored_cvs"] == 0
+
+
+async def test_analytics_of_a_position_of_another_project_is_forbidden():
+    project, _ = await _project_with_position()
+    _, other_position = await _project_with_position()
+    user = UserSchema(uid="u1", shared=[project.id])
+
+    with pytest.raises(HTTPException) as error:
+        await get_position_analytics(project.id, other_position.id, user)
+    assert error.value.status_code == 403
+
+
+async def test_analytics_of_a_project_of_another_user_is_forbidden():
+    project, position = await _project_with_position()
+
+    with pytest.raises(HTTPException) as error:
+        await get_position_analytics(project.id, position.id, UserSchema(uid="u2"))
+    assert error.value.status_code == 403
+
+
+async def _legacy_position(statuses):
+    # CVs and a position stored before the counters existed
+    cvs = [await CVSchema(name=f"cv{i}", status=status).acreate_cv() for i, status in enumerate(statuses)]
+    position = await PositionSchema(name="Backend", cvs=[cv.id for cv in cvs]).acreate_position()
+    project = await ProjectSchema(name="Hiring", owner="u1", positions=[position.id]).acreate_project()
+    await PositionStatsSchema.adelete_by_ids([position.id])
+    return project, position, cvs
+
+
+async def test_rebuild_backfills_the_position_of_legacy_cvs():
+    project, position, cvs = await _legacy_position([CVStatus.applying, CVStatus.applying])
+    user = UserSchema(uid="u1", projects=[project.id])
+
+    stats = await get_position_dashboard_stats(project.id, position.id, user)
+    assert stats["total_cvs"] == 2 and stats["cv_status_counts"]["APPLYING"] == 2
+    assert all(fakes.STORE["CVs"][cv.id]["position"] == position.id for cv in cvs)
+
+    # Updates of the backfilled CVs are counted from then on
+    cv = await CVSchema.afind_by_id(cvs[0].id)
+    await cv.aupdate_status(CVStatus.hired)
+    stats = await get_position_dashboard_stats(project.id, position.id, user)
+    assert stats["cv_status_counts"]["APPLYING"] == 1 and stats["cv_status_counts"]["HIRED"] == 1
+
+
+async def test_update_during_rebuild_is_not_lost(monkeypatch):
+    project, position, cvs = await _legacy_position([CVStatus.applying, CVStatus.applying])
+    user = UserSchema(uid="u1", projects=[project.id])
+    arebuild = PositionStatsSchema.arebuild
+    attempts = []
+
+    async def concurrent_update(transaction, *args):
+        stats = await arebuild(transaction, *args)
+        attempts.append(stats)
+        if len(attempts) == 1:
+            # Lands after the rebuild read the CVs and counters, before it commits
+            cv = await CVSchema.afind_by_id(cvs[0].id)
+            await cv.aupdate_status(CVStatus.hired)
+        return stats
+    monkeypatch.setattr(PositionStatsSchema, "arebuild", concurrent_update)
+
+    stats = await get_position_dashboard_stats(project.id, position.id, user)
+    assert len(attempts) == 2
+    assert stats["total_cvs"] == 2
+    assert stats["cv_status_counts"]["APPLYING"] == 1 and stats["cv_status_counts"]["HIRED"] == 1
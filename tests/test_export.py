@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+import sys
+import pytest
+from fastapi import HTTPException
+from apis.v1.controllers import cv_controller
+from apis.v1.controllers.cv_controller import export_cvs
+from apis.v1.schemas.cv_schema import CVSchema
+from apis.v1.schemas.position_schema import PositionSchema
+from apis.v1.schemas.project_schema import ProjectSchema
+from apis.v1.schemas.user_schema import UserSchema
+
+pytestmark = pytest.mark.anyio
+
+
+def _summary(name):
+    return {"PersonalInformation": {"FullName": name, "ContactInformation": {"Email": f"{name}@example.com"}}}
+
+
+async def _project(names_by_position):
+    positions = []
+    for position_name, names in names_by_position.items():
+        cvs = [await CVSchema(name=name, summary=_summary(name), upload_at=f"2024-01-0{i + 1}T00:00:00").acreate_cv()
+               for i, name in enumerate(names)]
+        positions.append(await PositionSchema(name=position_name, cvs=[cv.id for cv in cvs]).acreate_position())
+    project = await ProjectSchema(name="Hiring", owner="u1", positions=[p.id for p in positions]).acreate_project()
+    return project, positions, UserSchema(uid="u1", projects=[project.id])
+
+
+async def _text(chunks):
+    return "".join([chunk async for chunk in chunks])
+
+
+async def test_csv_export_streams_chunks_newest_first(monkeypatch):
+    monkeypatch.setattr(cv_controller, "export_chunk_size", 2)
+    project, (position,), user = await _project({"Backend": ["ann", "bob", "cat"]})
+
+    chunks = [chunk async for chunk in await export_cvs(project.id, position.id, user, "csv")]
+    # One chunk per read of CVs, the header only in the first one
+    assert len(chunks) == 2 and chunks[1].count("ID,Name") == 0
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert [(row["ID"], row["Name"]) for row in rows] == [("1", "cat"), ("2", "bob"), ("3", "ann")]
+    assert rows[0]["Email"] == "cat@example.com"
+
+
+async def test_empty_csv_export_has_its_header():
+    project, (position,), user = await _project({"Backend": []})
+
+    text = await _text(await export_cvs(project.id, position.id, user, "csv", "matching"))
+    assert text.splitlines() == [",".join(cv_controller.CV_EXPORT_COLUMNS["matching"][0])]
+
+
+async def test_ndjson_project_export_names_the_position_of_each_cv():
+    project, (backend, frontend), user = await _project({"Backend": ["ann"], "Frontend": ["bob", "cat"]})
+
+    text = await _text(await export_cvs(project.id, None, user, "ndjson"))
+    rows = [json.loads(line) for line in text.splitlines()]
+    assert [(row["Hiring Request"], row["ID"], row["Name"]) for row in rows] == [
+        ("Backend", 1, "ann"), ("Frontend", 1, "cat"), ("Frontend", 2, "bob")]
+    assert rows[0]["Hiring Request ID"] == backend.id
+    assert list(rows[0])[:3] == ["Hiring Request ID", "Hiring Request", "ID"]
+
+
+async def test_export_of_another_project_is_forbidden():
+    project, _, _ = await _project({"Backend": ["ann"]})
+
+    with pytest.raises(HTTPException) as error:
+        await export_cvs(project.id, None, UserSchema(uid="u2"), "csv")
+    assert error.value.status_code == 403
+
+
+async def test_parquet_export_without_pyarrow_is_not_implemented(monkeypatch):
+    project, (position,), user = await _project({"Backend": ["ann"]})
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+    with pytest.raises(HTTPException) as error:
+        await export_cvs(project.id, position.id, user, "parquet")
+    assert error.value.status_code == 501
+
+
+async def test_parquet_export_writes_a_row_group_per_chunk(monkeypatch):
+    # Optional dependency, skipped when pyarrow cannot be loaded
+    pq = pytest.importorskip("pyarrow.parquet", exc_type=ImportError)
+    monkeypatch.setattr(cv_controller, "export_chunk_size", 2)
+    project, (position,), user = await _project({"Backend": ["ann", "bob", "cat"]})
+
+    data = b"".join(await export_cvs(project.id, position.id, user, "parquet"))
+    table = pq.ParquetFile(io.BytesIO(data))
+    assert table.num_row_groups == 2
+    assert table.read().column("Name").to_pylist() == ["cat", "bob", "ann"]
@@ -0,0 +1,67 @@
+import asyncio
+import time
+import pytest
+from apis.v1.providers import extraction_provider
+from apis.v1.providers.extraction_provider import ExtractionProvider
+from apis.v1.utils.extractor import ExtractionError, ExtractionTimeout
+
+pytestmark = pytest.mark.anyio
+
+
+def _extract(data, filename, max_pages=None, timeout=None, use_temp_file=False):
+    # Runs in a forked worker: "hang" ignores the worker's own time limit
+    time.sleep(60 if filename == "hang" else float(data))
+    return f"text of {filename}"
+
+
+@pytest.fixture
+def extraction(monkeypatch):
+    monkeypatch.setattr(extraction_provider, "extract_cv_content", _extract)
+    provider = ExtractionProvider(max_workers=2, timeout=1.0, grace=0.5)
+    yield provider
+    provider.close()
+
+
+async def _later(delay, coroutine):
+    await asyncio.sleep(delay)
+    return await coroutine
+
+
+async def test_stuck_worker_fails_only_its_file(extraction):
+    extraction.start()
+    hang = asyncio.ensure_future(extraction.extract(b"", "hang"))
+    await asyncio.sleep(0.2)
+    pool = extraction._pool
+    processes = list(pool._processes.values())
+
+    # One file runs when the stuck worker is retired, the other is queued
+    results = await asyncio.gather(
+        hang,
+        _later(1.0, extraction.extract(b"0.5", "running")),
+        _later(1.1, extraction.extract(b"0.1", "queued")),
+        return_exceptions=True)
+
+    assert isinstance(results[0], ExtractionTimeout)
+    assert results[1:] == ["text of running", "text of queued"]
+    # The retired pool is terminated once its work is done, stuck worker included
+    for _ in range(50):
+        if not any(process.is_alive() for process in processes):
+            break
+        await asyncio.sleep(0.1)
+    assert not any(process.is_alive() for process in processes)
+    assert extraction._pool is not pool
+
+    # A new pool serves the next files
+    assert await extraction.extract(b"0", "next") == "text of next"
+
+
+async def test_cancelled_in_the_pool_fails_the_file_on_its_own(extraction):
+    extraction.start()
+    running = asyncio.ensure_future(extraction.extract(b"0.5", "running"))
+    queued = [asyncio.ensure_future(extraction.extract(b"0.5", f"queued{i}")) for i in range(4)]
+    await asyncio.sleep(0.2)
+    extraction.close()
+
+    results = await asyncio.gather(running, *queued, return_exceptions=True)
+    assert isinstance(results[-1], ExtractionError)
+    assert not any(isinstance(result, asyncio.CancelledError) for result in results)
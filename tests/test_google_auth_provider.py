@@ -0,0 +1,76 @@
+import types
+import httpx
+import pytest
+from fastapi import HTTPException
+from apis.v1.providers import cache_expiry
+from apis.v1.providers.cache_provider import CacheProvider
+from apis.v1.providers.google_auth_provider import GoogleAuthProvider
+from apis.v1.providers.http_provider import HTTPClientProvider
+
+pytestmark = pytest.mark.anyio
+
+VERIFY_URL = "https://google.test/oauth2/v3/userinfo?access_token="
+PROFILE = {"sub": "1", "email": "a@example.com", "name": "A"}
+
+
+@pytest.fixture
+def google():
+    '''
+    Stubbed userinfo endpoint: "good" tokens are valid, others rejected.
+    '''
+    requests = []
+
+    def userinfo(request):
+        requests.append(request)
+        if request.headers["Authorization"] == "Bearer good":
+            return httpx.Response(200, json=PROFILE)
+        return httpx.Response(401, json={"error": "invalid_token"})
+
+    http_client = HTTPClientProvider()
+    http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(userinfo))
+    return http_client, requests
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_expiry, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+async def test_verified_profile_is_cached_until_its_ttl(google, clock):
+    http_client, requests = google
+    cacher = CacheProvider(in_memory=True)
+    auth = GoogleAuthProvider(http_client, cacher, VERIFY_URL, ttl=300)
+
+    assert await auth.verify("good") == PROFILE
+    assert await auth.verify("good") == PROFILE
+    assert len(requests) == 1
+    assert str(requests[0].url) == VERIFY_URL + "good"
+    # The raw token is never a cache key
+    assert not any("good" in key for key in cacher.cache.to_dict())
+
+    clock[0] += 301
+    assert await auth.verify("good") == PROFILE
+    assert len(requests) == 2
+
+
+async def test_rejected_token_raises_and_is_not_cached(google, clock):
+    http_client, requests = google
+    auth = GoogleAuthProvider(http_client, CacheProvider(in_memory=True), VERIFY_URL, ttl=300)
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            await auth.verify("bad")
+        assert error.value.status_code == 401
+    assert len(requests) == 2
+    assert http_client.get_stats()["endpoints"]["google"]["errors"] == 2
+
+
+async def test_zero_ttl_disables_the_cache(google, clock):
+    http_client, requests = google
+    auth = GoogleAuthProvider(http_client, CacheProvider(in_memory=True), VERIFY_URL, ttl=0)
+
+    await auth.verify("good")
+    await auth.verify("good")
+    assert len(requests) == 2
@@ -0,0 +1,60 @@
+import pytest
+from apis.v1.providers import cv_adb
+from apis.v1.schemas.cv_schema import CVSchema
+from apis.v1.utils.pagination import page_ids
+
+pytestmark = pytest.mark.anyio
+
+IDS = ["a", "b", "c", "d", "e"]
+
+
+def _pages(ids, limit):
+    pages, cursor = [], None
+    while True:
+        page, cursor = page_ids(ids, limit, cursor)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_id_once():
+    assert _pages(IDS, 2) == [["a", "b"], ["c", "d"], ["e"]]
+    assert _pages(IDS, 5) == [IDS]
+    assert page_ids(IDS, None) == (IDS, None)
+    assert page_ids([], 2) == ([], None)
+
+
+def test_page_starts_after_the_last_item_wherever_it_moved():
+    _, cursor = page_ids(IDS, 2)
+    # Items inserted before the cursor do not repeat the previous page
+    assert page_ids(["x", "y"] + IDS, 2, cursor)[0] == ["c", "d"]
+    # The last item was removed: the page starts at the item that was next
+    assert page_ids(["a", "c", "d", "e"], 2, cursor)[0] == ["c", "d"]
+    # Both were removed: the page starts at the former position
+    assert page_ids(["a", "d", "e"], 2, cursor)[0] == ["d", "e"]
+
+
+def test_invalid_cursor_raises():
+    with pytest.raises(ValueError):
+        page_ids(IDS, 2, "not-a-cursor")
+
+
+async def test_page_by_ids_reads_only_the_page_in_order():
+    ids = [await cv_adb.create({"name": name}) for name in ("a", "b", "c")]
+    await cv_adb.delete(ids[1])
+
+    docs, cursor = await cv_adb.get_page_by_ids(ids, 1)
+    assert [doc["name"] for doc in docs] == ["a"]
+    # A removed document leaves a shorter page, not a repeated one
+    docs, cursor = await cv_adb.get_page_by_ids(ids, 1, cursor)
+    assert docs == [] and cursor is not None
+    docs, cursor = await cv_adb.get_page_by_ids(ids, 1, cursor)
+    assert [doc["name"] for doc in docs] == ["c"] and cursor is None
+
+
+async def test_sort_by_upload_puts_cvs_without_a_time_last():
+    old = await CVSchema(name="old", upload_at="2024-01-01T10:00:00").acreate_cv()
+    new = await CVSchema(name="new", upload_at="2024-03-01T10:00:00.123456").acreate_cv()
+    legacy = await CVSchema(name="legacy", upload_at=None).acreate_cv()
+
+    assert await CVSchema.asort_ids_by_upload([old.id, legacy.id, new.id]) == [new.id, old.id, legacy.id]
@@ -0,0 +1,136 @@
+import pytest
+from fastapi import HTTPException
+from apis.v1.controllers import purge_controller
+from apis.v1.controllers.purge_controller import (
+    create_purge_job,
+    run_purge_job,
+    resume_purge_jobs,
+    get_purge_progress,
+    worker_id
+)
+from apis.v1.providers import content_cache, storage_db
+from apis.v1.schemas.cv_schema import CVSchema
+from apis.v1.schemas.position_schema import PositionSchema
+from apis.v1.schemas.project_schema import ProjectSchema
+from apis.v1.schemas.purge_job_schema import PurgeJobSchema, PurgeStatus
+from apis.v1.schemas.user_schema import UserSchema
+import fakes
+
+pytestmark = pytest.mark.anyio
+
+DIGEST = "cd" * 32
+
+
+async def _cv(name, shared=False):
+    cv = await CVSchema(name=name).acreate_cv()
+    if shared:
+        blob = await content_cache.aadd_blob_ref(DIGEST)
+        path, url = blob["path"], blob["url"]
+        if not path:
+            path, url = storage_db.upload_content_addressed(b"%PDF", name, "application/pdf", DIGEST, blob["generation"])
+            await content_cache.aset_blob(DIGEST, blob["generation"], path, url)
+    else:
+        path, url = storage_db.upload(b"%PDF", name, "application/pdf")
+    await cv.aupdate_path_url(path, url)
+    return cv
+
+
+async def _project(cvs):
+    position = await PositionSchema(name="Backend", cvs=[cv.id for cv in cvs]).acreate_position()
+    return await ProjectSchema(name="Hiring", owner="u1", positions=[position.id]).acreate_project()
+
+
+def _plan(job_id):
+    return fakes.STORE.get(f"PurgeJobs/{job_id}/Plan", {})
+
+
+async def test_purge_keeps_a_blob_shared_outside_the_subtree():
+    outside = await _cv("outside.pdf", shared=True)
+    shared, own = await _cv("shared.pdf", shared=True), await _cv("own.pdf")
+    project = await _project([shared, own])
+
+    job = await create_purge_job("u1", project.id, project_ids=[project.id])
+    await run_purge_job(job.id)
+
+    job = await PurgeJobSchema.afind_by_id(job.id)
+    assert job.status == PurgeStatus.COMPLETED and job.done == job.total == 8
+    assert job.lease_owner is None
+    assert outside.path in fakes.BLOBS and own.path not in fakes.BLOBS
+    assert fakes.STORE["BlobRefs"][DIGEST]["refs"] == 1
+    assert set(fakes.STORE["CVs"]) == {outside.id}
+    assert not fakes.STORE["Projects"] and not fakes.STORE["HiringRequests"]
+    assert not _plan(job.id)
+
+
+async def test_plan_is_saved_in_chunks_outside_the_job(monkeypatch):
+    monkeypatch.setattr(purge_controller, "blob_chunk_size", 1)
+    project = await _project([await _cv("a.pdf"), await _cv("b.pdf")])
+    job = await create_purge_job("u1", project.id, project_ids=[project.id])
+
+    await purge_controller._collect(job)
+
+    doc = fakes.STORE["PurgeJobs"][job.id]
+    assert doc["collected"] and doc["total"] == 8
+    kinds = [chunk["kind"] for _, chunk in sorted(_plan(job.id).items())]
+    assert kinds == ["blobs", "blobs", "CVs", "HiringRequests", "Projects", "HiringRequestStats", "ProjectStats"]
+
+
+async def test_resumed_chunk_releases_references_once():
+    outside = await _cv("outside.pdf", shared=True)
+    project = await _project([await _cv("a.pdf", shared=True), await _cv("b.pdf", shared=True)])
+    job = await create_purge_job("u1", project.id, project_ids=[project.id])
+    assert await job.aclaim(worker_id, 60, 5)
+    await purge_controller._collect(job)
+
+    # Interrupted after releasing the references of the blob chunk
+    chunk = (await job.afind_plan())[0]
+    assert await purge_controller._release_blobs(job, chunk) == []
+    assert fakes.STORE["BlobRefs"][DIGEST]["refs"] == 1
+
+    await run_purge_job(job.id)
+    assert fakes.STORE["BlobRefs"][DIGEST]["refs"] == 1
+    assert outside.path in fakes.BLOBS
+    assert fakes.STORE["PurgeJobs"][job.id]["status"] == PurgeStatus.COMPLETED
+
+
+async def test_job_leased_by_another_instance_is_left_alone():
+    project = await _project([await _cv("a.pdf")])
+    job = await create_purge_job("u1", project.id, project_ids=[project.id])
+    assert await job.aclaim("other", 60, 5)
+
+    await resume_purge_jobs()
+    await run_purge_job(job.id)
+    assert fakes.STORE["PurgeJobs"][job.id]["lease_owner"] == "other"
+    assert project.id in fakes.STORE["Projects"]
+
+    # The other instance stopped renewing its lease
+    fakes.STORE["PurgeJobs"][job.id]["lease_expires_at"] = 0.0
+    await resume_purge_jobs()
+    assert fakes.STORE["PurgeJobs"][job.id]["status"] == PurgeStatus.COMPLETED
+    assert project.id not in fakes.STORE["Projects"]
+
+
+async def test_failed_job_is_retried_a_limited_number_of_times(monkeypatch):
+    def remove(path):
+        raise RuntimeError("storage down")
+    monkeypatch.setattr(storage_db, "remove", remove)
+    monkeypatch.setattr(purge_controller, "max_attempts", 2)
+    project = await _project([await _cv("a.pdf")])
+    job = await create_purge_job("u1", project.id, project_ids=[project.id])
+
+    for _ in range(4):
+        await resume_purge_jobs()
+
+    doc = fakes.STORE["PurgeJobs"][job.id]
+    assert doc["status"] == PurgeStatus.FAILED and doc["attempts"] == 2
+    assert doc["error"] == "storage down" and doc["lease_owner"] is None
+
+
+async def test_progress_is_only_shown_to_the_owner_and_project_members():
+    job = await create_purge_job("u1", "p1", position_ids=["h1"])
+
+    assert (await get_purge_progress(job.id, UserSchema(uid="u1")))["status"] == PurgeStatus.PENDING
+    assert await get_purge_progress(job.id, UserSchema(uid="u2", shared=["p1"]))
+    with pytest.raises(HTTPException) as error:
+        await get_purge_progress(job.id, UserSchema(uid="u3", projects=["p2"]))
+    assert error.value.status_code == 403
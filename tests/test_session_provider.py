@@ -0,0 +1,52 @@
+import os
+import time
+import pytest
+from apis.v1.providers.session_provider import SessionProvider
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def persist_path(tmp_path):
+    return str(tmp_path / "cache" / "__sessions__.json")
+
+
+def test_sessions_are_saved_without_closing_the_store(persist_path):
+    sessions = SessionProvider(persist_path=persist_path, flush_interval=0.05)
+    sid = sessions.create("u1")
+    revoked = sessions.create("u2")
+    sessions.revoke("u2", revoked)
+
+    # A worker that dies without closing its store keeps its logins
+    assert _wait_for(lambda: SessionProvider(persist_path=persist_path).is_active("u1", sid))
+    restarted = SessionProvider(persist_path=persist_path)
+    assert not restarted.is_active("u2", revoked)
+    sessions.close()
+    restarted.close()
+
+
+def test_many_logins_are_saved_before_the_interval(persist_path):
+    sessions = SessionProvider(persist_path=persist_path, flush_interval=60, flush_threshold=3)
+    sessions.create("u1")
+    assert not _wait_for(lambda: os.path.exists(persist_path), timeout=0.2)
+
+    sessions.create("u2")
+    sessions.create("u3")
+
+    assert _wait_for(lambda: SessionProvider(persist_path=persist_path).count() == 3)
+    assert [name for name in os.listdir(os.path.dirname(persist_path)) if name.endswith(".tmp")] == []
+    sessions.close()
+
+
+def test_close_saves_the_last_changes(persist_path):
+    sessions = SessionProvider(persist_path=persist_path, flush_interval=60)
+    sid = sessions.create("u1")
+
+    sessions.close()
+
+    assert SessionProvider(persist_path=persist_path).is_active("u1", sid)
@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from apis.v1.providers import position_adb, position_stats_adb, project_stats_adb
+from apis.v1.schemas.cv_schema import CVSchema, CVStatus
+from apis.v1.schemas.position_schema import PositionSchema, PositionStatus
+from apis.v1.schemas.project_schema import ProjectSchema
+import fakes
+
+pytestmark = pytest.mark.anyio
+
+
+async def _cv_of_position():
+    position = await PositionSchema(name="Backend", cvs=[]).acreate_position()
+    cv = await CVSchema(name="a", position_id=position.id).acreate_cv()
+    await position.aupdate_cv(cv.id)
+    return position, cv
+
+
+def _stats(position_id):
+    return fakes.STORE[position_stats_adb.collection_name][position_id]
+
+
+async def test_deferred_block_commits_fields_and_counters_together():
+    position, cv = await _cv_of_position()
+    version = _stats(position.id)["version"]
+    commits = len(fakes.COMMITS)
+
+    async with cv.deferred():
+        await cv.aupdate_summary("summary")
+        await cv.aupdate_status(CVStatus.hired)
+        # Nothing is written before the block exits
+        assert _stats(position.id)["cv_status"] == {"APPLYING": 1}
+        assert fakes.STORE["CVs"][cv.id].get("summary") != "summary"
+
+    assert len(fakes.COMMITS) == commits + 1
+    assert fakes.STORE["CVs"][cv.id]["summary"] == "summary"
+    assert fakes.STORE["CVs"][cv.id]["status"] == "HIRED"
+    assert _stats(position.id)["cv_status"] == {"APPLYING": 0, "HIRED": 1}
+    assert _stats(position.id)["version"] == version + 2
+
+
+async def test_failed_block_drops_its_fields_and_counters():
+    position, cv = await _cv_of_position()
+
+    with pytest.raises(RuntimeError):
+        async with cv.deferred():
+            await cv.aupdate_status(CVStatus.hired)
+            raise RuntimeError()
+    assert fakes.STORE["CVs"][cv.id]["status"] == "APPLYING"
+    assert _stats(position.id)["cv_status"] == {"APPLYING": 1}
+
+
+async def test_deferred_block_only_holds_the_updates_of_its_task():
+    position, cv = await _cv_of_position()
+    opened, written = asyncio.Event(), asyncio.Event()
+
+    async def deferred_task():
+        async with cv.deferred():
+            await cv.aupdate_summary("summary")
+            opened.set()
+            await written.wait()
+            raise RuntimeError()
+
+    async def direct_task():
+        await opened.wait()
+        # Same instance, outside of the other task's block: written at once
+        await cv.aupdate_status(CVStatus.hired)
+        written.set()
+
+    results = await asyncio.gather(deferred_task(), direct_task(), return_exceptions=True)
+    assert isinstance(results[0], RuntimeError)
+    assert fakes.STORE["CVs"][cv.id]["status"] == "HIRED"
+    assert _stats(position.id)["cv_status"] == {"APPLYING": 0, "HIRED": 1}
+    assert fakes.STORE["CVs"][cv.id].get("summary") != "summary"
+
+
+async def test_position_commits_its_cvs_status_and_counters_together():
+    project = await ProjectSchema(name="Hiring", owner="u1", positions=[]).acreate_project()
+    position = await PositionSchema(name="Backend", cvs=[], project_id=project.id).acreate_position()
+    cv = await CVSchema(name="a", position_id=position.id).acreate_cv()
+    commits = len(fakes.COMMITS)
+
+    await position.aupdate_cvs([cv.id])
+
+    # Fields, position counters and both project counters in one commit
+    assert fakes.COMMITS[commits:] == [4]
+    assert fakes.STORE[position_adb.collection_name][position.id]["cvs"] == [cv.id]
+    assert fakes.STORE[position_adb.collection_name][position.id]["status"] == PositionStatus.PROCESSING
+    assert _stats(position.id)["total_cvs"] == 1
+    project_stats = fakes.STORE[project_stats_adb.collection_name][project.id]
+    assert project_stats["position_status"] == {"open": 0, "processing": 1}
+    assert project_stats["total_cvs"] == 1